@@ -12,6 +12,16 @@ Examples:
     type = hxl.datatypes.typeof("     ") # => "empty"
     ```
 
+The normalisation functions can optionally memoise their results for
+string inputs, which pays off for the repetitive values (country,
+organisation, sector, etc.) common in humanitarian data:
+
+    ```
+    hxl.datatypes.enable_memoisation(maxsize={"normalise_date": 1024})
+    ...
+    print(hxl.datatypes.get_memoisation_stats()["normalise_string"]["hit_rate"])
+    ```
+
 Author:
     David Megginson
 
@@ -20,9 +30,11 @@ License:
 
 """
 
-import collections, datetime, dateutil.parser, json, logging, re, six, unidecode
+import collections, datetime, dateutil.parser, functools, json, logging, re, six, unidecode
+
+from hxl.util import LRUCache
 
-__all__ = ["TOKEN_PATTERN", "normalise", "typeof", "flatten", "is_truthy", "is_empty", "is_string", "is_token", "normalise_space", "normalise_string", "is_number", "normalise_number", "is_date", "normalise_date", "is_dict", "is_list"]
+__all__ = ["TOKEN_PATTERN", "normalise", "typeof", "flatten", "is_truthy", "is_empty", "is_string", "is_token", "normalise_space", "normalise_string", "is_number", "normalise_number", "is_date", "normalise_date", "is_dict", "is_list", "enable_memoisation", "disable_memoisation", "get_memoisation_stats"]
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +48,22 @@ TOKEN_PATTERN = r'[A-Za-z][_0-9A-Za-z]*'
 """A regular expression matching a single string token.
 """
 
-_WHITESPACE_PATTERN = re.compile(r'\s+', re.MULTILINE)
+class _TransliterationTable(dict):
+    """str.translate() table that transliterates each code point with unidecode the first time it's seen
+
+    unidecode works one character at a time, so translating a string
+    with this table gives the same result as unidecode.unidecode(),
+    but without the per-character Python loop after the first use.
+
+    """
+
+    def __missing__(self, code_point):
+        result = unidecode.unidecode(chr(code_point))
+        self[code_point] = result
+        return result
+
+_TRANSLITERATION_TABLE = _TransliterationTable()
+"""Shared table of transliterations for non-ASCII strings in normalise_string()"""
 
 _ISO_DATE_PATTERN = re.compile(
     r'^(?P<year>[12]\d\d\d)(?:Q(?P<quarter>[1-4])|W(?P<week>\d\d?)|-(?P<month>\d\d?)(?:-(?P<day>\d\d?))?)?$',
@@ -47,16 +74,182 @@ _SQL_DATETIME_PATTERN = re.compile(
     r'^(?P<year>[12]\d\d\d)-(?P<month>\d\d?)-(?P<day>\d\d?) \d\d?:\d\d?:\d\d?(?P<week>)?(?P<quarter>)?$'
 )
 
+_NUMERIC_DATE_PATTERN = re.compile(r'^(\d{1,2})([/.-])(\d{1,2})\2(\d{4})$')
+"""DD/MM/YYYY or MM/DD/YYYY, with "/", "-", or "." as the separator"""
+
+_YEAR_FIRST_DATE_PATTERN = re.compile(r'^(\d{4})([/.])(\d{1,2})\2(\d{1,2})$')
+"""YYYY/MM/DD or YYYY.MM.DD (YYYY-MM-DD is already covered by _ISO_DATE_PATTERN)"""
+
+_DAY_MONTH_NAME_PATTERN = re.compile(r'^(\d{1,2})([ -])([a-z]+)\2(\d{4})$', re.IGNORECASE)
+"""DD-Mon-YYYY or DD Month YYYY"""
+
+_MONTH_NAME_DAY_PATTERN = re.compile(r'^([a-z]+) (\d{1,2}),? (\d{4})$', re.IGNORECASE)
+"""Mon DD YYYY or Month DD, YYYY"""
+
+_MONTH_NAME_PATTERN = re.compile(r'^([a-z]+)[ -](\d{4})$', re.IGNORECASE)
+"""Mon YYYY or Month-YYYY"""
+
+_MONTH_NAMES = {
+    'jan': 1, 'january': 1,
+    'feb': 2, 'february': 2,
+    'mar': 3, 'march': 3,
+    'apr': 4, 'april': 4,
+    'may': 5,
+    'jun': 6, 'june': 6,
+    'jul': 7, 'july': 7,
+    'aug': 8, 'august': 8,
+    'sep': 9, 'sept': 9, 'september': 9,
+    'oct': 10, 'october': 10,
+    'nov': 11, 'november': 11,
+    'dec': 12, 'december': 12,
+}
+"""English month names and abbreviations (the ones dateutil recognises)"""
+
 _DEFAULT_DATE_1 = datetime.datetime(2015, 1, 1)
 
 _DEFAULT_DATE_2 = datetime.datetime(2016, 3, 3)
 
+DEFAULT_MEMO_SIZE = 16384
+"""Default maximum number of saved results for each memoised function.
+"""
+
+
+
+########################################################################
+# Memoisation
+########################################################################
+
+_MEMOISABLE = {}
+"""Functions that support memoisation, keyed by name."""
+
+_MEMO_CACHES = {}
+"""Active memoisation caches, keyed by function name."""
+
+
+def _memoisable(make_key):
+    """Decorator to allow optional memoisation of a normalisation function
+
+    While memoisation is disabled for the function (the default), the
+    decorated function simply calls through. Otherwise, the result (or
+    the ValueError) for each key is saved in a bounded LRU cache.
+
+    Args:
+        make_key (function): receives the function's arguments, and returns a hashable key, or None to bypass the cache
+
+    """
+    def decorator(f):
+        name = f.__name__
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            cache = _MEMO_CACHES.get(name)
+            if cache is None:
+                return f(*args, **kwargs)
+            key = make_key(*args, **kwargs)
+            if key is None:
+                return f(*args, **kwargs)
+            entry = cache.get(key)
+            if entry is None:
+                try:
+                    entry = (True, f(*args, **kwargs),)
+                except ValueError as e:
+                    entry = (False, e.args,)
+                cache.put(key, entry)
+            if entry[0]:
+                return entry[1]
+            else:
+                raise ValueError(*entry[1])
+
+        _MEMOISABLE[name] = wrapper
+        return wrapper
+
+    return decorator
+
+
+def _string_key(value):
+    """Memoisation key: only string values (other types are cheap, or may compare equal across types)"""
+    return value if type(value) is str else None
+
+
+def _date_key(value, dayfirst=True):
+    """Memoisation key for normalise_date()"""
+    return (value, bool(dayfirst),) if type(value) is str else None
+
+
+def _normalise_key(value, col=None, dayfirst=True):
+    """Memoisation key for normalise(): the column matters only as a date hint"""
+    if type(value) is str:
+        return (value, bool(col and col.tag == '#date'), bool(dayfirst),)
+    else:
+        return None
+
+
+def _get_memoisable_names(functions):
+    """Check and return the requested function names (default: all)"""
+    if functions is None:
+        return list(_MEMOISABLE.keys())
+    if isinstance(functions, six.string_types):
+        functions = [functions]
+    for name in functions:
+        if name not in _MEMOISABLE:
+            raise ValueError("Cannot memoise hxl.datatypes.{} (choose from {})".format(name, ", ".join(sorted(_MEMOISABLE))))
+    return list(functions)
+
+
+def enable_memoisation(maxsize=DEFAULT_MEMO_SIZE, functions=None):
+    """Turn on memoisation for normalisation functions.
+
+    Results are saved only for string inputs, in a separate bounded
+    LRU cache for each function. Calling this again for a function
+    that is already memoised resizes its cache, keeping the saved
+    results and counters.
+
+    Args:
+        maxsize (int or dict): the maximum number of results to save for each function, or a dict of sizes by function name
+        functions (list): names of the functions to memoise (default: all of "normalise", "normalise_space", "normalise_string", "normalise_number", and "normalise_date")
+
+    Raises:
+        ValueError: if a function name does not support memoisation
+
+    """
+    if isinstance(maxsize, dict):
+        _get_memoisable_names(list(maxsize.keys())) # check the names
+    for name in _get_memoisable_names(functions):
+        size = maxsize.get(name, DEFAULT_MEMO_SIZE) if isinstance(maxsize, dict) else maxsize
+        cache = _MEMO_CACHES.get(name)
+        if cache is None:
+            _MEMO_CACHES[name] = LRUCache(size)
+        else:
+            cache.resize(size)
+
+
+def disable_memoisation(functions=None):
+    """Turn off memoisation and discard saved results.
+
+    Args:
+        functions (list): names of the functions to stop memoising (default: all)
+
+    """
+    for name in _get_memoisable_names(functions):
+        _MEMO_CACHES.pop(name, None)
+
+
+def get_memoisation_stats():
+    """Report usage of the memoisation caches.
+
+    Returns:
+        dict: cache statistics (see hxl.util.LRUCache.stats()), keyed by name, for each memoised function
+
+    """
+    return {name: cache.stats() for name, cache in _MEMO_CACHES.items()}
+
 
 
 ########################################################################
 # Functions
 ########################################################################
 
+@_memoisable(_normalise_key)
 def normalise(value, col=None, dayfirst=True):
     """Intelligently normalise a value, optionally using the HXL hashtag and attributes for hints
 
@@ -201,6 +394,7 @@ def is_token(value):
     return is_string(value) and re.fullmatch(TOKEN_PATTERN, value)
 
 
+@_memoisable(_string_key)
 def normalise_space(value):
     """Normalise whitespace only in a string
 
@@ -219,17 +413,15 @@ def normalise_space(value):
         str: a string representation of the original value, with whitespace normalised.
 
     """
-    if is_empty(value):
+    if value is None:
         return ''
-    else:
-        value = str(value).strip().replace("\n", " ")
-        return re.sub(
-            _WHITESPACE_PATTERN,
-            ' ',
-            value
-        )
+    elif type(value) is not str:
+        value = str(value)
+    # str.split() uses the same definition of whitespace as the regular expression "\s"
+    return ' '.join(value.split())
 
 
+@_memoisable(_string_key)
 def normalise_string(value):
     """Normalise a string.
 
@@ -247,10 +439,13 @@ def normalise_string(value):
 
     """
     if value is None:
-        value = ''
-    else:
+        return ''
+    elif type(value) is not str:
         value = str(value)
-    return normalise_space(unidecode.unidecode(value)).lower()
+    if not value.isascii():
+        # same result as unidecode.unidecode(value), which leaves ASCII alone
+        value = value.translate(_TRANSLITERATION_TABLE)
+    return ' '.join(value.split()).lower()
 
 
 def is_number(value):
@@ -270,6 +465,7 @@ def is_number(value):
         return False
 
 
+@_memoisable(_string_key)
 def normalise_number(value):
     """Attempt to convert a value to a number.
 
@@ -313,6 +509,7 @@ def is_date(value):
         return False
 
 
+@_memoisable(_date_key)
 def normalise_date(value, dayfirst=True):
     """Normalise a string as a date.
 
@@ -396,6 +593,11 @@ def normalise_date(value, dayfirst=True):
         d = datetime.datetime.utcfromtimestamp(timestamp)
         return d.date().isoformat()
 
+    # Next, try a table of common non-ISO formats
+    result = _parse_common_date(value, dayfirst)
+    if result is not None:
+        return result
+
     # revert to full date parsing
     # we parse the date twice, to detect any default values Python might have filled in
     date1 = dateutil.parser.parse(value, default=_DEFAULT_DATE_1, dayfirst=dayfirst)
@@ -416,6 +618,71 @@ def normalise_date(value, dayfirst=True):
     return make_date_string(year=year, month=month, day=day)
 
 
+def _parse_common_date(value, dayfirst=True):
+    """Fast parser for common date formats, ahead of dateutil
+
+    Recognises DD/MM/YYYY and MM/DD/YYYY, YYYY/MM/DD (using dayfirst
+    when ambiguous), DD-Mon-YYYY, Month DD, YYYY, and Mon YYYY,
+    producing the same result that normalise_date() would get from
+    dateutil. Anything else, including invalid dates, is left for
+    dateutil so that its behaviour (and error reporting) is unchanged.
+
+    Args:
+        value (str): the whitespace-normalised string to parse
+        dayfirst (bool): if the date is ambiguous, assume the day comes before the month
+
+    Returns:
+        str: the date in ISO 8601 format, or None if not recognised
+
+    """
+    year = month = day = None
+
+    result = _NUMERIC_DATE_PATTERN.match(value)
+    if result:
+        first, second, year = int(result.group(1)), int(result.group(3)), int(result.group(4))
+        if (dayfirst and second <= 12) or first > 12:
+            day, month = first, second
+        else:
+            month, day = first, second
+    else:
+        result = _YEAR_FIRST_DATE_PATTERN.match(value)
+        if result:
+            # dateutil reads this as YYYY/DD/MM when dayfirst is set (and it works)
+            year, first, second = int(result.group(1)), int(result.group(3)), int(result.group(4))
+            if dayfirst and (second <= 12 or first > 12):
+                day, month = first, second
+            else:
+                month, day = first, second
+        else:
+            result = _DAY_MONTH_NAME_PATTERN.match(value)
+            if result:
+                day, month, year = int(result.group(1)), _MONTH_NAMES.get(result.group(3).lower()), int(result.group(4))
+            else:
+                result = _MONTH_NAME_DAY_PATTERN.match(value)
+                if result:
+                    month, day, year = _MONTH_NAMES.get(result.group(1).lower()), int(result.group(2)), int(result.group(3))
+                else:
+                    result = _MONTH_NAME_PATTERN.match(value)
+                    if result:
+                        month, year = _MONTH_NAMES.get(result.group(1).lower()), int(result.group(2))
+                        day = 1 # for validation only
+                    else:
+                        return None
+
+    # leave anything questionable to dateutil
+    if month is None:
+        return None
+    try:
+        date = datetime.date(year, month, day)
+    except ValueError:
+        return None
+
+    if result.re is _MONTH_NAME_PATTERN:
+        return '{:04d}-{:02d}'.format(year, month)
+    else:
+        return date.isoformat()
+
+
 def is_dict(value):
     """Test if a value is a Python dict.
 
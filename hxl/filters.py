@@ -38,7 +38,7 @@ lower-level L{AbstractBaseFilter} directly for especially-complex cases.
 """
 
 import hxl, hxl.formulas.eval as feval
-import abc, copy, dateutil.parser, itertools, json, jsonpath_ng.ext, logging, re, six, sys
+import abc, collections, concurrent.futures, copy, dateutil.parser, itertools, json, jsonpath_ng.ext, logging, os, pickle, queue, re, six, sys, tempfile, threading
 
 from hxl.util import logup
 
@@ -126,7 +126,7 @@ class AbstractBaseFilter(hxl.model.Dataset):
         @returns: a list of L{hxl.model.Column} objects
         """
         if self._filtered_column_cache is None:
-            self._filtered_column_cache = self.filter_columns()
+            self._filtered_column_cache = hxl.model.ColumnList.of(self.filter_columns())
         return self._filtered_column_cache
 
     def filter_columns(self):
@@ -171,6 +171,31 @@ class AbstractBaseFilter(hxl.model.Dataset):
                 indices.add(i)
         return indices
 
+    def _explain(self, rows):
+        """Internal: describe how this filter reads its data (see L{explain}).
+        Child classes override this method when they read their source
+        more than once, hold data in memory, or change the number of rows.
+        @param rows: the estimated number of rows from the source, or C{None} if unknown
+        @returns: a dict with the "kind" of filter, the number of "passes" through the source,
+        the estimated output "rows" and "rows_held" in memory (C{None} if unknown), a list
+        of "notes", a list of any "extra_sources" (other datasets that the filter reads), and
+        whether the filter reads those only once ("extra_sources_cached")
+        """
+        plan = {
+            'kind': 'streaming',
+            'passes': 1,
+            'rows': rows,
+            'rows_held': 0,
+            'notes': [],
+            'extra_sources': [],
+            'extra_sources_cached': False,
+        }
+        aggregates = _count_aggregates(getattr(self, 'queries', [])) + _count_aggregates(getattr(self, 'mask', []))
+        if aggregates:
+            plan['passes'] += aggregates
+            plan['notes'].append('caches its source to calculate min/max values for queries')
+        return plan
+
     @staticmethod
     def _load (source, spec):
         """Create an instance of the filter from a dict.
@@ -216,6 +241,11 @@ class AbstractStreamingFilter(AbstractBaseFilter):
     This simple filter will produce a copy of the source data, but
     omitting rows where the org name is "Unknown".
 
+    When the rows are read with L{hxl.model.Dataset.iter_batches}, the
+    filter receives them a batch at a time through L{filter_batch},
+    which simply calls filter_row() for each row unless the child
+    class overrides it with something faster.
+
     @see: L{AbstractCachingFilter}
 
     """
@@ -237,6 +267,11 @@ class AbstractStreamingFilter(AbstractBaseFilter):
         rows on the fly, without having to keep a copy of the entire
         dataset in memory.
 
+        The list returned becomes the values of the new output row
+        I{without} copying, so return C{row.values} itself when
+        nothing changes, and make a new list (once) before changing
+        anything; never assign into C{row.values} in place.
+
         @param row: the original L{hxl.model.Row} object.
         @returns: A list of string values (I{not} a Row object) or
         C{None} to skip the row.
@@ -245,12 +280,87 @@ class AbstractStreamingFilter(AbstractBaseFilter):
         """
         return row.values
 
+    def filter_batch(self, rows):
+        """Filter a list of rows at once.
+
+        By default, this method calls L{filter_row} for each row in
+        turn. Subclasses can override it when they can handle a batch
+        more efficiently (e.g. by looking up attributes once), but the
+        result must be the same as calling filter_row() for each row.
+
+        @param rows: a list of L{hxl.model.Row} objects from the source.
+        @returns: a list of lists of string values (one for each row
+        that isn't suppressed), following the same rules as filter_row().
+        """
+        filter_row = self.filter_row
+        return [values for values in map(filter_row, rows) if values is not None]
+
+    def iter_batches(self, size=None):
+        """Filter the source a batch at a time with L{filter_batch}.
+        @param size: the maximum number of rows in each batch (default: L{hxl.model.Dataset.BATCH_SIZE})
+        @returns: an iterator that returns non-empty lists of L{hxl.model.Row} objects
+        @see: L{hxl.model.Dataset.iter_batches}
+        """
+        self._start_pass()
+        return self._gen_batches(size)
+
+    def _gen_batches(self, size):
+        """Generator for L{iter_batches}."""
+        # call this here, in case it caches any useful information
+        columns = self.columns
+        row_number = -1
+        for rows in self.source.iter_batches(size):
+            batch = []
+            for values in self.filter_batch(rows):
+                row_number += 1
+                batch.append(hxl.model.Row(columns, values, row_number, copy_values=False))
+            if batch:
+                yield batch
+
+    def _start_pass(self):
+        """Called at the start of each pass through the data (row by row or in batches).
+        Subclasses can override this to reset any per-pass state.
+        """
+        pass
+
+    def _can_fuse(self):
+        """Report whether a downstream filter may run this filter inside its own loop.
+
+        Filters that customise iteration (by overriding C{__iter__})
+        can't be fused by default, so the chain reads through their
+        own iterators instead. Subclasses can override this.
+
+        @returns: C{True} if L{filter_row} is all there is to this filter's iteration
+        @see: L{AbstractStreamingFilter._Iterator}
+        """
+        return type(self).__iter__ is AbstractStreamingFilter.__iter__
+
+    def _can_parallelise(self):
+        """Report whether L{parallel} may run this filter on chunks of rows in worker processes.
+
+        That is safe only if L{filter_row} depends on nothing but the
+        row itself: no state carried from one row to the next, and
+        nothing read on first use (which every worker would have to
+        read again). Subclasses that qualify override this.
+
+        @returns: C{True} if the filter can run on separate chunks of the data
+        """
+        return False
+
     def __iter__(self):
         return AbstractStreamingFilter._Iterator(self)
 
     class _Iterator:
         """Internal iterator class to return the filtered rows.
+
         Note that the filtering happens here, not in the main class.
+        A chain of streaming filters (e.g. from a recipe, or from
+        chained L{hxl.model.Dataset} methods) runs as a single fused
+        loop: the iterator reads directly from the first source that
+        isn't a fusable streaming filter, and passes each row through
+        all of the filters' L{filter_row} methods in turn, reusing one
+        scratch L{hxl.model.Row} between them. Only the row that comes
+        out of the end of the chain is a new object.
         """
 
         def __init__(self, outer):
@@ -258,8 +368,27 @@ class AbstractStreamingFilter(AbstractBaseFilter):
             @param outer: a reference to the parent object (an L{AbstractStreamingFilter}).
             """
             self.outer = outer # ref to outer object
-            self.source_iter = iter(self.outer.source) # iterator for the source data
-            self.row_number = -1
+
+            # collect the filters to fuse, from the source end of the chain
+            stages = [outer]
+            source = outer.source
+            while isinstance(source, AbstractStreamingFilter) and source._can_fuse():
+                stages.append(source)
+                source = source.source
+            stages.reverse()
+            for stage in stages:
+                stage._start_pass()
+
+            self.stages = stages
+            self.source_iter = iter(source) # iterator for the source data
+            self.row_numbers = [-1] * len(stages) # output row number for each stage
+            self.columns = None # output columns for each stage (when first needed)
+            self.scratch_row = hxl.model.Row(None, None, copy_values=False) # row passed between stages
+
+        @property
+        def row_number(self):
+            """The row number of the last row returned."""
+            return self.row_numbers[-1]
 
         def __iter__(self):
             return self
@@ -267,26 +396,40 @@ class AbstractStreamingFilter(AbstractBaseFilter):
         def __next__(self):
             """Return the next filtered row of data.
 
-            Uses the L{AbstractStreamingFilter.filter_row} method. The
-            returned row is always a new object, so that if the client
-            changes it, it won't change the version visible upstream
-            in the filter chain.
+            Uses the L{AbstractStreamingFilter.filter_row} method of
+            each filter in the chain. The returned row is always a new
+            object, but it shares its values list with the upstream
+            row when the filters didn't change anything (upstream rows
+            are transient, and caching filters always hand out copies).
 
             @returns: a L{hxl.model.Row} object
 
             """
             # call this here, in case it caches any useful information
-            columns = self.outer.columns
+            if self.columns is None:
+                self.columns = [stage.columns for stage in self.stages]
+            columns = self.columns
+            row_numbers = self.row_numbers
+            scratch_row = self.scratch_row
+            last = len(self.stages) - 1
             while True:
                 # a StopIterationException will terminate the loop
                 row = next(self.source_iter)
-                # get a new list of filtered values
-                values = self.outer.filter_row(row)
-                if values is not None:
-                    # keep looping if filter_row(row) returned None
-                    self.row_number += 1
-                    # create a new Row object
-                    return hxl.model.Row(columns, values, self.row_number)
+                for i, stage in enumerate(self.stages):
+                    # get a new list of filtered values
+                    values = stage.filter_row(row)
+                    if values is None:
+                        # keep looping if filter_row(row) returned None
+                        break
+                    row_numbers[i] += 1
+                    if i == last:
+                        # create a new Row object (filter_row already copied the values if it changed them)
+                        return hxl.model.Row(columns[i], values, row_numbers[i], copy_values=False)
+                    # pass the values on to the next filter in the chain
+                    scratch_row.columns = columns[i]
+                    scratch_row.values = values
+                    scratch_row.row_number = row_numbers[i]
+                    row = scratch_row
 
 
 class AbstractCachingFilter(AbstractBaseFilter):
@@ -366,6 +509,12 @@ class AbstractCachingFilter(AbstractBaseFilter):
     def __iter__(self):
         return AbstractCachingFilter._Iterator(self)
 
+    def _explain(self, rows):
+        """Caching filters hold all of their rows in memory."""
+        plan = super()._explain(rows)
+        plan.update(kind='caching', rows_held=rows)
+        return plan
+
     class _Iterator:
         """Internal iterator class to return the filtered rows."""
 
@@ -458,20 +607,29 @@ class Aggregator(object):
         #
         # Aggregating values
         #
-        value = row.get(self.pattern)
+        # (like row.get(), but we need the column to find its shared type cache)
+        value = None
+        values = row.values
+        for i in hxl.model.ColumnIndex.for_columns(row.columns).get_indices(self.pattern):
+            if i >= len(values):
+                break
+            if values[i]:
+                value = values[i]
+                column = row.columns[i]
+                break
 
         # Skip empty values
         if hxl.datatypes.is_empty(value):
             return
 
         # Numbers only for sum and average
-        datatype = hxl.datatypes.typeof(value, self.pattern)
+        # (every group's aggregator, and every other consumer of the column, shares the cache of typed values)
+        datatype, normalised = hxl.model.ColumnType.for_column(column).classify(value)
         if self.type in ['sum', 'average'] and datatype != 'number':
             logup("Cannot use as a numeric value for aggregation; skipping.", {"value": value})
             logger.warning("Cannot use %s as a numeric value for aggregation; skipping.", value)
             return
 
-        normalised = hxl.datatypes.normalise(value, self.pattern)
         self.total += 1
 
         # aggregate as appropriate
@@ -627,6 +785,8 @@ class AddColumnsFilter(AbstractStreamingFilter):
         """If True, add new columns before existing ones"""
         self.const_values = None
         """Constant values to add to the new columns"""
+        self.width = None
+        """Number of source columns"""
 
     def filter_columns(self):
         """Internal: return the new columns list
@@ -638,17 +798,23 @@ class AddColumnsFilter(AbstractStreamingFilter):
         else:
             new_columns = self.source.columns + new_columns
         self.const_values = [spec[1] for spec in self.specs]
+        self.width = len(self.source.columns)
         return new_columns
 
     def filter_row(self, row):
         """Internal: return each row with the new fixed value(s) attached.
         Will execute pattern substitutions inside double braces for the fixed values.
+        When adding the new values at the end, pad or truncate a ragged row
+        to the number of source columns first, so the values line up with
+        the new columns.
         @returns: a list of values, including the fixed values for new columns
         """
-        values = copy.copy(row.values)
         if self.before:
-            return self._subst(row, self.const_values) + values
+            return self._subst(row, self.const_values) + row.values
         else:
+            values = row.values
+            if len(values) != self.width:
+                values = (values + [''] * self.width)[:self.width]
             return values + self._subst(row, self.const_values)
 
     _SUBST_PATTERN = r'{{(.+?)}}' # non-greedy expression
@@ -698,6 +864,10 @@ class AddColumnsFilter(AbstractStreamingFilter):
         else:
             raise HXLFilterException("Badly formatted new-column spec: " + spec)
 
+    def _can_parallelise(self):
+        """The filter looks only at one row at a time (see L{parallel})."""
+        return True
+
     @staticmethod
     def _load(source, spec):
         """New instance from a JSON-style dictionary.
@@ -710,6 +880,30 @@ class AddColumnsFilter(AbstractStreamingFilter):
             before=opt_arg(spec, 'before', False)
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Add the columns used in substitution formulas to the columns needed (see L{from_recipe})."""
+        specs = req_arg(spec, 'specs')
+        if isinstance(specs, six.string_types):
+            specs = [specs]
+        for column_spec in specs:
+            value = AddColumnsFilter.parse_spec(column_spec)[1]
+            for formula in re.findall(AddColumnsFilter._SUBST_PATTERN, value):
+                patterns = feval.patterns(formula)
+                if patterns is None:
+                    return None
+                needs.add(patterns)
+        return needs
+
+    @staticmethod
+    def _modifies(spec):
+        """The new columns are the only ones changed (see L{from_recipe})."""
+        specs = req_arg(spec, 'specs')
+        if isinstance(specs, six.string_types):
+            specs = [specs]
+        columns = [AddColumnsFilter.parse_spec(column_spec)[0] for column_spec in specs]
+        return [hxl.model.TagPattern(column.tag, column.attributes, is_absolute=True) for column in columns]
+
 
 class AppendFilter(AbstractBaseFilter):
 
@@ -808,7 +1002,7 @@ class AppendFilter(AbstractBaseFilter):
         @returns: the output list of L{hxl.model.Column} objects
         """
 
-        columns_out = copy.deepcopy(self.source.columns)
+        columns_out = [column.freeze() for column in self.source.columns]
 
         for i, append_source in enumerate(self.append_sources):
 
@@ -827,7 +1021,7 @@ class AppendFilter(AbstractBaseFilter):
                     # no -- we need to add a new column
                     if self.add_extra_columns:
                         self._column_positions[i][j] = len(columns_out)
-                        columns_out.append(copy.deepcopy(column))
+                        columns_out.append(column.freeze())
                     else:
                         self._column_positions[i][j] = None
 
@@ -842,6 +1036,12 @@ class AppendFilter(AbstractBaseFilter):
         self.columns # make sure this is triggered first
         return AppendFilter._Iterator(self)
 
+    def _explain(self, rows):
+        """The appended sources add an unknown number of rows."""
+        plan = super()._explain(None)
+        plan['extra_sources'] = list(self.append_sources)
+        return plan
+
     class _Iterator:
         """Custom iterator to return the contents of all sources, in sequence."""
 
@@ -868,7 +1068,8 @@ class AppendFilter(AbstractBaseFilter):
 
                 row_out = hxl.model.Row(
                     columns=self.outer.columns,
-                    values=copy.deepcopy(self.outer._template_row)
+                    values=list(self.outer._template_row),
+                    copy_values=False
                 )
 
                 for i, value in enumerate(row_in.values):
@@ -988,8 +1189,8 @@ class CacheFilter(AbstractBaseFilter):
         return True
 
     def filter_columns(self):
-        """@returns: a deep copy of the source columns"""
-        return copy.deepcopy(self.source.columns)
+        """@returns: frozen versions of the source columns (shared when the source columns are already frozen)"""
+        return [column.freeze() for column in self.source.columns]
 
     def __iter__(self):
 
@@ -1004,8 +1205,20 @@ class CacheFilter(AbstractBaseFilter):
                 else:
                     self.cached_rows.append(row)
 
-        # return the iterator over the cached rows (repeatable)
-        return iter(self.cached_rows)
+        # return copies of the cached rows (repeatable), so that downstream changes can't leak into the cache
+        # (the rows get the frozen columns, so everything reading the cache shares their type caches)
+        columns = self.columns
+        return (
+            hxl.model.Row(columns, row.values, row.row_number, row.source_row_number) for row in self.cached_rows
+        )
+
+    def _explain(self, rows):
+        """The cache holds all of its rows (up to L{max_rows}) in memory."""
+        if rows is not None and self.max_rows is not None:
+            rows = min(rows, self.max_rows)
+        plan = super()._explain(rows)
+        plan.update(kind='caching', rows_held=rows)
+        return plan
 
     @staticmethod
     def _load(source, spec):
@@ -1015,6 +1228,11 @@ class CacheFilter(AbstractBaseFilter):
             max_rows=opt_arg(spec, 'max_rows', None)
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """The cache doesn't use any columns itself (see L{from_recipe})."""
+        return needs
+
 
 class CleanDataFilter(AbstractStreamingFilter):
     """Data-cleaning filter.
@@ -1111,19 +1329,41 @@ class CleanDataFilter(AbstractStreamingFilter):
             self.source = self.source.cache();
             self.date_dayfirst = self._guess_dayfirst()
 
+        self._cleaned_indices = None
+        """Indices of the columns to clean (see L{_get_cleaned_indices})"""
+
     def filter_row(self, row):
-        """@returns: cleaned row data"""
+        """@returns: cleaned row data (values in the other columns are left as they are)"""
         if hxl.model.RowQuery.match_list(row, self.queries):
             # if there are no queries, or row matches at least one
             columns = self.columns
-            values = copy.copy(row.values)
-            for i in range(min(len(values), len(columns))):
-                values[i] = self._clean_value(values[i], columns[i])
+            values = row.values
+            for i in self._get_cleaned_indices():
+                if i >= len(values):
+                    break
+                old_value = values[i]
+                new_value = self._clean_value(old_value, columns[i])
+                if new_value != old_value or not isinstance(old_value, str):
+                    # copy on the first change only
+                    if values is row.values:
+                        values = list(values)
+                    values[i] = new_value
             return values
         else:
             # otherwise, leave as-is
             return row.values
 
+    def _get_cleaned_indices(self):
+        """Get the indices of the columns that any cleaning option applies to.
+        @returns: a tuple of 0-based column indices, in order
+        """
+        if self._cleaned_indices is None:
+            patterns = self.whitespace + self.upper + self.lower + self.date + self.number + self.latlon
+            self._cleaned_indices = tuple(
+                i for i, column in enumerate(self.columns) if self._match_patterns(patterns, column)
+            )
+        return self._cleaned_indices
+
     def _guess_dayfirst(self):
         """Guess whether the default should be DD-MM-YYYY or MM-DD-YYYY
         @returns: true if we should default to dayfirst format
@@ -1177,7 +1417,7 @@ class CleanDataFilter(AbstractStreamingFilter):
         if self._match_patterns(self.date, column):
             if value:
                 try:
-                    value = hxl.datatypes.normalise_date(value, self.date_dayfirst)
+                    value = hxl.model.ColumnType.for_column(column, dayfirst=self.date_dayfirst).normalise_date(value)
                     if self.date_format is not None:
                         value = dateutil.parser.parse(value).strftime(self.date_format)
                 except ValueError:
@@ -1261,6 +1501,18 @@ class CleanDataFilter(AbstractStreamingFilter):
                     return True
             return False
 
+    def _explain(self, rows):
+        """Cleaning dates takes an extra pass to guess the date format."""
+        plan = super()._explain(rows)
+        if self.date:
+            plan['passes'] += 1
+            plan['notes'].append('caches its source to guess the date format')
+        return plan
+
+    def _can_parallelise(self):
+        """The filter looks only at one row at a time (see L{parallel})."""
+        return True
+
     @staticmethod
     def _load(source, spec):
         """Create a new clean-data filter from a dict spec.
@@ -1280,6 +1532,26 @@ class CleanDataFilter(AbstractStreamingFilter):
             queries=opt_arg(spec, 'queries', [])
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Add the columns used in the queries, and all the date columns (for guessing the date format), to the columns needed (see L{from_recipe})."""
+        return _add_query_patterns(
+            needs.add(hxl.model.TagPattern.parse_list(opt_arg(spec, 'date', []))),
+            opt_arg(spec, 'queries', [])
+        )
+
+    @staticmethod
+    def _modifies(spec):
+        """Return the patterns for the columns cleaned (see L{from_recipe}); values in other columns are left as they are.
+        Date cleaning guesses the date format from all of the rows, so rows can't be removed ahead of it.
+        """
+        if opt_arg(spec, 'date'):
+            return None
+        patterns = []
+        for property in ('whitespace', 'upper', 'lower', 'number', 'latlon',):
+            patterns += hxl.model.TagPattern.parse_list(opt_arg(spec, property, []))
+        return patterns
+
 
 class ColumnFilter(AbstractStreamingFilter):
     """Composable filter class to remove columns from a HXL dataset.
@@ -1332,7 +1604,7 @@ class ColumnFilter(AbstractStreamingFilter):
         columns_out = []
         for i in range(len(columns_in)):
             if self._test_column(columns_in[i]):
-                columns_out.append(copy.deepcopy(columns_in[i]))
+                columns_out.append(columns_in[i].freeze())
                 self.indices.append(i) # save index to avoid retesting for data
         return columns_out
 
@@ -1346,6 +1618,19 @@ class ColumnFilter(AbstractStreamingFilter):
                 pass # don't add anything
         return values
 
+    def filter_batch(self, rows):
+        """@returns: filtered lists of row values, without the bounds checks for rows that are long enough"""
+        indices = self.indices
+        min_length = max(indices) + 1 if indices else 0
+        result = []
+        for row in rows:
+            values = row.values
+            if len(values) >= min_length:
+                result.append([values[i] for i in indices])
+            else:
+                result.append(self.filter_row(row))
+        return result
+
     def _test_column(self, column):
         """Test whether a column should be included in the output.  If there
         is an include list, it must be in that list; if there is an
@@ -1377,6 +1662,10 @@ class ColumnFilter(AbstractStreamingFilter):
         # not an include list, and no reason to exclude
         return True
 
+    def _can_parallelise(self):
+        """The filter looks only at one row at a time (see L{parallel})."""
+        return True
+
     @staticmethod
     def _load(source, spec):
         """Create a filter object from a JSON-like spec.
@@ -1396,6 +1685,17 @@ class ColumnFilter(AbstractStreamingFilter):
                 skip_untagged=opt_arg(spec, 'skip_untagged')
             )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Remove the columns that this filter drops from the columns needed (see L{from_recipe})."""
+        if needs.is_conditional:
+            # a later filter's choice of columns depends on which ones this filter keeps
+            return None
+        elif spec.get('filter') == 'with_columns':
+            return needs.restrict(hxl.model.TagPattern.parse_list(req_arg(spec, 'includes')))
+        else:
+            return needs.restrict(hxl.model.TagPattern.parse_list(req_arg(spec, 'excludes')), exclude=True)
+
 
 class CountFilter(AbstractCachingFilter):
     """Composable filter class to aggregate rows in a HXL dataset (like a pivot table)
@@ -1428,15 +1728,31 @@ class CountFilter(AbstractCachingFilter):
     specific fields. This example will count only the rows where C{#adm1} is set to "Coast"::
 
       filter = hxl.data(url).count('org', queries='adm1=Coast')
+
+    For keys with very many distinct values, use the I{max_groups}
+    argument to limit the number of groups aggregated in memory at
+    once. Rows for any further keys go to temporary files,
+    partitioned by a hash of the key, and the filter aggregates each
+    file separately afterwards. The result is the same::
+
+      filter = hxl.data(url).count(['adm4+code', 'date'], max_groups=100000)
     """
 
-    def __init__(self, source, patterns, aggregators=None, queries=[]):
+    SPILL_PARTITIONS = 16
+    """Number of temporary files for rows that don't fit within I{max_groups}"""
+
+    MAX_SPILL_LEVELS = 4
+    """Maximum times to repartition a temporary file that still has too many groups"""
+
+    def __init__(self, source, patterns, aggregators=None, queries=[], max_groups=None):
         """Construct a new count filter
         If the caller does not supply any aggregators, use "count() as Count#meta+count"
         @param source: a L{hxl.model.Dataset}
         @param patterns: a single L{tag pattern<hxl.model.TagPattern>} or list of tag patterns that, together, form a unique key for counting.
         @param aggregators: one or more Aggregator objects or string representations to define the output.
         @param queries: an optional list of L{row queries<hxl.model.RowQuery>} to filter the rows being counted.
+        @param max_groups: the maximum number of groups to aggregate in memory at once, or C{None} for no limit.
+        @exception HXLFilterException: if I{max_groups} is less than 1
         """
         super().__init__(source)
         self.patterns = hxl.model.TagPattern.parse_list(patterns)
@@ -1444,6 +1760,11 @@ class CountFilter(AbstractCachingFilter):
             aggregators = 'count() as Count#meta+count'
         self.aggregators = Aggregator.parse_list(aggregators)
         self.queries = self._setup_queries(queries)
+        if max_groups is not None:
+            max_groups = int(max_groups)
+            if max_groups < 1:
+                raise HXLFilterException('max_groups must be at least 1: {}'.format(max_groups))
+        self.max_groups = max_groups
 
     def filter_columns(self):
         """@returns: the filtered columns"""
@@ -1453,7 +1774,7 @@ class CountFilter(AbstractCachingFilter):
         for pattern in self.patterns:
             column = pattern.find_column(self.source.columns)
             if column:
-                columns.append(copy.deepcopy(column))
+                columns.append(column.freeze())
             else:
                 columns.append(hxl.Column())
 
@@ -1468,35 +1789,142 @@ class CountFilter(AbstractCachingFilter):
 
         raw_data = []
 
-        # each item is a sequence containing a tuple of key values and an _Aggregator object
-        for aggregate in self._aggregate_data():
-            raw_data.append(
-                list(aggregate[0]) + [aggregator.value if aggregator.value is not None else '' for aggregator in aggregate[1]]
-            )
+        # each item is a sequence containing a tuple of key values and a list of aggregated values
+        for key, values in self._aggregate_data():
+            raw_data.append(list(key) + values)
 
         return raw_data
 
     def _aggregate_data(self):
         """Read the entire source dataset and produce saved aggregate data.
-        @returns: the aggregated values as raw data
+        @returns: a sorted list of (key, values) pairs, with one aggregated value for each aggregator
         """
-        aggregators = {}
+        if isinstance(self.source, hxl.model.ColumnarDataset):
+            result = self._aggregate_columnar()
+            if result is not None:
+                return result
 
-        # read the whole source dataset at once
-        for row in self.source:
-            # will always match if there are no queries
-            if hxl.model.RowQuery.match_list(row, self.queries):
-                # get the values in the order we need them
-                values = [hxl.datatypes.normalise_space(row.get(pattern, default='')) for pattern in self.patterns]
-                # make a dict key for the aggregator
-                key = tuple(values)
-                if not key in aggregators:
-                    aggregators[key] = [copy.deepcopy(aggregator) for aggregator in self.aggregators]
-                for aggregator in aggregators[key]:
+        def keyed_rows():
+            # read the whole source dataset at once
+            for row in self.source:
+                # will always match if there are no queries
+                if hxl.model.RowQuery.match_list(row, self.queries):
+                    # get the values in the order we need them, as a dict key for the aggregators
+                    yield tuple([hxl.datatypes.normalise_space(row.get(pattern, default='')) for pattern in self.patterns]), row
+
+        # sort the aggregated values by their keys
+        return sorted(self._aggregate_rows(keyed_rows(), 0))
+
+    def _aggregate_rows(self, keyed_rows, level):
+        """Aggregate rows, spilling any beyond L{max_groups} groups to temporary files.
+        Once there are L{max_groups} groups in memory, rows for new keys go to one
+        of L{SPILL_PARTITIONS} temporary files, chosen by a hash of the key, so all
+        of the rows for a key end up in the same file in their original order.
+        The filter then aggregates each file the same way (repartitioning it if
+        it still has too many groups), so the values are identical to aggregating
+        everything in memory.
+        @param keyed_rows: an iterator of (key, row) pairs
+        @param level: the number of times these rows have already been spilled
+        @returns: an unsorted list of (key, values) pairs
+        """
+        groups = {}
+        partitions = None
+
+        try:
+            for key, row in keyed_rows:
+                aggregators = groups.get(key)
+                if aggregators is None:
+                    if self.max_groups is not None and len(groups) >= self.max_groups and level < self.MAX_SPILL_LEVELS:
+                        if partitions is None:
+                            partitions = [tempfile.TemporaryFile() for i in range(self.SPILL_PARTITIONS)]
+                        pickle.dump((key, row.values,), partitions[hash((level, key,)) % self.SPILL_PARTITIONS])
+                        continue
+                    aggregators = groups[key] = [copy.deepcopy(aggregator) for aggregator in self.aggregators]
+                for aggregator in aggregators:
                     aggregator.evaluate_row(row)
 
-        # sort the aggregators by their keys
-        return sorted(aggregators.items())
+            # keep only the values, to free the aggregators before reading the spilled rows
+            result = [
+                (key, [aggregator.value if aggregator.value is not None else '' for aggregator in aggregators],)
+                for key, aggregators in groups.items()
+            ]
+            groups = None
+
+            if partitions is not None:
+                for partition in partitions:
+                    if partition.tell() > 0:
+                        partition.seek(0)
+                        result += self._aggregate_rows(self._read_spill(partition), level + 1)
+                    partition.close()
+        finally:
+            if partitions is not None:
+                for partition in partitions:
+                    partition.close()
+
+        return result
+
+    def _read_spill(self, partition):
+        """Read back the rows that L{_aggregate_rows} spilled to a temporary file.
+        @param partition: the temporary file
+        @returns: an iterator of (key, row) pairs
+        """
+        columns = self.source.columns
+        while True:
+            try:
+                key, values = pickle.load(partition)
+            except EOFError:
+                return
+            yield key, hxl.model.Row(columns, values, copy_values=False)
+
+    def _aggregate_columnar(self):
+        """Fast path for counting rows in a L{hxl.model.ColumnarDataset}.
+        Builds each key from the distinct values of the key columns, without creating rows.
+        Applies only when all aggregators are plain counts and no pattern matches more than one column.
+        @returns: the same result as L{_aggregate_data}, or None if the fast path doesn't apply
+        """
+        source = self.source
+
+        for aggregator in self.aggregators:
+            if aggregator.type != 'count':
+                return None
+
+        matches = source.match_queries(self.queries)
+        if matches is None:
+            return None
+
+        # a list of key values for each pattern, one per row
+        column_index = hxl.model.ColumnIndex.for_columns(source.columns)
+        key_lists = []
+        for pattern in self.patterns:
+            indices = column_index.get_indices(pattern)
+            if len(indices) > 1:
+                return None
+            elif indices and indices[0] < source.width:
+                names = [
+                    hxl.datatypes.normalise_space(value) if value else '' for value in source.get_distinct_values(indices[0])
+                ]
+                key_lists.append([names[code] if code is not None else '' for code in source.get_codes(indices[0])])
+            else:
+                key_lists.append([''] * source.row_count)
+
+        if key_lists:
+            keys = zip(*key_lists)
+        else:
+            keys = [()] * source.row_count
+
+        counts = {}
+        for key, matched in zip(keys, matches):
+            if matched:
+                counts[key] = counts.get(key, 0) + 1
+
+        return sorted([(key, [count] * len(self.aggregators),) for key, count in counts.items()])
+
+    def _explain(self, rows):
+        """Note when the filter may spill rows to temporary files."""
+        plan = super()._explain(rows)
+        if self.max_groups is not None:
+            plan['notes'].append('aggregates at most {} groups in memory at once, spilling other rows to temporary files'.format(self.max_groups))
+        return plan
 
     @staticmethod
     def _load(source, spec):
@@ -1508,9 +1936,19 @@ class CountFilter(AbstractCachingFilter):
             source = source,
             patterns=opt_arg(spec, 'patterns'),
             aggregators=opt_arg(spec, 'aggregators', None),
-            queries=opt_arg(spec, 'queries', [])
+            queries=opt_arg(spec, 'queries', []),
+            max_groups=opt_arg(spec, 'max_groups', None)
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """The columns needed are only the ones for the keys, aggregators, and queries (see L{from_recipe})."""
+        needs = _ColumnNeeds(hxl.model.TagPattern.parse_list(opt_arg(spec, 'patterns')))
+        for aggregator in Aggregator.parse_list(opt_arg(spec, 'aggregators', [])):
+            if aggregator.pattern is not None:
+                needs.add([aggregator.pattern])
+        return _add_query_patterns(needs, opt_arg(spec, 'queries', []))
+
 
 class DeduplicationFilter(AbstractStreamingFilter):
     """Composable filter to deduplicate a HXL dataset.
@@ -1548,10 +1986,17 @@ class DeduplicationFilter(AbstractStreamingFilter):
                 return None
             # if we get to here, we haven't seen the row before
             self.seen_map.add(key)
-            return copy.copy(row.values)
+            return row.values
         else:
             return row.values
 
+    def _explain(self, rows):
+        """The filter keeps a key for every distinct row."""
+        plan = super()._explain(rows)
+        plan['rows_held'] = rows
+        plan['notes'].append('keeps a key for every distinct row')
+        return plan
+
     @staticmethod
     def _load(source, spec):
         """Create a dedup filter from a dict spec.
@@ -1565,6 +2010,14 @@ class DeduplicationFilter(AbstractStreamingFilter):
             queries=opt_arg(spec, 'queries', [])
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Add the columns compared to the columns needed (all columns if there are no patterns; see L{from_recipe})."""
+        patterns = hxl.model.TagPattern.parse_list(opt_arg(spec, 'patterns', []))
+        if not patterns:
+            return None
+        return _add_query_patterns(needs.add(patterns), opt_arg(spec, 'queries', []))
+
 
 class ExpandListsFilter(AbstractBaseFilter):
     """Expand in-cell lists by duplicating data rows.
@@ -1582,9 +2035,7 @@ class ExpandListsFilter(AbstractBaseFilter):
         """ Remove the +list attribute from targeted columns """
         columns = list(self.source.columns)
         for index in self.column_indices:
-            column = copy.deepcopy(columns[index])
-            column.remove_attribute('list')
-            columns[index] = column
+            columns[index] = columns[index].freeze().remove_attribute('list')
         return columns
 
     def scan_columns(self, patterns):
@@ -1635,14 +2086,14 @@ class ExpandListsFilter(AbstractBaseFilter):
                 nrows = max([len(item) for item in value_lists])
 
                 for i in range(0, nrows):
-                    values = copy.deepcopy(row.values)
+                    values = list(row.values)
                     for j, v in enumerate(value_lists):
                         index = self.column_indices[j]
                         if len(v) <= i:
                             values[index] = ""
                         else:
                             values[index] = v[i]
-                    yield hxl.model.Row(self.columns, values)
+                    yield hxl.model.Row(self.columns, values, copy_values=False)
 
             else:
                 # generate the cartesian product of all the lists
@@ -1652,7 +2103,7 @@ class ExpandListsFilter(AbstractBaseFilter):
 
                 # yield all of the resulting rows
                 for row_values in row_value_list:
-                    values = copy.deepcopy(row.values)
+                    values = list(row.values)
 
                     # make sure the value list is long enough
                     if len(values) < min_length:
@@ -1663,8 +2114,12 @@ class ExpandListsFilter(AbstractBaseFilter):
                         values[self.column_indices[i]] = value
 
                     # yield a new row
-                    yield hxl.model.Row(self.columns, values)
+                    yield hxl.model.Row(self.columns, values, copy_values=False)
+
 
+    def _explain(self, rows):
+        """The number of rows depends on the lists in the data."""
+        return super()._explain(None)
 
     @staticmethod
     def _load(source, spec):
@@ -1728,8 +2183,9 @@ class ExplodeFilter(AbstractBaseFilter):
         for spec in self._plan:
             if isinstance(spec, list):
                 model_column = self.source.columns[spec[0]]
-                columns.append(copy.deepcopy(model_column).remove_attribute('label').add_attribute(self.header_attribute))
-                columns.append(copy.deepcopy(model_column).remove_attribute('label').add_attribute(self.value_attribute))
+                model_column = model_column.freeze().remove_attribute('label')
+                columns.append(model_column.add_attribute(self.header_attribute))
+                columns.append(model_column.add_attribute(self.value_attribute))
             else:
                 columns.append(self.source.columns[spec])
         return columns
@@ -1738,7 +2194,7 @@ class ExplodeFilter(AbstractBaseFilter):
         """Custom iterator to produce exploded rows."""
         for row in self.source:
             for values in self._expand(row, self._plan):
-                yield hxl.model.Row(self.columns, values)
+                yield hxl.model.Row(self.columns, values, copy_values=False)
 
     def _expand(self, row, plan, values_in=[]):
         """Recursive generator for the row data.
@@ -1781,6 +2237,14 @@ class ExplodeFilter(AbstractBaseFilter):
                 plan.append(index)
         return plan
 
+    def _explain(self, rows):
+        """Each row becomes one row for each combination of labelled columns."""
+        if rows is not None:
+            for spec in self._plan:
+                if isinstance(spec, list):
+                    rows *= len(spec)
+        return super()._explain(rows)
+
     @staticmethod
     def _load(source, spec):
         """Create an explode filter from a dict spec.
@@ -1795,6 +2259,52 @@ class ExplodeFilter(AbstractBaseFilter):
         )
 
 
+class HashingFilter(AbstractStreamingFilter):
+    """
+    Composable filter class to hash a dataset while it streams
+
+    The output is identical to the input; the hash is computed as a
+    side effect and stored in the filter itself, so that a dataset can
+    be hashed while it's being written or processed elsewhere,
+    without a second pass. After a full pass, L{hexdigest} is the
+    same as L{hxl.model.Dataset.get_data_hash} with the same algorithm.
+    As a result, there is no corresponding command-line utility.
+
+    Usage:
+
+    <pre>
+    hasher = hxl.data(url).hasher()
+    hxl.input.write_hxl(sys.stdout, hasher)
+    print(hasher.hexdigest)
+    </pre>
+    """
+
+    def __init__(self, source, algorithm='md5'):
+        """
+        @param source: the HXL data source
+        @param algorithm: the digest algorithm (see L{hxl.model.DatasetHasher}; default: "md5")
+        """
+        super().__init__(source)
+        self.algorithm = algorithm
+        self._hasher = hxl.model.DatasetHasher(algorithm) # fail early for a bad algorithm
+
+    @property
+    def hexdigest(self):
+        """The hash of the headers, hashtags, and rows that have streamed so far.
+        This is the hash of the whole dataset only after a complete pass.
+        """
+        return self._hasher.hexdigest()
+
+    def filter_row(self, row):
+        self._hasher.update_values(row.values)
+        return row.values
+
+    def _start_pass(self):
+        """Start a new hash for each pass."""
+        self._hasher = hxl.model.DatasetHasher(self.algorithm)
+        self._hasher.update_columns(self.source.columns)
+
+
 class ImplodeFilter(AbstractBaseFilter):
     """Implode a long (series) dataset into a wide version.
 
@@ -1862,7 +2372,7 @@ class ImplodeFilter(AbstractBaseFilter):
             # extra, wide values
             for label in sorted(self.labels):
                 values.append(self.rows[key].get(label, ""))
-            yield hxl.model.Row(self.columns, values)
+            yield hxl.model.Row(self.columns, values, copy_values=False)
 
     def process(self):
         # check if we've already done all this
@@ -1910,7 +2420,7 @@ class ImplodeFilter(AbstractBaseFilter):
         # iterate through the dataset
         for row in self.source:
 
-            values = list(row.values)
+            values = row.values
 
             # get the "wide" label and value
             label = ""
@@ -1939,6 +2449,16 @@ class ImplodeFilter(AbstractBaseFilter):
             else:
                 self.rows[key][label] = value
 
+    def _explain(self, rows):
+        """The filter reads all of its source into memory (including to work out its columns)."""
+        plan = super()._explain(rows)
+        plan.update(kind='caching', rows_held=rows)
+        if not self.processed:
+            # don't read the data just to explain the filter
+            plan['columns'] = None
+            plan['notes'].append('reads all of its source to work out its columns')
+        return plan
+
     @staticmethod
     def _load(source, spec):
         """Create an implode filter from a dict spec.
@@ -1953,6 +2473,104 @@ class ImplodeFilter(AbstractBaseFilter):
         )
 
 
+class MembershipFilter(AbstractStreamingFilter):
+    """
+    Composable filter class to select rows by whether their keys appear in a reference dataset.
+
+    This is a semi-join (or, reversed, an anti-join). The key values
+    from the reference dataset are read once into a hash set, so each
+    row needs only a lookup, however many keys the reference dataset
+    has. Keys are normalised and combined the same way as for
+    L{MergeDataFilter}; reference rows whose key values are all empty
+    are ignored.
+
+    Usage:
+
+    <pre>
+    priority_districts = hxl.data(priority_url)
+    hxl.data(url).with_rows_in(priority_districts, '#adm2+code')
+    hxl.data(url).without_rows_in(priority_districts, '#adm2+code')
+    </pre>
+    """
+
+    def __init__(self, source, reference_source, keys, reverse=False, reference_keys=None):
+        """
+        Constructor
+        @param source: the HXL data source
+        @param reference_source: the HXL data source containing the keys to look for
+        @param keys: a tag pattern or list of tag patterns for the key columns
+        @param reverse: if True, select rows whose keys do I{not} appear (default: False)
+        @param reference_keys: (optional) tag patterns for the key columns in the reference source, if different
+        """
+        super().__init__(source)
+        self.reference_source = hxl.data(reference_source)
+        """The source dataset for the keys"""
+        self.keys = hxl.model.TagPattern.parse_list(keys)
+        """The key columns in the source"""
+        self.reference_keys = hxl.model.TagPattern.parse_list(reference_keys) if reference_keys else self.keys
+        """The key columns in the reference source"""
+        if len(self.keys) != len(self.reference_keys):
+            raise HXLFilterException("Need the same number of keys for the source and reference datasets")
+        self.reverse = reverse
+        self._key_set = None
+        """Set of key tuples from the reference source (read on first use)"""
+
+    def filter_row(self, row):
+        if self._key_set is None:
+            self._key_set = self._read_keys()
+        for key in self._make_keys(row, self.keys):
+            if key in self._key_set:
+                return None if self.reverse else row.values
+        return row.values if self.reverse else None
+
+    @staticmethod
+    def _make_keys(row, patterns):
+        """Return all possible key-value combinations for the row as tuples (see L{MergeDataFilter})."""
+        if len(patterns) == 1:
+            # common case: no combinations needed
+            return [(hxl.datatypes.normalise_string(value),) for value in row.get_all(patterns[0], default='')]
+        candidate_values = []
+        for pattern in patterns:
+            candidate_values.append([hxl.datatypes.normalise_string(value) for value in row.get_all(pattern, default='')])
+        return [tuple(value) for value in list_product(candidate_values)]
+
+    def _read_keys(self):
+        """Read the keys from the reference dataset into a set."""
+        key_set = set()
+        for row in self.reference_source:
+            for key in self._make_keys(row, self.reference_keys):
+                if any(key):
+                    key_set.add(key)
+        return key_set
+
+    def _explain(self, rows):
+        """The filter keeps the keys from the reference dataset in memory."""
+        plan = super()._explain(rows)
+        plan.update(rows_held=None, extra_sources=[self.reference_source], extra_sources_cached=True)
+        plan['notes'].append('keeps the keys from the reference dataset')
+        return plan
+
+    @staticmethod
+    def _load(source, spec):
+        """Create a membership filter from a dict spec.
+        @param source: the upstream data source
+        @param spec: the JSON-like filter specification
+        @returns: a L{MembershipFilter} object
+        """
+        return MembershipFilter(
+            source=source,
+            reference_source=req_arg(spec, 'reference_source'),
+            keys=req_arg(spec, 'keys'),
+            reverse=(spec.get('filter') == 'without_rows_in'),
+            reference_keys=opt_arg(spec, 'reference_keys')
+        )
+
+    @staticmethod
+    def _project(spec, needs):
+        """Add the key columns to the columns needed (see L{from_recipe})."""
+        return needs.add(hxl.model.TagPattern.parse_list(req_arg(spec, 'keys')))
+
+
 class MergeDataFilter(AbstractStreamingFilter):
     """Composable filter class to merge values from two HXL datasets.
 
@@ -2066,9 +2684,8 @@ class MergeDataFilter(AbstractStreamingFilter):
         if self._merge_values is None:
             self._merge_values = self._read_merge()
 
-        # Make an initial array of the correct length
-        values = copy.copy(row.values)
-        values += ([''] * (len(self.columns) - len(row.values)))
+        # Make an initial array of the correct length (always a new list)
+        values = row.values + ([''] * (len(self.columns) - len(row.values)))
 
         # Look up the merge values, based on the keys
         for key in self._make_keys(row):
@@ -2118,6 +2735,13 @@ class MergeDataFilter(AbstractStreamingFilter):
 
         return merge_values
 
+    def _explain(self, rows):
+        """The filter keeps the merged values from the merge dataset in memory."""
+        plan = super()._explain(rows)
+        plan.update(rows_held=None, extra_sources=[self.merge_source], extra_sources_cached=True)
+        plan['notes'].append('keeps the merged values from the merge dataset')
+        return plan
+
     @staticmethod
     def _load(source, spec):
         """Create a merge filter from a dict spec.
@@ -2165,19 +2789,23 @@ class RenameFilter(AbstractStreamingFilter):
         return [self._rename_column(column) for column in self.source.columns]
 
     def filter_row(self, row):
-        """@returns: a deep copy of the row's values"""
-        return copy.copy(row.values)
+        """@returns: the row's values, unchanged"""
+        return row.values
 
     def _rename_column(self, column):
-        """@returns: a copy of the column object, with a new name if needed"""
+        """@returns: a frozen column object, with a new name if needed"""
         for spec in self.rename:
             norm = hxl.datatypes.normalise_string
             if spec[0].match(column) and (not spec[2] or norm(spec[2]) == norm(column.header)):
-                new_column = copy.deepcopy(spec[1])
-                if new_column.header is None:
-                    new_column.header = column.header
-                return new_column
-        return copy.deepcopy(column)
+                new_column = spec[1]
+                header = column.header if new_column.header is None else new_column.header
+                return hxl.model.FrozenColumn(
+                    tag=new_column.tag,
+                    attributes=new_column.attribute_list,
+                    header=header,
+                    column_number=new_column.column_number
+                )
+        return column.freeze()
 
     RENAME_PATTERN = r'^\s*(?:([^#]*)#)?({token}(?:\s*[+-]{token})*)\s*:\s*(?:([^#]*)#)?({token}(?:\s*[+]{token})*)\s*$'.format(
         token=hxl.datatypes.TOKEN_PATTERN
@@ -2203,6 +2831,10 @@ class RenameFilter(AbstractStreamingFilter):
         else:
             return s
 
+    def _can_parallelise(self):
+        """The filter looks only at one row at a time (see L{parallel})."""
+        return True
+
     @staticmethod
     def _load(source, spec):
         """Create a rename filter from a dict spec.
@@ -2215,6 +2847,17 @@ class RenameFilter(AbstractStreamingFilter):
             rename=req_arg(spec, 'specs')
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Add the columns that might be renamed to the columns needed (see L{from_recipe})."""
+        if needs.is_conditional:
+            # a later filter's choice of columns depends on the new names
+            return None
+        specs = req_arg(spec, 'specs')
+        if isinstance(specs, six.string_types):
+            specs = [specs]
+        return needs.add([RenameFilter.parse_rename(rename)[0] for rename in specs])
+
 
 class JSONPathFilter(AbstractStreamingFilter):
     """Extract values from a JSON string expression using JSONPath
@@ -2241,7 +2884,7 @@ class JSONPathFilter(AbstractStreamingFilter):
         if self._indices is None:
             self._indices = self._get_indices(self.patterns)
 
-        values = list(row.values)
+        values = row.values
 
         if hxl.model.RowQuery.match_list(row, self.queries):
 
@@ -2249,6 +2892,9 @@ class JSONPathFilter(AbstractStreamingFilter):
                 try:
                     expr = json.loads(values[i])
                     results = [match.value for match in self.path.find(expr)]
+                    # copy on the first change only
+                    if values is row.values:
+                        values = list(values)
                     if len(results) == 0:
                         values[i] = ''
                     elif len(results) == 1:
@@ -2261,6 +2907,10 @@ class JSONPathFilter(AbstractStreamingFilter):
 
         return values
 
+    def _can_parallelise(self):
+        """The filter looks only at one row at a time (see L{parallel})."""
+        return True
+
     @staticmethod
     def _load(source, spec):
         """Create a JSONPath filter from a dict spec.
@@ -2275,6 +2925,16 @@ class JSONPathFilter(AbstractStreamingFilter):
             queries=opt_arg(spec, 'queries')
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Add the columns used in the queries to the columns needed (see L{from_recipe})."""
+        return _add_query_patterns(needs, opt_arg(spec, 'queries'))
+
+    @staticmethod
+    def _modifies(spec):
+        """Return the patterns for the columns changed, or C{None} for all columns (see L{from_recipe})."""
+        return hxl.model.TagPattern.parse_list(opt_arg(spec, 'patterns')) or None
+
 
 class FillDataFilter(AbstractStreamingFilter):
     """Fill empty cells in a dataset.
@@ -2296,18 +2956,23 @@ class FillDataFilter(AbstractStreamingFilter):
 
     def filter_row(self, row):
         """@returns: row values with some empty values possibly filled in"""
-        values = list(row.values)
+        values = row.values
 
         # Guessing at empty cells (column-wise only)
         if self._indices is None:
             self._indices = self._get_indices(self.patterns)
         for i in self._indices:
             if i >= len(values):
-                values += [''] * (i - len(values) + 1) # make sure list is long enough
+                values = values + [''] * (i - len(values) + 1) # make sure list is long enough (new list)
             if values[i]:
                 self._saved[i] = values[i]
             elif (not self.queries) or (hxl.model.RowQuery.match_list(row, self.queries)):
-                values[i] = self._saved[i] if self._saved.get(i) else ''
+                fill_value = self._saved[i] if self._saved.get(i) else ''
+                if values[i] != fill_value:
+                    # copy on the first change only
+                    if values is row.values:
+                        values = list(values)
+                    values[i] = fill_value
 
         return values
 
@@ -2324,6 +2989,11 @@ class FillDataFilter(AbstractStreamingFilter):
             queries=opt_arg(spec, 'queries'),
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Add the columns used in the queries to the columns needed (see L{from_recipe})."""
+        return _add_query_patterns(needs, opt_arg(spec, 'queries'))
+
 
 class ReplaceDataFilter(AbstractStreamingFilter):
     """
@@ -2358,7 +3028,7 @@ class ReplaceDataFilter(AbstractStreamingFilter):
         """@returns: the row values with replacements"""
         if hxl.model.RowQuery.match_list(row, self.queries):
             replaced = set()
-            values = copy.copy(row.values)
+            values = row.values
             for i, replacement in enumerate(self.replacements):
                 indices = self.indices[i]
                 for index in indices:
@@ -2366,6 +3036,9 @@ class ReplaceDataFilter(AbstractStreamingFilter):
                         new_value = replacement.sub(values[index])
                         if new_value is not False:
                             replaced.add(index)
+                            # copy on the first change only
+                            if values is row.values:
+                                values = list(values)
                             values[index] = new_value
             return values
         else:
@@ -2443,6 +3116,10 @@ class ReplaceDataFilter(AbstractStreamingFilter):
                         ))
             return replacements
 
+    def _can_parallelise(self):
+        """The filter looks only at one row at a time (see L{parallel})."""
+        return True
+
     @staticmethod
     def _load(source, spec):
         """Create a replace-data filter from a dict spec.
@@ -2475,6 +3152,20 @@ class ReplaceDataFilter(AbstractStreamingFilter):
             queries=opt_arg(spec, 'queries', [])
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Add the columns used in the queries to the columns needed (see L{from_recipe})."""
+        return _add_query_patterns(needs, opt_arg(spec, 'queries', []))
+
+    @staticmethod
+    def _modifies(spec):
+        """Return the patterns for the columns changed, or C{None} for all columns (see L{from_recipe}).
+        The replacements in an external map aren't known until it's loaded, so they might change any column.
+        """
+        if spec.get('filter') != 'replace_data':
+            return None
+        return hxl.model.TagPattern.parse_list(opt_arg(spec, 'pattern')) or None
+
 
 class RowCountFilter(AbstractStreamingFilter):
     """
@@ -2548,6 +3239,72 @@ class RowFilter(AbstractStreamingFilter):
                 return None
         return row.values
 
+    def filter_batch(self, rows):
+        """Filter a batch of rows, looking up the queries once for the whole batch.
+        @param rows: the rows to filter
+        @returns: the values of the rows that pass the filters
+        """
+        if self.mask or not self.queries:
+            return super().filter_batch(rows)
+        match_rows = [query.match_row for query in self.queries]
+        if len(match_rows) == 1:
+            # common case: a single query
+            match_row = match_rows[0]
+            if self.reverse:
+                return [row.values for row in rows if not match_row(row)]
+            else:
+                return [row.values for row in rows if match_row(row)]
+        reverse = self.reverse
+        return [
+            row.values for row in rows
+            if any(match_row(row) for match_row in match_rows) != reverse
+        ]
+
+    def __iter__(self):
+        """Use a column-wise fast path when reading directly from a L{hxl.model.ColumnarDataset}."""
+        matches = self._match_columnar()
+        if matches is not None:
+            return self._iter_columnar(*matches)
+        return super().__iter__()
+
+    def _can_fuse(self):
+        """Fuse with downstream filters, except when using the column-wise fast path."""
+        return not isinstance(self.source, hxl.model.ColumnarDataset)
+
+    def _can_parallelise(self):
+        """Run in worker processes, except when using the column-wise fast path (see L{parallel})."""
+        return not isinstance(self.source, hxl.model.ColumnarDataset)
+
+    def iter_batches(self, size=None):
+        """Use the same column-wise fast path as L{__iter__} where possible."""
+        matches = self._match_columnar()
+        if matches is not None:
+            return self._make_batches(self._iter_columnar(*matches), size)
+        return super().iter_batches(size)
+
+    def _match_columnar(self):
+        """Pre-compute the query results for a L{hxl.model.ColumnarDataset} source.
+        @returns: a tuple of mask and match lists, or None if the fast path doesn't apply
+        """
+        if isinstance(self.source, hxl.model.ColumnarDataset):
+            mask = self.source.match_queries(self.mask)
+            matches = self.source.match_queries(self.queries, self.reverse)
+            if mask is not None and matches is not None:
+                return (mask, matches,)
+        return None
+
+    def _iter_columnar(self, mask, matches):
+        """Generate the rows selected by pre-computed query results.
+        @param mask: a list of booleans for rows to test
+        @param matches: a list of booleans for rows that pass the queries
+        """
+        columns = self.columns
+        row_number = -1
+        for position, (masked, matched) in enumerate(zip(mask, matches)):
+            if matched or not masked:
+                row_number += 1
+                yield hxl.model.Row(columns, self.source.get_values(position), row_number, copy_values=False)
+
     @staticmethod
     def _load(source, spec):
         """Construct a row filter from a dict spec."""
@@ -2563,6 +3320,14 @@ class RowFilter(AbstractStreamingFilter):
             mask=opt_arg(spec, 'mask', [])
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Add the columns used in the queries and mask to the columns needed (see L{from_recipe})."""
+        return _add_query_patterns(
+            _add_query_patterns(needs, req_arg(spec, 'queries')),
+            opt_arg(spec, 'mask', [])
+        )
+
 
 class SortFilter(AbstractCachingFilter):
     """
@@ -2587,6 +3352,7 @@ class SortFilter(AbstractCachingFilter):
         self.sort_tags = hxl.model.TagPattern.parse_list(tags)
         self.reverse = reverse
         self._iter = None
+        self._sort_values = None
 
     def filter_rows(self):
         """Return a sorted list of values, row by row."""
@@ -2594,11 +3360,43 @@ class SortFilter(AbstractCachingFilter):
         # Figure out the indices for sort keys
         indices = self._make_indices()
 
+        if isinstance(self.source, hxl.model.ColumnarDataset) and self.source.is_rectangular:
+            return self._sort_columnar(indices)
+
         def make_key(values):
             """Closure, to get the object reference into the key method."""
             return self._make_key(indices, values)
 
-        return sorted(self.source.values, key=make_key, reverse=self.reverse)
+        # sort values for repeated strings, by date flag and value
+        self._sort_values = {}
+        try:
+            return sorted(self.source.values, key=make_key, reverse=self.reverse)
+        finally:
+            self._sort_values = None
+
+    def _sort_columnar(self, indices):
+        """Fast path for sorting a rectangular L{hxl.model.ColumnarDataset}.
+        Makes a sort value only once for each distinct value in each key column.
+        @param indices: an array of indices for the sort key (if empty, use all values)
+        @returns: a sorted list of values, row by row
+        """
+        source = self.source
+        if not indices:
+            indices = range(min(source.width, len(self.columns)))
+
+        key_lists = []
+        for index in indices:
+            tag = self.columns[index].tag
+            sort_values = [SortFilter._make_sort_value(tag, value) for value in source.get_distinct_values(index)]
+            key_lists.append([sort_values[code] for code in source.get_codes(index)])
+
+        if key_lists:
+            keys = list(zip(*key_lists))
+        else:
+            keys = [()] * source.row_count
+
+        positions = sorted(range(source.row_count), key=keys.__getitem__, reverse=self.reverse)
+        return [source.get_values(position) for position in positions]
 
     def _make_indices(self):
         """Determine the indices of the data to sort."""
@@ -2621,16 +3419,27 @@ class SortFilter(AbstractCachingFilter):
 
         if indices:
             for index in indices:
-                key.append(SortFilter._make_sort_value(self.columns[index].tag, values[index]))
+                key.append(self._get_sort_value(self.columns[index].tag, values[index]))
         else:
             # Sort everything, left to right
             for index, value in enumerate(values):
                 if index < len(self.columns):
-                    key.append(SortFilter._make_sort_value(self.columns[index].tag, value))
+                    key.append(self._get_sort_value(self.columns[index].tag, value))
 
         # convert the key to a tuple for sorting
         return tuple(key)
 
+    def _get_sort_value(self, tag, value):
+        """Look up or make the sort value for a string (see L{_make_sort_value})."""
+        cache = self._sort_values
+        if cache is None or type(value) is not str:
+            return SortFilter._make_sort_value(tag, value)
+        cache_key = (tag == '#date', value,)
+        sort_value = cache.get(cache_key)
+        if sort_value is None:
+            sort_value = cache[cache_key] = SortFilter._make_sort_value(tag, value)
+        return sort_value
+
     @staticmethod
     def _make_sort_value(tag, value):
         """
@@ -2661,6 +3470,16 @@ class SortFilter(AbstractCachingFilter):
             reverse=opt_arg(spec, 'reverse', False)
         )
 
+    @staticmethod
+    def _project(spec, needs):
+        """Add the sort keys to the columns needed (see L{from_recipe}).
+        The filter sorts on all columns if none match the keys, so all the columns are needed in that case.
+        """
+        patterns = hxl.model.TagPattern.parse_list(opt_arg(spec, 'tags', []))
+        if not patterns:
+            return None
+        return needs.add(patterns, all_if_missing=True)
+
 
 #
 # Compile a filter chain
@@ -2686,11 +3505,59 @@ LOAD_MAP = {
     'sort': SortFilter._load,
     'with_columns': ColumnFilter._load,
     'with_rows': RowFilter._load,
+    'with_rows_in': MembershipFilter._load,
     'without_columns': ColumnFilter._load,
     'without_rows': RowFilter._load,
+    'without_rows_in': MembershipFilter._load,
 }
 """Static functions for creating filters from dicts (from JSON, typically)."""
 
+PROJECTION_MAP = {
+    'add_columns': AddColumnsFilter._project,
+    'cache': CacheFilter._project,
+    'clean_data': CleanDataFilter._project,
+    'count': CountFilter._project,
+    'dedup': DeduplicationFilter._project,
+    'fill_data': FillDataFilter._project,
+    'jsonpath': JSONPathFilter._project,
+    'rename_columns': RenameFilter._project,
+    'replace_data': ReplaceDataFilter._project,
+    'replace_data_map': ReplaceDataFilter._project,
+    'sort': SortFilter._project,
+    'with_columns': ColumnFilter._project,
+    'with_rows': RowFilter._project,
+    'with_rows_in': MembershipFilter._project,
+    'without_columns': ColumnFilter._project,
+    'without_rows': RowFilter._project,
+    'without_rows_in': MembershipFilter._project,
+}
+"""Static functions for working out which source columns a recipe step needs (see L{from_recipe}).
+
+Each one takes the filter spec and the L{_ColumnNeeds} for the rest
+of the recipe, and returns the columns needed before this step (or
+C{None} for all of them). Filters that aren't listed here (such as
+append or merge_data) need all columns.
+"""
+
+MODIFIES_MAP = {
+    'add_columns': AddColumnsFilter._modifies,
+    'clean_data': CleanDataFilter._modifies,
+    'jsonpath': JSONPathFilter._modifies,
+    'replace_data': ReplaceDataFilter._modifies,
+    'replace_data_map': ReplaceDataFilter._modifies,
+}
+"""Static functions for working out which columns a row-by-row recipe step changes (see L{from_recipe}).
+
+Each one takes the filter spec, and returns a list of tag patterns
+for the columns that the step might change or add (or C{None} if it
+might change any column, or depends on the other rows). Row selections
+can move ahead of these steps when they don't look at any of those
+columns.
+"""
+
+ROW_SELECTORS = ('with_rows', 'without_rows', 'with_rows_in', 'without_rows_in',)
+"""Recipe steps that only remove rows, and can move ahead of the steps in L{MODIFIES_MAP}."""
+
 
 def req_arg(spec, property):
     """Get a required property, and raise an exception if missing.
@@ -2719,7 +3586,7 @@ def opt_arg(spec, property, default_value=None):
         return value
 
 
-def from_recipe(source, recipe):
+def from_recipe(source, recipe, optimise=True):
     """Build a filter chain from a JSON-like list of filter specs.
 
     Each recipe dictionary contains the property 'filter', describing
@@ -2727,8 +3594,19 @@ def from_recipe(source, recipe):
     parameters for the filter. Filter and parameter names are the same
     as the methods and arguments in hxl.model.Dataset.
 
+    Row selections (with_rows, without_rows, with_rows_in, and
+    without_rows_in) move ahead of earlier row-by-row steps such as
+    clean_data, replace_data, and add_columns, as long as those steps
+    don't change any of the columns that the selection looks at, so
+    that the rows removed aren't cleaned or rewritten first. If the
+    recipe never uses some of the source columns (e.g. because it ends
+    with with_columns or count), the chain starts by dropping them, so
+    that the other filters don't process them for nothing. The output
+    is the same either way.
+
     @param source: a HXL data source, URL, etc.
     @param recipe: a list of dictionaries, each describing a filter.
+    @param optimise: if False, build the filters exactly as listed in the recipe
     @returns: the filter at the end of the new chain.
     """
     source = hxl.data(source)
@@ -2743,6 +3621,16 @@ def from_recipe(source, recipe):
         # a single filter (make it into a list)
         recipe = [recipe]
 
+    # Select rows as early as possible (predicate pushdown)
+    if optimise:
+        recipe = _reorder_recipe(recipe)
+
+    # Drop the columns that the recipe won't use (projection pushdown)
+    if optimise and not isinstance(source, hxl.model.ColumnarDataset):
+        needs = _recipe_needs(recipe)
+        if needs is not None and not needs.is_all:
+            source = _ProjectionFilter(source, needs)
+
     # Process each filter in turn
     for spec in recipe:
 
@@ -2758,6 +3646,782 @@ def from_recipe(source, recipe):
     return source
 
 
+def fanout(source, recipes, sinks=None, queue_size=4):
+    """Run several filter chains from a single read of a source.
+
+    The source is read (and parsed) only once, a batch of rows at a
+    time, and each batch is pushed to every chain in turn. Each chain
+    runs in its own thread and pulls its rows from a bounded queue, so
+    nothing is buffered beyond what the chain's own caching filters
+    (e.g. L{CountFilter} or L{SortFilter}) need, and a slow chain
+    holds the reading back rather than letting rows pile up::
+
+      cleaned, counts = hxl.filters.fanout(url, [
+          [{'filter': 'clean_data', 'whitespace': '#*'}],
+          [{'filter': 'count', 'patterns': 'adm1'}],
+      ], [
+          lambda dataset: hxl.input.write_hxl(cleaned_output, dataset),
+          None,
+      ])
+
+    A sink reads its chain's output with the usual pull-based API,
+    in the chain's thread, while the source is still being read; a
+    chain without a sink has its output cached in memory. A chain may
+    read the source only once, so add a cache step to a recipe that
+    needs to read its input more than once. Each chain is built in its
+    own thread, so filters that read their source when they're created
+    (e.g. a query with "is max", or cleaning dates) get the rows as
+    they're pushed.
+
+    @param source: a HXL data source, URL, etc.
+    @param recipes: a list of recipes (each one anything that L{from_recipe} accepts)
+    @param sinks: an optional list of callables, one for each recipe (or C{None} to cache the output), each taking a L{hxl.model.Dataset}
+    @param queue_size: the maximum number of batches waiting for each chain
+    @returns: a list with the value returned by each sink, or the cached output of each chain without a sink
+    @exception HXLFilterException: if there is a different number of sinks and recipes
+    """
+    source = hxl.data(source)
+    if sinks is None:
+        sinks = [None] * len(recipes)
+    elif len(sinks) != len(recipes):
+        raise HXLFilterException("Expected {} sinks for {} recipes, but got {}".format(
+            len(recipes), len(recipes), len(sinks)
+        ))
+
+    columns = source.columns
+    branches = []
+    for recipe, sink in zip(recipes, sinks):
+        branch_source = _FanoutSource(columns, queue.Queue(queue_size))
+        branches.append(_FanoutBranch(branch_source, recipe, sink))
+    for branch in branches:
+        branch.start()
+
+    try:
+        for rows in source.iter_batches():
+            for branch in branches:
+                branch.put(rows)
+    except BaseException:
+        for branch in branches:
+            branch.put(_FanoutSource.ABORT)
+            branch.join()
+        raise
+
+    for branch in branches:
+        branch.put(_FanoutSource.END)
+    for branch in branches:
+        branch.join()
+    for branch in branches:
+        if branch.exception is not None:
+            raise branch.exception
+    return [branch.result for branch in branches]
+
+
+EXPLAIN_ROW_BYTES = 200
+"""Rough number of bytes of memory for each row held in memory, apart from its values (see L{explain})."""
+
+EXPLAIN_CELL_BYTES = 70
+"""Rough number of bytes of memory for each value held in memory (see L{explain})."""
+
+
+def explain(dataset, row_estimate=None):
+    """Describe how a dataset or filter chain will run, without reading the data.
+
+    The result is a tree of dicts, starting with the end of the chain
+    and following each filter's "source" back to the original data.
+    Each node has the following properties:
+
+      - B{name}: the class name of the filter or dataset
+      - B{kind}: "streaming" (one row at a time), "caching" (holds all
+        of its rows in memory), or "source" (the original data)
+      - B{passes}: the number of times the filter reads its source
+      - B{reads}: the number of times the dataset will be read for one
+        pass through the end of the chain (for the original data, this
+        is how many times it will be downloaded or parsed)
+      - B{rows}: the estimated number of rows out (an upper bound, or
+        C{None} if unknown)
+      - B{rows_held}: the estimated number of rows (or keys) held in
+        memory (C{None} if unknown)
+      - B{memory}: a rough estimate of the bytes held in memory, based
+        on L{EXPLAIN_ROW_BYTES} and L{EXPLAIN_CELL_BYTES} (C{None} if
+        unknown)
+      - B{columns}: the display tags of the output columns (C{None} if
+        the filter would have to read the data to work them out)
+      - B{notes}: a list of notes, such as implicit caching
+      - B{source}: the node for the filter's source (not present for
+        the original data)
+      - B{extra_sources}: a list of nodes for any other datasets the
+        filter reads (e.g. for L{MergeDataFilter} or L{AppendFilter})
+
+    Example::
+
+      plan = hxl.data(url).clean_data(date='date').sort().explain(row_estimate=100000)
+
+    Note that some filters (such as L{CleanDataFilter} for dates, or
+    L{RowFilter} with "is min" or "is max" queries) already read
+    their source when they're created.
+
+    @param dataset: the L{hxl.model.Dataset} to explain (usually the end of a filter chain)
+    @param row_estimate: the estimated number of rows in the original data, for memory estimates (optional)
+    @returns: a JSON-friendly dict describing the execution plan
+    """
+    plan = _explain_node(dataset, row_estimate)
+    _explain_reads(plan, 1)
+    return plan
+
+
+def parallel(source, workers=None, chunk_size=None):
+    """Run the row-by-row filters in a chain on several processes at once.
+
+    The rows are read in chunks, and each run of consecutive streaming
+    filters that look at only one row at a time (L{CleanDataFilter},
+    L{ReplaceDataFilter}, L{RowFilter}, L{ColumnFilter},
+    L{AddColumnsFilter}, L{JSONPathFilter}, and L{RenameFilter})
+    processes the chunks in a pool of worker processes. The output
+    comes back in the original order, and is the same as the output
+    of the original chain. Any other filter, such as
+    L{FillDataFilter} or L{DeduplicationFilter} (which carry state
+    from one row to the next), runs as usual in this process, between
+    the runs::
+
+      source = hxl.data(url).clean_data(whitespace='*', date='date').dedup()
+      hxl.input.write_hxl(sys.stdout, hxl.filters.parallel(source, workers=8))
+
+    Reading, parsing and writing still happen in this process, and
+    each chunk is copied to and from a worker, so this pays off only
+    when the filters do much more work per row than that (e.g. for
+    date cleaning or formulas). Only a few chunks for each worker are
+    in progress at a time, so memory stays bounded. The new chain
+    reads the same original data as the source chain, so use it
+    instead of the source, not as well.
+
+    @param source: the end of the filter chain (a L{hxl.model.Dataset})
+    @param workers: the number of worker processes (default: the number of CPUs)
+    @param chunk_size: the maximum number of rows in each chunk (default: L{hxl.model.Dataset.BATCH_SIZE})
+    @returns: a dataset with the same output as the source, or the source itself if there's nothing to run in parallel
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2:
+        return source
+    return _parallelise(source, workers, chunk_size)
+
+
+def pipeline(source, queue_size=4, batch_size=None):
+    """Overlap reading, filtering, and writing in separate threads.
+
+    Normally, the input parsing, the filter chain, and whatever reads
+    the output (such as L{hxl.input.write_hxl}) take turns in a single
+    thread. This function returns a dataset with the same output,
+    where the original data is read and parsed in one background
+    thread, the filter chain runs in a second one, and the output is
+    read in the calling thread. The stages pass batches of rows to
+    each other through bounded queues, so a fast stage waits for a
+    slow one instead of letting rows pile up in memory::
+
+      hxl.input.write_hxl(output, hxl.filters.pipeline(hxl.data(url).clean_data(date='date')))
+
+    Python runs only one thread at a time, so this helps when some of
+    the stages wait on I/O (network reads, decompression, or disk
+    writes) while others are busy; for CPU-bound filters, see
+    L{parallel}. The new chain reads the same original data as the
+    source chain, so use it instead of the source, not as well.
+
+    @param source: the end of the filter chain (a L{hxl.model.Dataset})
+    @param queue_size: the maximum number of batches waiting between stages (default: 4)
+    @param batch_size: the maximum number of rows in each batch (default: L{hxl.model.Dataset.BATCH_SIZE})
+    @returns: a dataset with the same output as the source
+    """
+    chain = _pipeline_input(source, queue_size, batch_size)
+    if isinstance(chain, _PipelineFilter):
+        # no filters: just read the original data in the background
+        return chain
+    return _PipelineFilter(chain, queue_size, batch_size)
+
+
+class _FanoutSource(hxl.model.Dataset):
+    """Source for one branch of L{fanout}, reading batches pushed into a queue."""
+
+    END = object()
+    """Marker for the end of the source data."""
+
+    ABORT = object()
+    """Marker for a failure while reading the source data."""
+
+    def __init__(self, columns, batches):
+        """
+        @param columns: the source columns
+        @param batches: a L{queue.Queue} of row lists, followed by L{END} or L{ABORT}
+        """
+        super().__init__()
+        self._columns = hxl.model.ColumnList.of(columns)
+        self.batches = batches
+        self.started = False
+
+    @property
+    def columns(self):
+        return self._columns
+
+    def __iter__(self):
+        for rows in self.iter_batches():
+            yield from rows
+
+    def iter_batches(self, size=None):
+        # the rows arrive in the source's batch sizes, so ignore size
+        if self.started:
+            raise HXLFilterException("Cannot read a fanout source more than once (add a cache step to the recipe)")
+        self.started = True
+        return self._gen_batches()
+
+    def _gen_batches(self):
+        while True:
+            rows = self.batches.get()
+            if rows is _FanoutSource.END:
+                return
+            elif rows is _FanoutSource.ABORT:
+                raise HXLFilterException("Fanout source failed")
+            yield rows
+
+
+class _FanoutBranch(threading.Thread):
+    """Thread running one filter chain for L{fanout}."""
+
+    def __init__(self, source, recipe, sink):
+        """
+        @param source: the L{_FanoutSource} at the start of the chain
+        @param recipe: the recipe for the chain (anything that L{from_recipe} accepts)
+        @param sink: a callable taking the output dataset, or None to cache it
+        """
+        super().__init__(daemon=True)
+        self.source = source
+        self.recipe = recipe
+        self.sink = sink
+        self.result = None
+        self.exception = None
+
+    def run(self):
+        try:
+            # build the chain here, since some filters read their source in their constructors
+            output = from_recipe(self.source, self.recipe)
+            if self.sink is None:
+                self.result = output.cache()
+                # fill the cache now, while the source is available
+                for row in self.result:
+                    pass
+            else:
+                self.result = self.sink(output)
+        except BaseException as e:
+            self.exception = e
+
+    def put(self, rows):
+        """Push a batch of rows (or a marker) to the chain, unless it has already finished.
+        @param rows: a list of L{hxl.model.Row} objects, L{_FanoutSource.END}, or L{_FanoutSource.ABORT}
+        """
+        while self.is_alive():
+            try:
+                self.source.batches.put(rows, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+def _pipeline_input(dataset, queue_size, batch_size):
+    """Rebuild a chain with a L{_PipelineFilter} right after the original data (see L{pipeline}).
+    The original chain isn't changed; filters that need a new source are shallow copies.
+    @returns: the new end of the chain
+    """
+    if isinstance(dataset, AbstractBaseFilter):
+        source = _pipeline_input(dataset.source, queue_size, batch_size)
+        dataset = copy.copy(dataset)
+        dataset.source = source
+        return dataset
+    else:
+        return _PipelineFilter(dataset, queue_size, batch_size)
+
+
+class _PipelineFilter(AbstractBaseFilter):
+    """Read the source in a background thread, passing batches of rows through a bounded queue (see L{pipeline})."""
+
+    END = object()
+    """Marker for the end of the source data."""
+
+    def __init__(self, source, queue_size=4, batch_size=None):
+        """
+        @param source: the source dataset
+        @param queue_size: the maximum number of batches waiting in the queue
+        @param batch_size: the maximum number of rows in each batch
+        """
+        super().__init__(source)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+
+    def __iter__(self):
+        for rows in self.iter_batches():
+            yield from rows
+
+    def iter_batches(self, size=None):
+        # the rows arrive in the batch size set for the pipeline, so ignore size
+        return self._gen_batches()
+
+    def _gen_batches(self):
+        self.columns # read the headers in this thread first
+        batches = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._produce, args=(batches, stop,), daemon=True)
+        thread.start()
+        try:
+            while True:
+                rows = batches.get()
+                if rows is _PipelineFilter.END:
+                    return
+                elif isinstance(rows, BaseException):
+                    raise rows
+                yield rows
+        finally:
+            # if the reader stopped early, let the thread finish
+            stop.set()
+            thread.join()
+
+    def _produce(self, batches, stop):
+        """Read the source into the queue (runs in the background thread).
+        @param batches: the L{queue.Queue} for the batches, followed by L{END} or an exception
+        @param stop: a L{threading.Event} set when the reader no longer wants the rows
+        """
+        try:
+            for rows in self.source.iter_batches(self.batch_size):
+                if not self._put(batches, stop, rows):
+                    return
+            result = _PipelineFilter.END
+        except BaseException as e:
+            result = e
+        self._put(batches, stop, result)
+
+    @staticmethod
+    def _put(batches, stop, item):
+        """Put an item into the queue, waiting while it's full unless the reader stops.
+        @returns: C{True} if the item went into the queue
+        """
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _explain(self, rows):
+        """The source runs in a background thread."""
+        plan = super()._explain(rows)
+        plan['notes'].append('reads its source in a background thread, up to {} batches ahead'.format(self.queue_size))
+        return plan
+
+
+def _recipe_needs(recipe):
+    """Work out which source columns a recipe needs.
+    @param recipe: a list of filter specs
+    @returns: a L{_ColumnNeeds} object, or C{None} if the recipe might need all columns
+    """
+    needs = _ColumnNeeds()
+    try:
+        for spec in reversed(recipe):
+            project = PROJECTION_MAP.get(spec.get('filter'))
+            if project is None:
+                return None
+            needs = project(spec, needs)
+            if needs is None:
+                return None
+    except (hxl.HXLException, AttributeError, TypeError, ValueError):
+        # leave it to from_recipe to report any problems with the recipe
+        return None
+    return needs
+
+
+def _reorder_recipe(recipe):
+    """Move row selections ahead of earlier row-by-row steps that don't change the columns they use.
+    Row selections never move past each other, or past any step not in L{MODIFIES_MAP}.
+    @param recipe: a list of filter specs
+    @returns: a new list of the same filter specs, possibly in a different order
+    """
+    recipe = list(recipe)
+    for i, spec in enumerate(recipe):
+        patterns = _selector_patterns(spec)
+        if patterns is None:
+            continue
+        position = i
+        while position > 0 and _can_select_before(recipe[position - 1], patterns):
+            position -= 1
+        if position < i:
+            recipe.insert(position, recipe.pop(i))
+    return recipe
+
+
+def _selector_patterns(spec):
+    """Find the tag patterns that a row selection looks at.
+    @param spec: a filter spec
+    @returns: a list of L{hxl.model.TagPattern} objects, or C{None} if the spec isn't a row selection or might look at any column
+    """
+    if not isinstance(spec, dict) or spec.get('filter') not in ROW_SELECTORS:
+        return None
+    try:
+        needs = PROJECTION_MAP[spec['filter']](spec, _ColumnNeeds([]))
+    except (hxl.HXLException, AttributeError, TypeError, ValueError):
+        # leave it to from_recipe to report any problems with the recipe
+        return None
+    return None if needs is None else needs.patterns
+
+
+def _can_select_before(spec, patterns):
+    """Check whether a row selection can move ahead of a recipe step.
+    @param spec: the filter spec for the recipe step
+    @param patterns: the tag patterns that the row selection looks at
+    @returns: C{True} if the step doesn't change any column that might match the patterns
+    """
+    modifies = MODIFIES_MAP.get(spec.get('filter')) if isinstance(spec, dict) else None
+    if modifies is None:
+        return False
+    try:
+        modified = modifies(spec)
+    except (hxl.HXLException, AttributeError, TypeError, ValueError):
+        return False
+    if modified is None:
+        return False
+    return not any(_patterns_overlap(a, b) for a in patterns for b in modified)
+
+
+def _patterns_overlap(a, b):
+    """Check whether a column could match both of two tag patterns.
+    @param a: a L{hxl.model.TagPattern}
+    @param b: another L{hxl.model.TagPattern}
+    @returns: C{True} if some column could match both
+    """
+    if not (a.is_wildcard() or b.is_wildcard() or a.tag == b.tag):
+        return False
+    if a.include_attributes & b.exclude_attributes or b.include_attributes & a.exclude_attributes:
+        return False
+    if a.is_absolute and not b.include_attributes <= a.include_attributes:
+        return False
+    if b.is_absolute and not a.include_attributes <= b.include_attributes:
+        return False
+    return True
+
+
+def _add_query_patterns(needs, query_specs):
+    """Add the columns used by row queries (including formulas) to the columns needed.
+    @param needs: the L{_ColumnNeeds} to update
+    @param query_specs: a row-query spec or list of specs
+    @returns: the updated L{_ColumnNeeds}, or C{None} if the queries might need all columns
+    """
+    for query in hxl.model.RowQuery.parse_list(query_specs):
+        if isinstance(query, hxl.model.RowQueryConjunction):
+            queries = query.queries
+        else:
+            queries = [query]
+        for query in queries:
+            needs.add([query.pattern])
+            if query.formula:
+                patterns = feval.patterns(query.formula)
+                if patterns is None:
+                    return None
+                needs.add(patterns)
+    return needs
+
+
+class _ColumnNeeds(object):
+    """The source columns that the rest of a recipe might use (see L{from_recipe}).
+
+    A column is needed if it meets all of the conditions in at least
+    one of the terms. Each condition is a list of L{tag
+    patterns<hxl.model.TagPattern>} that the column must match (or
+    must not match, if the condition excludes them). A term with no
+    conditions matches every column.
+    """
+
+    def __init__(self, patterns=None):
+        """
+        @param patterns: a list of tag patterns for the columns needed, or C{None} for all columns
+        """
+        self.terms = [[]] if patterns is None else [[(patterns, False)]]
+        """List of terms, each a list of (patterns, exclude) conditions"""
+
+        self.fallbacks = []
+        """Lists of patterns where all columns are needed if no source column matches"""
+
+    @property
+    def is_all(self):
+        """True if all of the columns are needed."""
+        return [] in self.terms
+
+    @property
+    def patterns(self):
+        """List of all the tag patterns that columns must match in any of the terms."""
+        return [pattern for term in self.terms for patterns, exclude in term if not exclude for pattern in patterns]
+
+    @property
+    def is_conditional(self):
+        """True if the columns needed depend on which columns exist."""
+        return bool(self.fallbacks)
+
+    def add(self, patterns, all_if_missing=False):
+        """Add the columns matching any of a list of patterns.
+        @param patterns: a list of L{hxl.model.TagPattern} objects
+        @param all_if_missing: if True, all columns are needed when none match the patterns
+        @returns: this object
+        """
+        if patterns:
+            self.terms.append([(patterns, False)])
+            if all_if_missing:
+                self.fallbacks.append(patterns)
+        return self
+
+    def restrict(self, patterns, exclude=False):
+        """Keep only the columns matching (or not matching) any of a list of patterns.
+        @param patterns: a list of L{hxl.model.TagPattern} objects
+        @param exclude: if True, keep only the columns that don't match
+        @returns: this object
+        """
+        for term in self.terms:
+            term.append((patterns, exclude))
+        return self
+
+    def select(self, columns):
+        """Choose the columns needed from a list.
+        @param columns: a list of L{hxl.model.Column} objects
+        @returns: a list of the indices of the columns needed
+        """
+        match_list = hxl.model.TagPattern.match_list
+        for patterns in self.fallbacks:
+            if not any(match_list(column, patterns) for column in columns):
+                return list(range(len(columns)))
+        indices = []
+        for i, column in enumerate(columns):
+            for term in self.terms:
+                if all(match_list(column, patterns) != exclude for patterns, exclude in term):
+                    indices.append(i)
+                    break
+        return indices
+
+
+class _ProjectionFilter(ColumnFilter):
+    """Column filter that L{from_recipe} adds to drop the source columns a recipe won't use."""
+
+    def __init__(self, source, needs):
+        """
+        @param source: the source dataset
+        @param needs: a L{_ColumnNeeds} object for the recipe
+        """
+        super().__init__(source)
+        self.needs = needs
+
+    def filter_columns(self):
+        """@returns: the columns needed"""
+        columns_in = self.source.columns
+        self.indices = self.needs.select(columns_in)
+        return [columns_in[i].freeze() for i in self.indices]
+
+
+def _explain_node(dataset, row_estimate):
+    """Build the plan for a dataset and its sources (see L{explain}).
+    @param dataset: the dataset to explain
+    @param row_estimate: the estimated number of rows in the original data, or C{None}
+    @returns: the plan node for the dataset (without "reads")
+    """
+    source = getattr(dataset, 'source', None)
+    if not isinstance(source, hxl.model.Dataset):
+        source = None
+
+    source_plan = None
+    if source is not None:
+        source_plan = _explain_node(source, row_estimate)
+        rows = source_plan['rows']
+    else:
+        rows = row_estimate
+
+    if isinstance(dataset, AbstractBaseFilter):
+        plan = dataset._explain(rows)
+    elif source is not None:
+        # a dataset that caches another one, like hxl.model.ColumnarDataset
+        plan = {'kind': 'caching', 'passes': 1, 'rows': rows, 'rows_held': rows, 'notes': []}
+    else:
+        plan = {'kind': 'source', 'passes': 0, 'rows': rows, 'rows_held': 0, 'notes': []}
+
+    extra_sources = plan.pop('extra_sources', [])
+    extra_sources_cached = plan.pop('extra_sources_cached', False)
+    if 'columns' not in plan:
+        plan['columns'] = [column.display_tag for column in dataset.columns]
+
+    if plan['rows_held'] is None:
+        plan['memory'] = None
+    elif plan['columns'] is not None or source_plan is None:
+        plan['memory'] = plan['rows_held'] * (EXPLAIN_ROW_BYTES + EXPLAIN_CELL_BYTES * len(plan['columns'] or []))
+    else:
+        plan['memory'] = plan['rows_held'] * (EXPLAIN_ROW_BYTES + EXPLAIN_CELL_BYTES * len(source_plan['columns'] or []))
+
+    result = {'name': type(dataset).__name__}
+    for key in ('kind', 'passes', 'reads', 'rows', 'rows_held', 'memory', 'columns', 'notes',):
+        result[key] = plan.get(key) # reads come later, from _explain_reads
+    if source_plan is not None:
+        result['source'] = source_plan
+    if extra_sources:
+        result['extra_sources'] = [_explain_node(extra, None) for extra in extra_sources]
+        result['_extra_sources_cached'] = extra_sources_cached
+    return result
+
+
+def _explain_reads(plan, reads):
+    """Fill in the number of times each node in a plan will be read (see L{explain}).
+    A caching node reads its source only the first time it's read itself.
+    @param plan: the plan node
+    @param reads: the number of times the node will be read
+    """
+    plan['reads'] = reads
+    if plan['kind'] == 'caching':
+        reads = min(reads, 1)
+    if 'source' in plan:
+        _explain_reads(plan['source'], reads * plan['passes'])
+    if 'extra_sources' in plan:
+        extra_reads = min(reads, 1) if plan.pop('_extra_sources_cached') else reads
+        for extra_plan in plan['extra_sources']:
+            _explain_reads(extra_plan, extra_reads)
+
+
+def _count_aggregates(queries):
+    """Count the row queries that calculate an aggregate value first, like "is max".
+    @param queries: a list of L{hxl.model.RowQuery} or L{hxl.model.RowQueryConjunction} objects
+    @returns: the number of aggregate queries
+    """
+    count = 0
+    for query in queries:
+        if isinstance(query, hxl.model.RowQueryConjunction):
+            count += _count_aggregates(query.queries)
+        elif query.is_aggregate:
+            count += 1
+    return count
+
+
+def _parallelise(dataset, workers, chunk_size):
+    """Rebuild a chain with each run of parallel-safe filters in a L{_ParallelFilter} (see L{parallel}).
+    The original chain isn't changed; filters that need a new source are shallow copies.
+    @returns: the new end of the chain (or the same dataset, if nothing changed)
+    """
+    if isinstance(dataset, AbstractStreamingFilter) and dataset._can_parallelise():
+        filters = []
+        while isinstance(dataset, AbstractStreamingFilter) and dataset._can_parallelise():
+            filters.append(dataset)
+            dataset = dataset.source
+        filters.reverse()
+        return _ParallelFilter(_parallelise(dataset, workers, chunk_size), filters, workers, chunk_size)
+    elif isinstance(dataset, AbstractBaseFilter):
+        source = _parallelise(dataset.source, workers, chunk_size)
+        if source is not dataset.source:
+            dataset = copy.copy(dataset)
+            dataset.source = source
+    return dataset
+
+
+class _ParallelFilter(AbstractBaseFilter):
+    """Run a run of streaming filters over chunks of rows in a process pool (see L{parallel})."""
+
+    def __init__(self, source, filters, workers, chunk_size=None):
+        """
+        @param source: the source dataset (the new source for the first filter)
+        @param filters: the filters to run, in order from the source
+        @param workers: the number of worker processes
+        @param chunk_size: the maximum number of rows in each chunk
+        """
+        super().__init__(source)
+        self.filters = filters
+        """The filters to run in the worker processes"""
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def filter_columns(self):
+        """@returns: the columns from the last filter"""
+        return self.filters[-1].columns
+
+    def __iter__(self):
+        columns = self.columns
+        # the workers get copies of the filters without their sources
+        stages = [_ParallelStage.detach(filter) for filter in self.filters]
+        executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=_parallel_init, initargs=(stages,)
+        )
+        pending = collections.deque()
+        row_number = -1
+        try:
+            for rows in self.source.iter_batches(self.chunk_size):
+                pending.append(executor.submit(_parallel_run, [row.values for row in rows]))
+                # backpressure: wait for the oldest chunk before reading too far ahead
+                while len(pending) >= 2 * self.workers or (pending and pending[0].done()):
+                    for values in pending.popleft().result():
+                        row_number += 1
+                        yield hxl.model.Row(columns, values, row_number, copy_values=False)
+            while pending:
+                for values in pending.popleft().result():
+                    row_number += 1
+                    yield hxl.model.Row(columns, values, row_number, copy_values=False)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown()
+
+    def _explain(self, rows):
+        """Describe the filters that run in the workers."""
+        plan = super()._explain(rows)
+        plan['notes'].append('runs {} in {} worker processes'.format(
+            ', '.join(type(filter).__name__ for filter in self.filters), self.workers
+        ))
+        return plan
+
+
+class _ParallelStage(hxl.model.Dataset):
+    """Stand-in source for a filter copied to a worker process (see L{parallel})."""
+
+    def __init__(self, columns):
+        """@param columns: the columns of the filter's real source"""
+        super().__init__()
+        self._columns = hxl.model.ColumnList.of(columns)
+
+    @property
+    def columns(self):
+        return self._columns
+
+    def __iter__(self):
+        return iter([])
+
+    @staticmethod
+    def detach(filter):
+        """Copy a filter for a worker process, with a stand-in source.
+        @param filter: the L{AbstractStreamingFilter} to copy
+        @returns: the copy, ready for pickling
+        """
+        filter.columns # work out the columns (and any column indices) first
+        stage = copy.copy(filter)
+        stage.source = _ParallelStage(list(filter.source.columns))
+        return stage
+
+
+_parallel_stages = None
+"""The filters for this worker process (see L{parallel})."""
+
+
+def _parallel_init(stages):
+    """Set up a worker process for L{parallel}.
+    @param stages: the detached filters to run, in order
+    """
+    global _parallel_stages
+    _parallel_stages = stages
+
+
+def _parallel_run(values_list):
+    """Run a chunk of rows through the filters in a worker process (see L{parallel}).
+    @param values_list: a list of lists of values, one for each row
+    @returns: a list of lists of the values for the rows that come out of the end
+    """
+    for stage in _parallel_stages:
+        columns = stage.source.columns
+        values_list = stage.filter_batch([hxl.model.Row(columns, values, copy_values=False) for values in values_list])
+    return values_list
+
+
 def list_product(lists, head=[]):
     """Generate the cartesian product of a list of lists
     The elements of the result will be all possible combinations of the elements of
@@ -2,7 +2,7 @@
 """
 
 import logging
-import hxl.formulas.parser as p, hxl.formulas.lexer as l
+import hxl.model, hxl.formulas.parser as p, hxl.formulas.lexer as l
 
 from hxl.util import logup
 
@@ -22,3 +22,21 @@ def eval(row, formula):
         logger.error("Cannot parse formula {{ {} }}".format(formula))
         return "**ERROR**"
 
+
+def patterns(formula):
+    """Find the tag patterns that a formula uses.
+    @param formula: the formula as a string
+    @return: a list of L{hxl.model.TagPattern} objects, or None if the formula can't be parsed
+    """
+    statement = p.parser.parse(formula, lexer=l.lexer)
+    if not statement:
+        return None
+    result = []
+    def collect(node):
+        if isinstance(node, hxl.model.TagPattern):
+            result.append(node)
+        elif isinstance(node, list):
+            for item in node:
+                collect(item)
+    collect(statement)
+    return result
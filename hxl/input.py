@@ -356,10 +356,14 @@ def tagger(data, specs, input_options=None, default_tag=None, match_all=False):
 def write_hxl(output, source, show_headers=True, show_tags=True):
     """Serialize a HXL dataset to an output stream in CSV format.
 
-    The output will be comma-separated CSV, in UTF-8 character encoding.
+    The output will be comma-separated CSV. The rows are written in
+    large batches (see hxl.model.Dataset.gen_csv()) rather than one
+    line at a time. If the output is a binary stream (such as
+    ``sys.stdout.buffer``), the CSV goes straight to it as UTF-8
+    bytes, without a text wrapper.
 
     Args:
-        output (io.IOBase): an output byte stream
+        output (io.IOBase): an output text or byte stream
         source (hxl.model.Dataset): a HXL data-access object
         show_headers (bool): if True (default), include text header row.
         show_tags (bool): if True (default), include the HXL hashtag row.
@@ -368,11 +372,10 @@ def write_hxl(output, source, show_headers=True, show_tags=True):
         IOError: if there's a problem writing the output
 
     """
-    for line in source.gen_csv(show_headers, show_tags):
-        output.write(line)
+    _write_chunks(output, source.gen_csv(show_headers, show_tags))
 
 
-def write_json(output, source, show_headers=True, show_tags=True, use_objects=False):
+def write_json(output, source, show_headers=True, show_tags=True, use_objects=False, compact=False):
     """Serialize a HXL dataset to an output stream.
 
     The output will be JSON in one of two styles.
@@ -410,18 +413,35 @@ def write_json(output, source, show_headers=True, show_tags=True, use_objects=Fa
     ```
 
     Args:
-        output (io.IOBase): an output byte stream
+        output (io.IOBase): an output text or byte stream (for UTF-8 bytes)
         source (hxl.model.Dataset): a HXL data-access object
         show_headers (bool): if True (default), include text header row.
         show_tags (bool): if True (default), include the HXL hashtag row.
         use_objects (bool): if True, produce object-style JSON; otherwise, produce row-style JSON (default).
+        compact (bool): if True, leave out the whitespace inside rows and objects, and don't escape non-ASCII characters (uses the orjson package, if installed).
 
     Raises:
         IOError: if there's a problem writing the output
 
     """
-    for line in source.gen_json(show_headers, show_tags, use_objects):
-        output.write(line)
+    _write_chunks(output, source.gen_json(show_headers, show_tags, use_objects, compact))
+
+
+def _write_chunks(output, chunks):
+    """Write pieces of text to a text stream, or to a binary stream as UTF-8.
+
+    Args:
+        output (io.IOBase): an output text or byte stream
+        chunks (iterator): the strings to write
+
+    """
+    mode = getattr(output, 'mode', None)
+    if isinstance(output, (io.RawIOBase, io.BufferedIOBase,)) or (isinstance(mode, str) and 'b' in mode):
+        for chunk in chunks:
+            output.write(chunk.encode('utf-8'))
+    else:
+        for chunk in chunks:
+            output.write(chunk)
 
 
 def make_input(raw_source, input_options=None):
@@ -1460,7 +1480,7 @@ class HXLReader(hxl.model.Dataset):
 
         """
         if self._columns is None:
-            self._columns = self._find_tags()
+            self._columns = hxl.model.ColumnList(self._find_tags())
         return self._columns
 
     def _find_tags(self):
@@ -1495,6 +1515,9 @@ class HXLReader(hxl.model.Dataset):
             self.outer = outer
             self.row_number = -1
 
+        def __iter__(self):
+            return self
+
         def __next__(self):
             """ Iterable function to return the next row of HXL values.
             @returns: a L{hxl.model.Row}
@@ -19,14 +19,22 @@ This code is released into the Public Domain and comes with NO WARRANTY.
 
 """
 
-import abc, copy, csv, dateutil, hashlib, json, logging, operator, re, six
+import abc, copy, csv, dateutil, hashlib, heapq, io, itertools, json, logging, operator, re, six, time
 
 import hxl
 
-from hxl.util import logup
+from hxl.util import logup, LRUCache
+
+try:
+    import orjson # optional, for faster compact JSON output
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+_encode_json_string = json.encoder.encode_basestring_ascii
+"""Encode a str the same way as json.dumps() (raises TypeError for other types)"""
+
 
 # Cut off for fuzzy detection of a hashtag row
 # At least this percentage of cells must parse as HXL hashtags
@@ -50,6 +58,9 @@ class TagPattern(object):
 
         pattern = hxl.model.TagPattern.parse("#affected+f-children")
 
+    Parsed patterns are interned, so parsing the same string twice
+    returns the same (shared) object. Treat tag patterns as immutable.
+
     Args:
         tag: the basic hashtag (without attributes)
         include_attributes: a list of attributes that must be present
@@ -63,13 +74,16 @@ class TagPattern(object):
     """Constant: regular expression to match a HXL tag pattern.
     """
 
+    PARSE_CACHE = LRUCache(4096)
+    """Interning cache for parsed tag patterns, keyed by the original string (see hxl.util.LRUCache for the counters)."""
+
     def __init__(self, tag, include_attributes=[], exclude_attributes=[], is_absolute=False):
         self.tag = tag
 
-        self.include_attributes = set(include_attributes)
+        self.include_attributes = frozenset(include_attributes)
         """Set of all attributes that must be present"""
 
-        self.exclude_attributes = set(exclude_attributes)
+        self.exclude_attributes = frozenset(exclude_attributes)
         """Set of all attributes that must not be present"""
 
         self.is_absolute = is_absolute
@@ -152,6 +166,10 @@ class TagPattern(object):
         The [parse_list()](#hxl.model.TagPattern.parse_list) method
         will call this method to parse multiple patterns at once.
 
+        Results are interned in
+        [PARSE_CACHE](#hxl.model.TagPattern.PARSE_CACHE), so the same
+        string always produces the same shared object.
+
         Args:
             s: the tag-pattern string to parse
 
@@ -167,6 +185,10 @@ class TagPattern(object):
             # edge case: already parsed
             return s
 
+        pattern = TagPattern.PARSE_CACHE.get(s)
+        if pattern is not None:
+            return pattern
+
         result = re.match(TagPattern.PATTERN, s)
         if result:
             tag = '#' + result.group(1).lower()
@@ -184,12 +206,14 @@ class TagPattern(object):
                     raise ValueError('Exclusions not allowed in absolute patterns')
             else:
                 is_absolute = False
-            return TagPattern(
+            pattern = TagPattern(
                 tag,
                 include_attributes=include_attributes,
                 exclude_attributes=exclude_attributes,
                 is_absolute=is_absolute
             )
+            TagPattern.PARSE_CACHE.put(s, pattern)
+            return pattern
         else:
             raise hxl.HXLException('Malformed tag: ' + s)
 
@@ -259,6 +283,9 @@ class Dataset(object):
 
     __metaclass__ = abc.ABCMeta
 
+    BATCH_SIZE = 4096
+    """Default maximum number of rows in each batch from L{iter_batches}"""
+
     def __init__(self):
         """Constructor."""
         super().__init__()
@@ -270,6 +297,38 @@ class Dataset(object):
         """
         raise RuntimeException("child class must implement __iter__() method")
 
+    def iter_batches(self, size=None):
+        """Iterate over the rows in lists rather than one at a time.
+
+        The rows are the same as those from iterating over the dataset
+        directly, but streaming filters pass whole batches down the
+        chain (see L{hxl.filters.AbstractStreamingFilter.filter_batch}),
+        so the per-row overhead of each filter is spread across the
+        batch. Batches are never empty, but they may be shorter than
+        I{size} when a filter has removed rows.
+
+        @param size: the maximum number of rows in each batch (default: L{BATCH_SIZE})
+        @returns: an iterator that returns non-empty lists of L{hxl.model.Row} objects
+        """
+        return self._make_batches(iter(self), self.BATCH_SIZE if size is None else size)
+
+    @classmethod
+    def _make_batches(cls, rows, size=None):
+        """Group an iterator of rows into lists.
+        @param rows: an iterator that returns L{Row} objects
+        @param size: the maximum number of rows in each batch (default: L{BATCH_SIZE})
+        @returns: an iterator that returns non-empty lists of rows
+        """
+        if size is None:
+            size = cls.BATCH_SIZE
+        if size < 1:
+            raise ValueError("Batch size must be at least 1: {}".format(size))
+        while True:
+            batch = list(itertools.islice(rows, size))
+            if not batch:
+                return
+            yield batch
+
     @property
     def is_cached(self):
         """Test whether the source data is cached (replayable).
@@ -302,10 +361,19 @@ class Dataset(object):
         each header.
 
         @returns: a 32-character hex-formatted MD5 hash string
+        @see: L{get_columns_hash}
 
         """
         return hxl.Column.hash_list(self.columns)
 
+    def get_columns_hash(self, algorithm='md5'):
+        """Generate a hash across all of the columns, with a choice of digest algorithm.
+        @param algorithm: the digest algorithm (see L{DatasetHasher}; default: "md5")
+        @returns: a hex-formatted hash string
+        @see: L{columns_hash}
+        """
+        return hxl.Column.hash_list(self.columns, algorithm=algorithm)
+
     @property
     def data_hash(self):
         """Generate a hash for the entire dataset.
@@ -317,20 +385,26 @@ class Dataset(object):
         as empty strings. The MD5 hash digest is generated from a
         UTF-8 encoded version of each header and data cell.
 
+        This property requires a full pass through the data; to hash
+        the data while it's streaming to another consumer, use
+        L{hasher} instead.
+
         @returns: a 32-character hex-formatted MD5 hash string
+        @see: L{get_data_hash}
         """
-        md5 = hashlib.md5()
-        # text header row
-        for column in self.columns:
-            md5.update(hxl.datatypes.normalise_space(column.header).encode('utf-8'))
-        # hashtag row
-        for column in self.columns:
-            md5.update(hxl.datatypes.normalise_space(column.display_tag).encode('utf-8'))
-        # data rows
+        return self.get_data_hash()
+
+    def get_data_hash(self, algorithm='md5'):
+        """Generate a hash for the entire dataset, with a choice of digest algorithm.
+        @param algorithm: the digest algorithm (see L{DatasetHasher}; default: "md5")
+        @returns: a hex-formatted hash string
+        @see: L{data_hash}
+        """
+        hasher = DatasetHasher(algorithm)
+        hasher.update_columns(self.columns)
         for row in self:
-            for value in row:
-                md5.update(hxl.datatypes.normalise_space(value).encode('utf-8'))
-        return md5.hexdigest()
+            hasher.update_values(row.values)
+        return hasher.hexdigest()
 
     @property
     def headers(self):
@@ -399,13 +473,7 @@ class Dataset(object):
         @param columns: a list of columns
         @returns: a (possibly-empty) list of 0-based indices
         """
-        patterns = TagPattern.parse_list(tag_patterns)
-        indices = []
-        for i, column in enumerate(columns):
-            for pattern in patterns:
-                if pattern.match(column):
-                    indices.push(i)
-        return indices
+        return get_column_indices(tag_patterns, columns)
 
     #
     # Aggregates
@@ -420,37 +488,55 @@ class Dataset(object):
         @returns: the extreme value according to operator supplied, or None if no values found
         """
         pattern = TagPattern.parse(pattern)
-        result_raw = None # what's actually in the dataset
-        result_normalised = None # normalised version for comparison
 
-        # Look at every row
-        for row in self:
+        def candidates():
             # Look at every matching value in every row
-            for i, value in enumerate(row.get_all(pattern)):
-                # ignore empty values
-                if hxl.datatypes.is_empty(value):
-                    continue
+            for row in self:
+                for i in ColumnIndex.for_columns(row.columns).get_indices(pattern):
+                    if i >= len(row.values):
+                        break
+                    value = row.values[i]
+                    # ignore empty values
+                    if not hxl.datatypes.is_empty(value):
+                        # make a normalised value for comparison
+                        yield (value, hxl.datatypes.normalise(value, row.columns[i]),)
 
-                # make a normalised value for comparison
-                normalised = hxl.datatypes.normalise(value, row.columns[i])
+        return Dataset._pick_extreme(candidates(), op)
 
-                # first non-empty value is always a match
-                if result_normalised is None:
-                    result_raw = value
-                    result_normalised = normalised
-                else:
-                    # try comparing the normalised types first, then strings on failure
-                    try:
-                        if op(normalised, result_normalised):
-                            result_raw = value
-                            result_normalised = normalised
-                    except TypeError:
-                        if op(str(normalised), str(result_normalised)):
-                            result_raw = value
-                            result_normalised = normalised
+    @staticmethod
+    def _pick_extreme(candidates, op):
+        """Choose the extreme value from a sequence of candidates.
+        The first non-empty value is always a match; after that, a value replaces
+        the current result only if op() is true for the normalised versions.
+        @param candidates: an iterable of (raw value, normalised value) tuples
+        @param op: operator_lt or operator_gt
+        @returns: the raw version of the extreme value, or None if there were no candidates
+        """
+        result_raw = None # what's actually in the dataset
+        result_normalised = None # normalised version for comparison
+
+        for value, normalised in candidates:
+            # first non-empty value is always a match
+            if result_normalised is None or Dataset._is_extreme(normalised, result_normalised, op):
+                result_raw = value
+                result_normalised = normalised
 
         return result_raw
 
+    @staticmethod
+    def _is_extreme(normalised, current, op):
+        """Test whether a normalised value should replace the current extreme.
+        Compares the normalised types first, then strings on failure.
+        @param normalised: the normalised candidate value
+        @param current: the normalised current extreme value
+        @param op: operator_lt or operator_gt
+        @returns: True if op() is true for the two values
+        """
+        try:
+            return op(normalised, current)
+        except TypeError:
+            return op(str(normalised), str(current))
+
     def min(self, pattern):
         """Calculate the minimum value for a tag pattern
         Will iterate through the dataset, and use values from multiple matching columns.
@@ -468,6 +554,40 @@ class Dataset(object):
         """
         return self._get_minmax(pattern, operator.gt)
 
+    def describe(self, top_n=5, max_tracked=1000):
+        """Profile every column in a single pass through the data.
+        Memory use is bounded: distinct counts are estimated once they pass
+        L{ColumnProfile.DISTINCT_SAMPLE_SIZE}, and the top values are
+        approximate once a column has more than max_tracked different values.
+        @param top_n: the number of most-common values to report for each column (default: 5)
+        @param max_tracked: the maximum number of different values to count for each column (default: 1000)
+        @returns: a JSON-friendly dict with the row count and a list of column profiles (see L{ColumnProfile.as_dict})
+        """
+        profiles = [ColumnProfile(column, top_n=top_n, max_tracked=max_tracked) for column in self.columns]
+        row_count = 0
+        for row in self:
+            row_count += 1
+            values = row.values
+            for profile, value in zip(profiles, values):
+                profile.add(value)
+            # missing values at the end of a short row count as empty
+            for profile in profiles[len(values):]:
+                profile.add(None)
+        return {
+            "row_count": row_count,
+            "columns": [profile.as_dict() for profile in profiles],
+        }
+
+    def explain(self, row_estimate=None):
+        """Describe how this dataset or filter chain will run, without reading the data.
+        The plan shows each filter's kind (streaming or caching), how many times it reads
+        its source, its columns, and roughly how much memory it will hold.
+        @param row_estimate: the estimated number of rows in the original data, for memory estimates (optional)
+        @returns: a JSON-friendly dict describing the plan (see L{hxl.filters.explain})
+        """
+        import hxl.filters
+        return hxl.filters.explain(self, row_estimate)
+
     #
     # Utility
     #
@@ -522,6 +642,13 @@ class Dataset(object):
         import hxl.filters
         return hxl.filters.CacheFilter(self)
 
+    def to_columnar(self):
+        """Cache the dataset column-wise, for repeated scans and aggregation.
+        @returns: a L{ColumnarDataset} reading from this dataset
+        @see: L{ColumnarDataset}
+        """
+        return ColumnarDataset(self)
+
     def dedup(self, patterns=[], queries=[]):
         """Deduplicate a dataset."""
         import hxl.filters
@@ -555,16 +682,36 @@ class Dataset(object):
         import hxl.filters
         return hxl.filters.RowFilter(self, queries=queries, reverse=True, mask=mask)
 
+    def with_rows_in(self, reference_source, keys, reference_keys=None):
+        """Select rows whose key values appear in a reference dataset (semi-join).
+        @param reference_source: the HXL data source containing the keys
+        @param keys: a tag pattern or list of tag patterns for the key columns
+        @param reference_keys: (optional) tag patterns for the key columns in the reference source, if different
+        @return: a filtered version of the source
+        """
+        import hxl.filters
+        return hxl.filters.MembershipFilter(self, reference_source, keys, reverse=False, reference_keys=reference_keys)
+
+    def without_rows_in(self, reference_source, keys, reference_keys=None):
+        """Select rows whose key values don't appear in a reference dataset (anti-join).
+        @param reference_source: the HXL data source containing the keys
+        @param keys: a tag pattern or list of tag patterns for the key columns
+        @param reference_keys: (optional) tag patterns for the key columns in the reference source, if different
+        @return: a filtered version of the source
+        """
+        import hxl.filters
+        return hxl.filters.MembershipFilter(self, reference_source, keys, reverse=True, reference_keys=reference_keys)
+
     def sort(self, keys=None, reverse=False):
         """Sort the dataset (caching)."""
         import hxl.filters
         return hxl.filters.SortFilter(self, tags=keys, reverse=reverse)
 
-    def count(self, patterns=[], aggregators=None, queries=[]):
+    def count(self, patterns=[], aggregators=None, queries=[], max_groups=None):
         """Count values in the dataset (caching)."""
         import hxl.filters
         return hxl.filters.CountFilter(
-            self, patterns=patterns, aggregators=aggregators, queries=queries
+            self, patterns=patterns, aggregators=aggregators, queries=queries, max_groups=max_groups
         )
 
     def row_counter(self, queries=[]):
@@ -572,6 +719,11 @@ class Dataset(object):
         import hxl.filters
         return hxl.filters.RowCountFilter(self, queries=queries)
 
+    def hasher(self, algorithm='md5'):
+        """Hash the dataset while streaming (see L{data_hash})."""
+        import hxl.filters
+        return hxl.filters.HashingFilter(self, algorithm=algorithm)
+
     def replace_data(self, original, replacement, pattern=None, use_regex=False, queries=[]):
         """Replace values in a HXL dataset."""
         import hxl.filters
@@ -691,43 +843,813 @@ class Dataset(object):
             yield row.values
 
     def gen_csv(self, show_headers=True, show_tags=True):
-        """Generate a CSV representation of a HXL dataset, one row at a time."""
-        class TextOut:
-            """Simple string output source to capture CSV"""
-            def __init__(self):
-                self.data = ''
-            def write(self, s):
-                self.data += s
-            def get(self):
-                data = self.data
-                self.data = ''
-                return data
-        output = TextOut()
+        """Generate a CSV representation of a HXL dataset, one batch of rows at a time.
+        The header and hashtag rows come first, on their own; each
+        following piece holds up to L{BATCH_SIZE} data rows.
+        @param show_headers: if True (default), include the text header row
+        @param show_tags: if True (default), include the hashtag row
+        @returns: an iterator over pieces of the CSV text
+        """
+        output = io.StringIO()
         writer = csv.writer(output)
-        for raw in self.gen_raw(show_headers, show_tags):
-            writer.writerow(raw)
-            yield output.get()
 
-    def gen_json(self, show_headers=True, show_tags=True, use_objects=False):
-        """Generate a JSON representation of a HXL dataset, one row at a time."""
-        is_first = True
+        def flush():
+            data = output.getvalue()
+            output.seek(0)
+            output.truncate()
+            return data
+
+        if show_headers:
+            writer.writerow(self.headers)
+        if show_tags:
+            writer.writerow(self.display_tags)
+        if output.tell():
+            yield flush()
+        for batch in self.iter_batches():
+            writer.writerows([row.values for row in batch])
+            yield flush()
+
+    def gen_json(self, show_headers=True, show_tags=True, use_objects=False, compact=False):
+        """Generate a JSON representation of a HXL dataset, one batch of rows at a time.
+
+        Each row is on its own line. The default output is exactly
+        what the standard json module produces (with sorted, indented
+        objects for object-style JSON), but the object keys are worked
+        out only once for each set of columns, and strings are encoded
+        directly. With I{compact}, there's no whitespace inside rows
+        or objects and no escaping of non-ASCII characters, and the
+        encoding uses the much-faster orjson package if it's
+        installed.
+
+        @param show_headers: if True (default), include the text header row (row-style JSON only)
+        @param show_tags: if True (default), include the hashtag row (row-style JSON only)
+        @param use_objects: if True, generate objects keyed by hashtag and attributes (see L{Row.dictionary}); otherwise, generate lists (default)
+        @param compact: if True, generate compact JSON (default: False)
+        @returns: an iterator over pieces of the JSON text
+        """
         yield "[\n"
+        separator = ''
         if use_objects:
-            for row in self:
-                if is_first:
-                    is_first = False
-                    yield json.dumps(row.dictionary, sort_keys=True, indent=2)
-                else:
-                    yield ",\n" + json.dumps(row.dictionary, sort_keys=True, indent=2)
+            columns = None
+            for batch in self.iter_batches():
+                lines = []
+                for row in batch:
+                    if row.columns is not columns:
+                        columns = row.columns
+                        encode = Dataset._make_json_object_encoder(columns, compact)
+                    lines.append(encode(row.values))
+                yield separator + ',\n'.join(lines)
+                separator = ',\n'
         else:
-            for raw in self.gen_raw(show_headers, show_tags):
-                if is_first:
-                    is_first = False
-                    yield json.dumps(raw)
-                else:
-                    yield ",\n" + json.dumps(raw)
+            encode = Dataset._encode_json_compact if compact else Dataset._encode_json_list
+            if show_headers:
+                yield encode(self.headers)
+                separator = ',\n'
+            if show_tags:
+                yield separator + encode(self.display_tags)
+                separator = ',\n'
+            for batch in self.iter_batches():
+                yield separator + ',\n'.join([encode(row.values) for row in batch])
+                separator = ',\n'
         yield "\n]\n"
 
+    @staticmethod
+    def _encode_json_list(values):
+        """Encode a list of values exactly like json.dumps(), with a fast path for strings."""
+        try:
+            return '[' + ', '.join(map(_encode_json_string, values)) + ']'
+        except TypeError:
+            # not all strings
+            return json.dumps(values)
+
+    @staticmethod
+    def _encode_json_compact(data):
+        """Encode a list or dict as compact JSON, using orjson if available."""
+        if orjson is not None:
+            try:
+                return orjson.dumps(data).decode('utf-8')
+            except TypeError:
+                # orjson.JSONEncodeError (e.g. a lone surrogate or very large int)
+                pass
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+    @staticmethod
+    def _make_json_object_encoder(columns, compact=False):
+        """Make a function to encode row values as a JSON object, with the keys worked out in advance.
+        @param columns: the list of L{Column} objects for the rows
+        @param compact: if True, use compact JSON
+        @returns: a function that takes a list of values and returns JSON text
+        @see: L{Row.dictionary}
+        """
+        # first column for each key, sorted by key
+        keys = {}
+        for i, column in enumerate(columns):
+            key = column.get_display_tag(sort_attributes=True)
+            if key and key not in keys:
+                keys[key] = i
+        keys = sorted(keys.items())
+
+        def make_dict(values):
+            length = len(values)
+            return {key: values[i] for key, i in keys if i < length}
+
+        if compact:
+            return lambda values: Dataset._encode_json_compact(make_dict(values))
+
+        prefixes = [('  ' + _encode_json_string(key) + ': ', i,) for key, i in keys]
+
+        def encode(values):
+            length = len(values)
+            try:
+                items = [prefix + _encode_json_string(values[i]) for prefix, i in prefixes if i < length]
+            except TypeError:
+                # not all strings
+                return json.dumps(make_dict(values), sort_keys=True, indent=2)
+            if items:
+                return '{\n' + ',\n'.join(items) + '\n}'
+            else:
+                return '{}'
+
+        return encode
+
+
+class ColumnarDataset(Dataset):
+    """Cached dataset stored column-wise, with dictionary-encoded values.
+
+    Instead of keeping a list of L{Row} objects, this dataset keeps
+    each column as a list of integer codes pointing into the column's
+    distinct values (in order of first appearance). Humanitarian data
+    is highly repetitive, so operations that work on the distinct
+    values -- normalisation, type detection, query matching, sort keys
+    -- run once per distinct value rather than once per row.
+
+    Create one with L{Dataset.to_columnar}:
+
+        source = hxl.data(url).to_columnar()
+        print(source.min("#affected"), source.max("#affected"))
+        report = source.count("#adm1")
+
+    The source is read lazily, the first time the data is needed.
+    L{SortFilter<hxl.filters.SortFilter>},
+    L{CountFilter<hxl.filters.CountFilter>},
+    L{RowFilter<hxl.filters.RowFilter>}, L{min} and L{max} use
+    column-wise fast paths when reading directly from a columnar
+    dataset, and fall back to their usual row-by-row processing in
+    the cases that the fast paths don't cover.
+    """
+
+    def __init__(self, source):
+        """Constructor.
+        @param source: the L{Dataset} to cache
+        """
+        super().__init__()
+        self.source = source
+        """The source dataset"""
+
+        self._columns = None
+        self._codes = None
+        """List of code lists, one for each column position"""
+        self._distinct = None
+        """List of distinct-value lists, one for each column position"""
+        self._row_lengths = None
+        """Number of values in each row"""
+        self._row_numbers = None
+        self._source_row_numbers = None
+        self._width = 0
+        self._is_rectangular = True
+        self._normalised = {}
+        self._datatypes = {}
+
+    @property
+    def is_cached(self):
+        return True
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self._columns = ColumnList([column.freeze() for column in self.source.columns])
+        return self._columns
+
+    @property
+    def row_count(self):
+        """Number of rows in the dataset."""
+        self._load()
+        return len(self._row_lengths)
+
+    @property
+    def width(self):
+        """Number of value positions (the length of the longest row)."""
+        self._load()
+        return self._width
+
+    @property
+    def is_rectangular(self):
+        """True if every row has exactly L{width} values."""
+        self._load()
+        return self._is_rectangular
+
+    def get_codes(self, index):
+        """Get the dictionary codes for a column position.
+        @param index: the 0-based column position
+        @returns: a list with one code per row, or None for rows too short to have a value
+        """
+        self._load()
+        return self._codes[index]
+
+    def get_distinct_values(self, index):
+        """Get the distinct values for a column position, in order of first appearance.
+        @param index: the 0-based column position
+        @returns: a list of values; the codes from L{get_codes} index into this list
+        """
+        self._load()
+        return self._distinct[index]
+
+    def get_normalised_values(self, index):
+        """Get the normalised version of each distinct value for a column position.
+        Uses L{hxl.datatypes.normalise}, with the column for hints.
+        @param index: the 0-based column position
+        @returns: a list parallel to L{get_distinct_values} (None for empty values)
+        """
+        normalised = self._normalised.get(index)
+        if normalised is None:
+            column = self.columns[index] if index < len(self.columns) else None
+            normalised = [
+                None if hxl.datatypes.is_empty(value) else hxl.datatypes.normalise(value, column)
+                for value in self.get_distinct_values(index)
+            ]
+            self._normalised[index] = normalised
+        return normalised
+
+    def get_datatype(self, index):
+        """Infer the datatype of a column position from its distinct values.
+        @param index: the 0-based column position
+        @returns: "date" (#date columns only), "number", "string", or "empty"
+        """
+        datatype = self._datatypes.get(index)
+        if datatype is None:
+            column = self.columns[index] if index < len(self.columns) else None
+            types = set([
+                hxl.datatypes.typeof(value, column) for value in self.get_distinct_values(index)
+            ])
+            types.discard('empty')
+            if not types:
+                datatype = 'empty'
+            elif len(types) == 1:
+                datatype = types.pop()
+            else:
+                datatype = 'string'
+            self._datatypes[index] = datatype
+        return datatype
+
+    def get_row(self, position):
+        """Reconstruct a single row.
+        @param position: the 0-based position of the row in this dataset
+        @returns: a L{Row} object
+        """
+        self._load()
+        return Row(
+            self.columns,
+            self.get_values(position),
+            row_number=self._row_numbers[position],
+            source_row_number=self._source_row_numbers[position],
+            copy_values=False
+        )
+
+    def match_queries(self, queries, reverse=False):
+        """Evaluate a list of row queries for every row at once.
+        Equivalent to calling L{RowQuery.match_list} on each row, but
+        each query tests each distinct value only once.
+        @param queries: a list of L{RowQuery} objects
+        @param reverse: if True, reverse the sense of the match
+        @returns: a list of booleans (one per row), or None if the queries need whole rows (e.g. row formulas)
+        """
+        self._load()
+        if not queries:
+            return [True] * self.row_count
+        for query in queries:
+            if query.formula or query.needs_aggregate:
+                return None
+
+        result = [False] * self.row_count
+        for query in queries:
+            result = [a or b for a, b in zip(result, self._match_query(query))]
+        if reverse:
+            result = [not matched for matched in result]
+        return result
+
+    def _match_query(self, query):
+        """Evaluate a single query (or conjunction) for every row.
+        @param query: a L{RowQuery} or L{RowQueryConjunction}
+        @returns: a list of booleans (one per row)
+        """
+        if isinstance(query, RowQueryConjunction):
+            result = [True] * self.row_count
+            for part in query.queries:
+                result = [a and b for a, b in zip(result, self._match_query(part))]
+            return result
+
+        # any matching column can match
+        result = [False] * self.row_count
+        for i in ColumnIndex.for_columns(self.columns).get_indices(query.pattern):
+            if i < self._width:
+                matches = query.match_values(self._distinct[i])
+                for position, code in enumerate(self._codes[i]):
+                    if code is not None and matches[code]:
+                        result[position] = True
+        return result
+
+    def _get_minmax(self, pattern, op):
+        """Calculate the extreme value using the distinct values of a single matching column.
+        Falls back to the row-by-row version when more than one column matches.
+        """
+        pattern = TagPattern.parse(pattern)
+        indices = ColumnIndex.for_columns(self.columns).get_indices(pattern)
+        if len(indices) != 1 or indices[0] >= self.width:
+            return super()._get_minmax(pattern, op)
+
+        # distinct values are in order of first appearance, so the result is the same
+        index = indices[0]
+        normalised = self.get_normalised_values(index)
+        return Dataset._pick_extreme(
+            (
+                (value, normalised[code],) for code, value in enumerate(self.get_distinct_values(index))
+                if not hxl.datatypes.is_empty(value)
+            ),
+            op
+        )
+
+    def __iter__(self):
+        self._load()
+        for position in range(len(self._row_lengths)):
+            yield self.get_row(position)
+
+    def get_values(self, position):
+        """Decode the values for a single row.
+        @param position: the 0-based position of the row in this dataset
+        @returns: a new list of values
+        """
+        return [
+            self._distinct[i][self._codes[i][position]] for i in range(self._row_lengths[position])
+        ]
+
+    def _load(self):
+        """Read and encode the source data, if not already done."""
+        if self._codes is not None:
+            return
+
+        columns = self.columns
+        codes = []
+        distinct = []
+        code_maps = []
+        row_lengths = []
+        row_numbers = []
+        source_row_numbers = []
+
+        for position, row in enumerate(self.source):
+            values = row.values
+            while len(codes) < len(values):
+                # new column position (possibly beyond the end of the columns): earlier rows were too short
+                codes.append([None] * position)
+                distinct.append([])
+                code_maps.append({})
+            for i, value in enumerate(values):
+                code = code_maps[i].get(value)
+                if code is None:
+                    code = len(distinct[i])
+                    code_maps[i][value] = code
+                    distinct[i].append(value)
+                codes[i].append(code)
+            for i in range(len(values), len(codes)):
+                codes[i].append(None)
+            row_lengths.append(len(values))
+            row_numbers.append(row.row_number)
+            source_row_numbers.append(row.source_row_number)
+
+        # make sure there's an entry for every column, even with no data
+        while len(codes) < len(columns):
+            codes.append([None] * len(row_lengths))
+            distinct.append([])
+
+        self._width = max(row_lengths) if row_lengths else 0
+        self._is_rectangular = all(length == len(codes) for length in row_lengths)
+        self._distinct = distinct
+        self._row_lengths = row_lengths
+        self._row_numbers = row_numbers
+        self._source_row_numbers = source_row_numbers
+        self._codes = codes
+
+
+class DatasetHasher(object):
+    """
+    Incremental hash of a dataset's text headers, hashtags, and values.
+
+    Whitespace is normalised and null values are treated as empty
+    strings. The normalised strings are buffered and passed to the
+    digest in large UTF-8 encoded chunks, rather than one call per
+    cell; the hash is the same either way, because the digest sees
+    the same sequence of bytes.
+
+    The default MD5 algorithm produces the same values that libhxl
+    always has. "blake2b" is usually faster, and also produces a
+    32-character hex string (a 16-byte digest). Any other algorithm
+    name supported by the Python hashlib module also works.
+
+    Used by L{Dataset.data_hash}, L{Column.hash_list}, and
+    L{hxl.filters.HashingFilter}.
+    """
+
+    CHUNK_SIZE = 65536
+    """Approximate number of characters to buffer before updating the digest."""
+
+    def __init__(self, algorithm='md5'):
+        """
+        Set up a new hash.
+        @param algorithm: the name of the digest algorithm (default: "md5")
+        @exception hxl.HXLException: if the algorithm isn't available
+        """
+        self.algorithm = algorithm
+        if algorithm == 'blake2b':
+            self._digest = hashlib.blake2b(digest_size=16)
+        else:
+            try:
+                self._digest = hashlib.new(algorithm)
+            except (ValueError, TypeError,):
+                raise hxl.HXLException("Unsupported hash algorithm: {}".format(algorithm))
+        self._buffer = []
+        self._buffer_size = 0
+
+    def update_columns(self, columns):
+        """Add the text header row and the hashtag row.
+        @param columns: a list of L{Column} objects
+        """
+        normalise = hxl.datatypes.normalise_space
+        self._add([normalise(column.header) for column in columns])
+        self._add([normalise(column.display_tag) for column in columns])
+
+    def update_values(self, values):
+        """Add a row of data.
+        @param values: a list of values (e.g. from L{Row.values})
+        """
+        normalise = hxl.datatypes.normalise_space
+        self._add([normalise(value) for value in values])
+
+    def hexdigest(self):
+        """Get the hash of everything added so far.
+        @returns: a hex-formatted hash string
+        """
+        self._flush()
+        return self._digest.hexdigest()
+
+    def _add(self, strings):
+        self._buffer.extend(strings)
+        self._buffer_size += sum(len(s) for s in strings)
+        if self._buffer_size >= self.CHUNK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._digest.update(''.join(self._buffer).encode('utf-8'))
+            self._buffer = []
+            self._buffer_size = 0
+
+
+class ColumnType(object):
+    """
+    Inferred datatype for a single column, with a cache of typed values.
+
+    L{hxl.datatypes.typeof} and L{hxl.datatypes.normalise} classify
+    every value from scratch, mostly by catching exceptions from the
+    number and date parsers. Validation, aggregation, cleaning, and
+    profiling see the same values over and over (countries, sectors,
+    dates, etc.), so a ColumnType classifies each different string
+    only once, and remembers the result (for up to L{CACHE_SIZE}
+    different values).
+
+    The column's own type (L{datatype}) is inferred from the first
+    L{SAMPLE_SIZE} non-empty values, and kept up to date as more
+    values arrive. Once a column is known to hold text, values that
+    can't possibly be numbers skip the number parser; everything else
+    gets the full classification, so the results are always the same
+    as the L{hxl.datatypes} functions with the same dayfirst setting.
+
+    Use L{for_column} to get the ColumnType kept with a column, so
+    that everything reading the same column shares one cache.
+
+    Usage:
+
+    <pre>
+    types = hxl.model.ColumnType.for_column(column)
+    for value in values:
+        datatype, normalised = types.classify(value)
+    print(types.datatype)
+    </pre>
+    """
+
+    SAMPLE_SIZE = 100
+    """Number of non-empty values to see before trusting the inferred L{datatype}"""
+
+    CACHE_SIZE = 10000
+    """Maximum number of different values to remember"""
+
+    _MAYBE_NUMBER_PATTERN = re.compile(r'\d|inf|nan', re.IGNORECASE)
+    """Anything that float() accepts contains a digit, "inf", or "nan"."""
+
+    def __init__(self, column=None, dayfirst=True):
+        """
+        @param column: (optional) the L{Column} or L{TagPattern} for type hints (dates only for the #date hashtag)
+        @param dayfirst: for ambiguous dates, assume that the day comes before the month (default: True)
+        """
+        self.column = column
+        self.dayfirst = dayfirst
+
+        self.counts = {'date': 0, 'number': 0, 'string': 0, 'empty': 0}
+        """Histogram of the types of all the values classified so far"""
+
+        self._is_date = column is not None and column.tag == '#date'
+        self._entries = {} # value -> (datatype, normalised, is_number)
+        self._dates = {} # value -> normalised date, or None if not a date
+
+    @staticmethod
+    def for_column(column, dayfirst=True):
+        """Get the ColumnType kept with a column, creating it if needed.
+        Validation, aggregation, cleaning, and profiling all use this, so
+        they share one cache (and one L{datatype}) for the same column object.
+        Copies and pickles of the column start with an empty cache.
+        @param column: the L{Column} (if C{None}, return a new, unshared ColumnType)
+        @param dayfirst: for ambiguous dates, assume that the day comes before the month (default: True)
+        @returns: a L{ColumnType}
+        """
+        if column is None:
+            return ColumnType(None, dayfirst=dayfirst)
+        # the hashtag of a mutable column can change, so it's part of the key
+        key = (column.tag == '#date', bool(dayfirst),)
+        types_map = getattr(column, '_types', None)
+        if types_map is None:
+            types_map = {}
+            object.__setattr__(column, '_types', types_map) # bypass the FrozenColumn check
+        types = types_map.get(key)
+        if types is None:
+            types = types_map[key] = ColumnType(column, dayfirst=dayfirst)
+        return types
+
+    @property
+    def datatype(self):
+        """The most-common type of the non-empty values classified so far.
+        @returns: "date", "number", "string", or C{None} if there have been no non-empty values
+        """
+        counts = self.counts
+        result = None
+        for datatype in ('date', 'number', 'string',):
+            if counts[datatype] > 0 and (result is None or counts[datatype] > counts[result]):
+                result = datatype
+        return result
+
+    @property
+    def is_sampled(self):
+        """True once L{datatype} is based on at least L{SAMPLE_SIZE} non-empty values"""
+        counts = self.counts
+        return counts['date'] + counts['number'] + counts['string'] >= self.SAMPLE_SIZE
+
+    def classify(self, value):
+        """Type and normalise a value, and count it towards the column's type.
+
+        The result is the same as C{hxl.datatypes.typeof(value,
+        column)} and C{hxl.datatypes.normalise(value, column,
+        dayfirst)} together, but each different string is classified
+        only once.
+
+        @param value: the value to classify
+        @returns: a tuple of the datatype ("date", "number", "string", or "empty") and the normalised value
+        """
+        entry = self._get_entry(value)
+        self.counts[entry[0]] += 1
+        return entry[0], entry[1]
+
+    def typeof(self, value):
+        """Same as L{hxl.datatypes.typeof}, using the cache (see L{classify})."""
+        return self.classify(value)[0]
+
+    def normalise(self, value):
+        """Same as L{hxl.datatypes.normalise}, using the cache (see L{classify})."""
+        return self.classify(value)[1]
+
+    def is_number(self, value):
+        """Same as L{hxl.datatypes.is_number}, using the cache."""
+        return self._get_entry(value)[2]
+
+    def is_date(self, value):
+        """Same as L{hxl.datatypes.is_date} (with this object's dayfirst setting), using the cache."""
+        return self._get_date(value) is not None
+
+    def normalise_date(self, value):
+        """Same as L{hxl.datatypes.normalise_date} (with this object's dayfirst setting), using the cache.
+        @exception ValueError: if the value is not a date
+        """
+        result = self._get_date(value)
+        if result is None:
+            raise ValueError("Cannot parse as a date: {}".format(value))
+        return result
+
+    def _get_entry(self, value):
+        """Look up or make the classification for a value."""
+        if type(value) is not str:
+            # don't cache other types (1, 1.0, and True are equal as dict keys)
+            return self._classify(value)
+        entry = self._entries.get(value)
+        if entry is None:
+            entry = self._classify(value)
+            if len(self._entries) < self.CACHE_SIZE:
+                self._entries[value] = entry
+        return entry
+
+    def _get_date(self, value):
+        """Look up or parse the normalised date for a value (None if it's not a date)."""
+        if type(value) is not str:
+            return self._parse_date(value)
+        dates = self._dates
+        try:
+            return dates[value]
+        except KeyError:
+            result = self._parse_date(value)
+            if len(dates) < self.CACHE_SIZE:
+                dates[value] = result
+            return result
+
+    def _parse_date(self, value):
+        try:
+            return hxl.datatypes.normalise_date(value, self.dayfirst)
+        except ValueError:
+            return None
+
+    def _classify(self, value):
+        """Classify a value from scratch (in the same order as hxl.datatypes.typeof()).
+        @returns: a tuple of the datatype, the normalised value, and whether float() accepts the value
+        """
+        date = self._get_date(value) if self._is_date else None
+
+        if isinstance(value, str) and self.is_sampled and self.datatype == 'string' and not self._MAYBE_NUMBER_PATTERN.search(value):
+            # typed fast path: text in a text column, so don't bother with the number parser
+            is_number = False
+        else:
+            try:
+                float(value)
+                is_number = True
+            except:
+                is_number = False
+
+        if date is not None:
+            return ('date', date, is_number,)
+        elif is_number:
+            try:
+                return ('number', hxl.datatypes.normalise_number(value), True,)
+            except ValueError:
+                # e.g. "inf" and "nan"
+                return ('number', hxl.datatypes.normalise_string(value), True,)
+        elif hxl.datatypes.is_empty(value):
+            return ('empty', hxl.datatypes.normalise_string(value), False,)
+        else:
+            return ('string', hxl.datatypes.normalise_string(value), False,)
+
+
+class ColumnProfile(object):
+    """
+    Bounded-memory statistics for the values in a single column.
+
+    Add values one at a time with L{add}, then get the results with
+    L{as_dict}. Used by L{Dataset.describe}.
+
+    Values are typed and normalised the same way as L{Dataset.min}
+    and L{Dataset.max} (dates only for the #date hashtag), so min and
+    max match those methods. The distinct count is exact up to
+    L{DISTINCT_SAMPLE_SIZE} different values, and then uses a
+    k-minimum-values estimate (typical error of about 3%). The top
+    values are exact unless the column has more than max_tracked
+    different values, after which the least-common ones are dropped
+    from the tally periodically.
+    """
+
+    DISTINCT_SAMPLE_SIZE = 1024
+    """Number of value hashes to keep for the distinct-count estimate."""
+
+    _HASH_SPACE = 2 ** 64
+    """Range of the value hashes (see L{_hash})."""
+
+    def __init__(self, column=None, top_n=5, max_tracked=1000):
+        """
+        @param column: (optional) the L{Column} being profiled (for type hints)
+        @param top_n: the number of most-common values to report (default: 5)
+        @param max_tracked: the maximum number of different values to count (default: 1000)
+        """
+        self.column = column
+        self.top_n = top_n
+        self.max_tracked = max(max_tracked, top_n)
+
+        self.count = 0
+        """Number of non-empty values"""
+
+        self.empty_count = 0
+        """Number of empty values"""
+
+        self.types = {'date': 0, 'number': 0, 'string': 0}
+        """Histogram of the types of the non-empty values (see L{hxl.datatypes.typeof})"""
+
+        self.min_value = None
+        """Minimum value (as it appears in the data)"""
+
+        self.max_value = None
+        """Maximum value (as it appears in the data)"""
+
+        self._types = ColumnType.for_column(column)
+        self._min_normalised = None
+        self._max_normalised = None
+        self._distinct_hashes = set()
+        self._distinct_heap = [] # negated, so the largest kept hash is at the top
+        self._value_counts = {}
+        self._top_exact = True
+
+    def add(self, value):
+        """Add a single value to the profile.
+        @param value: the raw value
+        """
+        if hxl.datatypes.is_empty(value):
+            self.empty_count += 1
+            return
+        self.count += 1
+
+        # type and normalise (like hxl.datatypes.typeof() and normalise(), but only once)
+        datatype, normalised = self._types.classify(value)
+        self.types[datatype] += 1
+
+        # min and max
+        if self._min_normalised is None or Dataset._is_extreme(normalised, self._min_normalised, operator.lt):
+            self.min_value = value
+            self._min_normalised = normalised
+        if self._max_normalised is None or Dataset._is_extreme(normalised, self._max_normalised, operator.gt):
+            self.max_value = value
+            self._max_normalised = normalised
+
+        key = hxl.datatypes.normalise_space(value)
+
+        # distinct values (keep the smallest hashes)
+        h = ColumnProfile._hash(key)
+        if h not in self._distinct_hashes:
+            heap = self._distinct_heap
+            if len(heap) < self.DISTINCT_SAMPLE_SIZE:
+                heapq.heappush(heap, -h)
+                self._distinct_hashes.add(h)
+            elif h < -heap[0]:
+                self._distinct_hashes.discard(-heapq.heapreplace(heap, -h))
+                self._distinct_hashes.add(h)
+
+        # value frequencies
+        counts = self._value_counts
+        counts[key] = counts.get(key, 0) + 1
+        if len(counts) > 2 * self.max_tracked:
+            self._value_counts = dict(sorted(counts.items(), key=lambda item: -item[1])[:self.max_tracked])
+            self._top_exact = False
+
+    @staticmethod
+    def _hash(key):
+        """Hash a value for the distinct-count estimate.
+        Python's own string hashes change from one process to the next, so use a
+        stable one to get the same estimate every time for the same data.
+        @param key: the value (a string)
+        @returns: an integer less than L{_HASH_SPACE}
+        """
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    @property
+    def distinct_count(self):
+        """Number of different non-empty values (estimated for large numbers)"""
+        heap = self._distinct_heap
+        if len(heap) < self.DISTINCT_SAMPLE_SIZE:
+            return len(heap)
+        else:
+            return int((len(heap) - 1) * ColumnProfile._HASH_SPACE / (-heap[0] + 1))
+
+    @property
+    def top_values(self):
+        """List of (value, count) tuples for the most-common values, most common first"""
+        return sorted(self._value_counts.items(), key=lambda item: (-item[1], item[0]))[:self.top_n]
+
+    def as_dict(self):
+        """Get the profile as a JSON-friendly dict.
+        @returns: a dict with the properties header, tag, count, empty, types, min, max, distinct, distinct_exact, top, and top_exact
+        """
+        return {
+            "header": self.column.header if self.column else None,
+            "tag": self.column.display_tag if self.column else None,
+            "count": self.count,
+            "empty": self.empty_count,
+            "types": dict(self.types),
+            "min": self.min_value,
+            "max": self.max_value,
+            "distinct": self.distinct_count,
+            "distinct_exact": len(self._distinct_heap) < self.DISTINCT_SAMPLE_SIZE,
+            "top": [{"value": value, "count": count} for value, count in self.top_values],
+            "top_exact": self._top_exact,
+        }
+
 
 class Column(object):
     """
@@ -737,8 +1659,15 @@ class Column(object):
     # Regular expression to match a HXL tag
     PATTERN = r'^\s*(#{token})((?:\s*\+{token})*)\s*$'.format(token=hxl.datatypes.TOKEN_PATTERN)
 
+    # Interning cache for parsed tagspecs: maps the raw string to a (tag, attributes) tuple, or False if malformed
+    PARSE_CACHE = LRUCache(4096)
+
+    # Changes whenever the hashtag or attributes of an existing column change, so that a ColumnIndex knows to check its columns
+    _version = 0
+    _versions = itertools.count(1)
+
     # To tighten debugging (may reconsider later -- not really a question of memory efficiency here)
-    __slots__ = ['tag', 'attributes', 'attribute_list', 'header', 'column_number']
+    __slots__ = ['tag', 'attributes', 'attribute_list', 'header', 'column_number', '_types']
 
     def __init__(self, tag=None, attributes=(), header=None, column_number=None):
         """
@@ -756,6 +1685,11 @@ class Column(object):
         self.attributes = set([a.lower() for a in attributes])
         self.attribute_list = [a.lower() for a in attributes] # to preserve order
 
+    def __setattr__(self, name, value):
+        if name in ('tag', 'attributes', 'attribute_list',) and hasattr(self, name):
+            Column._version = next(Column._versions)
+        object.__setattr__(self, name, value)
+
     @property
     def display_tag(self):
         """Default display version of a HXL hashtag.
@@ -786,6 +1720,7 @@ class Column(object):
         if attribute not in self.attributes:
             self.attributes.add(attribute)
             self.attribute_list.append(attribute)
+            Column._version = next(Column._versions)
         return self
 
     def remove_attribute(self, attribute):
@@ -793,8 +1728,15 @@ class Column(object):
         if attribute in self.attributes:
             self.attributes.remove(attribute)
             self.attribute_list.remove(attribute)
+            Column._version = next(Column._versions)
         return self
 
+    def freeze(self):
+        """Return an immutable copy of this column.
+        @returns: a L{FrozenColumn} with the same hashtag, attributes, header, and column number
+        """
+        return FrozenColumn(tag=self.tag, attributes=self.attribute_list, header=self.header, column_number=self.column_number)
+
     def __hash__(self):
         """Make columns usable in a dictionary.
         Only the hashtag and attributes are used.
@@ -812,13 +1754,17 @@ class Column(object):
         except:
             return False
 
+    def __getstate__(self):
+        """Leave the shared L{ColumnType} caches (see L{ColumnType.for_column}) out of copies and pickles."""
+        return (None, {name: getattr(self, name) for name in Column.__slots__ if name != '_types' and hasattr(self, name)},)
+
     def __repr__(self):
         return self.display_tag
 
     __str__ = __repr__
 
     @staticmethod
-    def hash_list(columns):
+    def hash_list(columns, algorithm='md5'):
         """Generate a hash across all of the columns in the dataset.
 
         This function helps detect whether two HXL documents are of
@@ -832,19 +1778,19 @@ class Column(object):
         MD5 hash digest is generated from a UTF-8 encoded version of
         each header.
 
-        @returns: a 32-character hex-formatted MD5 hash string
+        @param columns: the list of L{Column} objects to hash
+        @param algorithm: the digest algorithm (see L{DatasetHasher}; default: "md5")
+        @returns: a 32-character hex-formatted MD5 hash string (by default)
 
         """
-        md5 = hashlib.md5()
-        for column in columns:
-            md5.update(hxl.datatypes.normalise_space(column.header).encode('utf-8'))
-        for column in columns:
-            md5.update(hxl.datatypes.normalise_space(column.display_tag).encode('utf-8'))
-        return md5.hexdigest()
+        hasher = DatasetHasher(algorithm)
+        hasher.update_columns(columns)
+        return hasher.hexdigest()
 
     @staticmethod
     def parse(raw_string, header=None, use_exception=False, column_number=None):
         """ Attempt to parse a full hashtag specification.
+        The regular-expression parse is saved in L{PARSE_CACHE}, but every call returns a new Column object.
         @param raw_string: the string representation of the tagspec
         @param header: the text header to include
         @param use_exception: if True, throw an exception for a malformed tagspec
@@ -860,15 +1806,23 @@ class Column(object):
             return None
 
         # Pattern for a single tag
-        result = re.match(Column.PATTERN, raw_string)
-        if result:
-            tag = result.group(1)
-            attribute_string = result.group(2)
-            if attribute_string:
-                attributes = re.split(r'\s*\+', attribute_string.strip().strip('+'))
+        parsed = Column.PARSE_CACHE.get(raw_string)
+        if parsed is None:
+            result = re.match(Column.PATTERN, raw_string)
+            if result:
+                tag = result.group(1)
+                attribute_string = result.group(2)
+                if attribute_string:
+                    attributes = re.split(r'\s*\+', attribute_string.strip().strip('+'))
+                else:
+                    attributes = []
+                parsed = (tag, tuple(attributes),)
             else:
-                attributes = []
-            return Column(tag=tag, attributes=attributes, header=header, column_number=column_number)
+                parsed = False
+            Column.PARSE_CACHE.put(raw_string, parsed)
+
+        if parsed:
+            return Column(tag=parsed[0], attributes=parsed[1], header=header, column_number=column_number)
         else:
             if use_exception:
                 raise hxl.HXLException("Malformed tag expression: " + raw_string)
@@ -940,25 +1894,267 @@ class Column(object):
             return None
 
 
+class FrozenColumn(Column):
+    """
+    An immutable column definition.
+
+    The hash value and both display tags are computed once, at
+    construction, so the column is cheap to use as a dictionary key or
+    to display for every cell. Because a frozen column can't change,
+    filters share it between their input and output column lists
+    instead of copying it; copy.copy() and copy.deepcopy() return the
+    same object.
+
+    L{add_attribute} and L{remove_attribute} return a new frozen
+    column rather than changing this one, so chained calls still work
+    as they do for L{Column}. Use L{thaw} to get a mutable copy.
+    """
+
+    __slots__ = ['_display_tag', '_sorted_display_tag', '_hash']
+
+    def __init__(self, tag=None, attributes=(), header=None, column_number=None):
+        """
+        Initialise a frozen column definition.
+        @param tag: the HXL hashtag for the column (default: None)
+        @param attributes: (optional) a sequence of attributes (default: ())
+        @param header: (optional) the original plaintext header for the column (default: None)
+        @param column_number: (optional) the zero-based column number
+        """
+        super().__init__(tag=tag, attributes=attributes, header=header, column_number=column_number)
+        self.attributes = frozenset(self.attributes)
+        self.attribute_list = tuple(self.attribute_list)
+        self._display_tag = super().get_display_tag(sort_attributes=False)
+        self._sorted_display_tag = super().get_display_tag(sort_attributes=True)
+        self._hash = super().__hash__() # must be set last: it marks the object as frozen
+
+    def __setattr__(self, name, value):
+        if hasattr(self, '_hash'):
+            raise AttributeError("Cannot set {} on a frozen column (use thaw() for a mutable copy)".format(name))
+        object.__setattr__(self, name, value)
+
+    @property
+    def display_tag(self):
+        """Default display version of a HXL hashtag (precomputed).
+        Attributes are not sorted.
+        """
+        return self._display_tag
+
+    def get_display_tag(self, sort_attributes=False):
+        """
+        Return the precomputed display version of the column hashtag
+        @param sort_attributes: if True, sort attributes; otherwise, preserve the original order
+        @return the reassembled HXL hashtag string, including language code
+        """
+        return self._sorted_display_tag if sort_attributes else self._display_tag
+
+    def add_attribute(self, attribute):
+        """Return a new frozen column with the attribute added."""
+        if attribute in self.attributes:
+            return self
+        return FrozenColumn(tag=self.tag, attributes=self.attribute_list + (attribute,), header=self.header, column_number=self.column_number)
+
+    def remove_attribute(self, attribute):
+        """Return a new frozen column with the attribute removed."""
+        if attribute not in self.attributes:
+            return self
+        attributes = list(self.attribute_list)
+        attributes.remove(attribute)
+        return FrozenColumn(tag=self.tag, attributes=attributes, header=self.header, column_number=self.column_number)
+
+    def freeze(self):
+        """Already frozen: return this column."""
+        return self
+
+    def thaw(self):
+        """Return a mutable copy of this column.
+        @returns: a L{Column} with the same hashtag, attributes, header, and column number
+        """
+        return Column(tag=self.tag, attributes=self.attribute_list, header=self.header, column_number=self.column_number)
+
+    def __hash__(self):
+        """Precomputed; equal to the hash of a mutable L{Column} with the same hashtag and attributes."""
+        return self._hash
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenColumn, (self.tag, self.attribute_list, self.header, self.column_number,))
+
+
+class ColumnList(list):
+    """A list of columns that keeps its own L{ColumnIndex}.
+
+    Datasets return their columns in a ColumnList, so that all the
+    rows sharing the list also share a single index, without a
+    module-wide cache. Changing the list itself (adding, removing, or
+    replacing columns) discards the index.
+    """
+
+    __slots__ = ['index']
+
+    def __init__(self, columns=()):
+        """
+        @param columns: the L{Column} objects
+        """
+        super().__init__(columns)
+        self.index = None
+        """The L{ColumnIndex} for the list, if compiled (see L{ColumnIndex.for_columns})"""
+
+    @staticmethod
+    def of(columns):
+        """Return a column list as a ColumnList, without copying it if it is one already.
+        @param columns: a list of L{Column} objects, or C{None}
+        @returns: a L{ColumnList}, or C{None}
+        """
+        if columns is None or isinstance(columns, ColumnList):
+            return columns
+        return ColumnList(columns)
+
+    def __reduce__(self):
+        # leave out the index when copying or pickling
+        return (ColumnList, (list(self),))
+
+def _make_column_list_mutator(name):
+    """Wrap a list method that changes the list, so that it also discards the index."""
+    method = getattr(list, name)
+    def mutator(self, *args, **kwargs):
+        self.index = None
+        return method(self, *args, **kwargs)
+    mutator.__name__ = name
+    return mutator
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append', 'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse',):
+    setattr(ColumnList, _name, _make_column_list_mutator(_name))
+
+
+class ColumnIndex(object):
+    """Compiled index for resolving tag patterns against a list of columns.
+
+    Matching a L{TagPattern} against every column of a wide dataset is
+    expensive, and the same patterns get matched against the same
+    column list for every row. A column index matches each pattern
+    only once, then returns the saved list of indices on every later
+    lookup.
+
+    Use L{for_columns} rather than the constructor, so that all the
+    rows sharing a L{ColumnList} also share a single index:
+
+        index = ColumnIndex.for_columns(row.columns)
+        for i in index.get_indices("#affected+f"):
+            print(row.values[i])
+
+    Changing the hashtag or attributes of a (mutable) column in the
+    list makes L{for_columns} compile a new index. An ordinary list
+    gets a new index every time, because it can't keep one.
+    """
+
+    MAX_PATTERNS = 1024
+    """Maximum number of resolved patterns to save before starting over."""
+
+    __slots__ = ['columns', '_parsed_columns', '_pattern_map', '_mutable', '_version']
+
+    def __init__(self, columns):
+        """Compile a new index.
+        @param columns: a list of L{Column} objects (or parseable tagspecs)
+        """
+        self.columns = columns
+        """The original column list."""
+
+        self._version = Column._version
+        self._parsed_columns = [
+            column if isinstance(column, Column) else Column.parse(column) for column in columns
+        ]
+        self._mutable = [
+            (column, column.tag, tuple(column.attribute_list),) for column in self._parsed_columns if column and not isinstance(column, FrozenColumn)
+        ]
+        self._pattern_map = {}
+
+    def is_current(self):
+        """Check that none of the mutable columns has changed its hashtag or attributes since the index was compiled.
+        @returns: True if the index is still valid
+        """
+        version = Column._version
+        if version != self._version:
+            # some column, somewhere, has changed; check ours
+            for column, tag, attributes in self._mutable:
+                if column.tag != tag or tuple(column.attribute_list) != attributes:
+                    return False
+            self._version = version
+        return True
+
+    def get_indices(self, pattern):
+        """Get the indices of all columns matching a tag pattern.
+        @param pattern: a L{TagPattern} or a string version of one
+        @returns: a (possibly-empty) tuple of 0-based indices, in column order
+        """
+        indices = self._pattern_map.get(pattern)
+        if indices is None:
+            parsed = TagPattern.parse(pattern)
+            indices = tuple(
+                i for i, column in enumerate(self._parsed_columns) if column and parsed.match(column)
+            )
+            if len(self._pattern_map) >= ColumnIndex.MAX_PATTERNS:
+                self._pattern_map = {}
+            self._pattern_map[pattern] = indices
+        return indices
+
+    def get_first_index(self, pattern):
+        """Get the index of the first column matching a tag pattern.
+        @param pattern: a L{TagPattern} or a string version of one
+        @returns: the 0-based index, or None if there is no match
+        """
+        indices = self.get_indices(pattern)
+        return indices[0] if indices else None
+
+    @staticmethod
+    def for_columns(columns):
+        """Get the index for a column list, compiling it if needed.
+        A L{ColumnList} keeps its index; any other list gets a new one.
+        @param columns: a list of L{Column} objects
+        @returns: a L{ColumnIndex} object
+        """
+        if isinstance(columns, ColumnList):
+            index = columns.index
+            if index is None or not index.is_current():
+                index = ColumnIndex(columns)
+                columns.index = index
+            return index
+        else:
+            return ColumnIndex(columns)
+
+
 class Row(object):
     """ An iterable row of values in a HXL dataset.
 
     If a value is part of a merged area, and not in the top left position, it will be a MergedCell object.
+
+    By default, a new row takes a copy of the values list. Filters
+    pass copy_values=False when they have already made a fresh list,
+    or when they are passing through the list from a transient
+    upstream row unchanged, so that a chain of filters copies a row's
+    values only when a filter actually changes them. Code that
+    changes values should replace the list or make its own copy
+    rather than assigning into a list it didn't create.
     """
 
     # Predefine the slots for efficiency (may reconsider later)
     __slots__ = ['columns', 'values', 'row_number', 'source_row_number']
 
-    def __init__(self, columns, values=[], row_number=None, source_row_number=None):
+    def __init__(self, columns, values=[], row_number=None, source_row_number=None, copy_values=True):
         """
         Set up a new row.
         @param columns: The column definitions (array of Column objects).
         @param values: (optional) The string values for the row (default: [])
         @param row_number: (optional) The zero-based logical row number in the input dataset, if available (default: None)
         @param source_row_number: (optional) The zero-based source row number in the input dataset, if available (default: None)
+        @param copy_values: (optional) if False, use the values list as-is, without copying (default: True)
         """
         self.columns = columns
-        self.values = copy.copy(values)
+        self.values = copy.copy(values) if copy_values else values
         self.row_number = row_number
         self.source_row_number = source_row_number
 
@@ -991,26 +2187,21 @@ class Row(object):
                     return [value]
             return value
 
-        if type(tag) is TagPattern:
-            pattern = tag
-        else:
-            pattern = TagPattern.parse(tag)
-
-        for i, column in enumerate(self.columns):
-            if i >= len(self.values):
+        values = self.values
+        for i in ColumnIndex.for_columns(self.columns).get_indices(tag):
+            if i >= len(values):
                 break
-            if pattern.match(column):
-                if index is None:
-                    # None (the default) is a special case: it means look
-                    # for the first truthy value
-                    if self.values[i]:
-                        return parse(column, self.values[i])
+            if index is None:
+                # None (the default) is a special case: it means look
+                # for the first truthy value
+                if values[i]:
+                    return parse(self.columns[i], values[i])
+            else:
+                # Otherwise, look for a specific index
+                if index == 0:
+                    return parse(self.columns[i], values[i])
                 else:
-                    # Otherwise, look for a specific index
-                    if index == 0:
-                        return parse(column, self.values[i])
-                    else:
-                        index = index - 1
+                    index = index - 1
         return default
 
     def get_all(self, tag, default=None):
@@ -1020,20 +2211,15 @@ class Row(object):
         @return An array of values for the HXL hashtag.
         """
 
-        if type(tag) is TagPattern:
-            pattern = tag
-        else:
-            pattern = TagPattern.parse(tag)
-
+        values = self.values
         result = []
-        for i, column in enumerate(self.columns):
-            if i >= len(self.values):
+        for i in ColumnIndex.for_columns(self.columns).get_indices(tag):
+            if i >= len(values):
                 break
-            if pattern.match(column):
-                value = self.values[i]
-                if default is not None and not value:
-                    value = default
-                result.append(value)
+            value = values[i]
+            if default is not None and not value:
+                value = default
+            result.append(value)
         return result
 
     def key(self, patterns=None, indices=None):
@@ -1098,6 +2284,9 @@ class Row(object):
 class RowQuery(object):
     """Query to execute against a row of HXL data."""
 
+    FORMULA_CACHE_SIZE = 256
+    """Maximum number of different row-formula results to keep a compiled predicate for"""
+
     def __init__(self, pattern, op, value, is_aggregate=False):
         """Constructor
         @param pattern: the L{TagPattern} to match in the row
@@ -1111,7 +2300,7 @@ class RowQuery(object):
 
         # if the value is a formula, extract it
         self.formula = None
-        result = re.match(r'^{{(.+)}}$', hxl.datatypes.normalise_space(value))
+        result = hxl.datatypes.is_string(value) and re.match(r'^{{(.+)}}$', hxl.datatypes.normalise_space(value))
         if result:
             self.formula = result.group(1)
 
@@ -1125,7 +2314,25 @@ class RowQuery(object):
         # calculate later
         self.date_value = None
         self.number_value = None
+        self.string_value = None
+        self.value_set = None
+        """Normalised string values for the "in" and "not in" operators"""
+        self._number_set = None
+        self._date_set = None
+        self._predicate = None
+        self._formula_cache = {}
+        """Prepared values and predicates by row-formula result (see L{_prepare_formula_value})"""
         self._saved_indices = None
+        self._saved_index = None
+
+    def __getstate__(self):
+        """Leave out the compiled predicates when pickling (e.g. for L{hxl.filters.parallel}); they will compile again on first use."""
+        state = dict(self.__dict__)
+        state['_predicate'] = None
+        state['_formula_cache'] = {}
+        state['_saved_indices'] = None
+        state['_saved_index'] = None
+        return state
 
     def calc_aggregate(self, dataset):
         """Calculate the aggregate value that we need for the row query
@@ -1137,7 +2344,7 @@ class RowQuery(object):
             logger.warning("no aggregate calculation needed")
             return # no need to calculate
         if not dataset.is_cached:
-            raise HXLException("need a cached dataset for calculating an aggregate value")
+            raise hxl.HXLException("need a cached dataset for calculating an aggregate value")
         if self.value == 'min':
             self.value = dataset.min(self.pattern)
             self.op = operator.eq
@@ -1151,48 +2358,218 @@ class RowQuery(object):
             self.value = dataset.max(self.pattern)
             self.op = operator.ne
         else:
-            raise HXLException("Unrecognised aggregate: {}".format(value))
+            raise hxl.HXLException("Unrecognised aggregate: {}".format(self.value))
         self.needs_aggregate = False
+        self._predicate = None # recompile with the new value and operator
 
     def match_row(self, row):
         """Check if a key-value pair appears in a HXL row"""
 
         # fail if we need an aggregate and haven't calculated it
-        if self.needs_aggregate and not self.aggregate_is_calculated:
-            raise HXLException("must call calc_aggregate before matching an 'is min' or 'is max' condition")
+        if self.needs_aggregate:
+            raise hxl.HXLException("must call calc_aggregate before matching an 'is min' or 'is max' condition")
 
-        # initialise is this is the first time matching for the row query
-        if self._saved_indices is None or self.formula:
+        # if it's a row formula, evaluate first; otherwise, compile if this is the first time matching
+        if self.formula:
+            self._prepare_formula_value(hxl.formulas.eval.eval(row, self.formula))
+        elif self._predicate is None:
+            self._prepare_value(self.value)
 
-            # if it's a row formula, evaluate first
-            if self.formula:
-                value = hxl.formulas.eval.eval(row, self.formula)
-            else:
-                value = self.value
+        # try all the matching column values
+        predicate = self._predicate
+        values = row.values
+        for i in self._get_saved_indices(row.columns):
+            if i < len(values) and predicate(values[i]):
+                return True
+        return False
 
+
+    def match_values(self, values):
+        """Test a list of single cell values independently.
+        This is useful for testing each distinct value in a column only once
+        (see L{ColumnarDataset.match_queries}). It is not available for
+        queries with row formulas, which need the whole row.
+        @param values: a list of cell values
+        @returns: a list of booleans, one for each value
+        @exception HXLException: if the query uses a row formula
+        """
+        if self.formula:
+            raise hxl.HXLException("Cannot match a row formula against single values: {}".format(self.formula))
+        if self._predicate is None:
+            self._prepare_value(self.value)
+        predicate = self._predicate
+        return [bool(predicate(value)) for value in values]
+
+    def _prepare_value(self, value):
+        """Pre-normalise the query value as a date, number, and string, and compile the predicate."""
+        if self.op in (RowQuery.operator_in, RowQuery.operator_not_in,):
+            self._prepare_set(value)
+            self._predicate = self._compile()
+            return
+
+        if self.pattern.tag == '#date':
+            try:
+                self.date_value = hxl.datatypes.normalise_date(value)
+            except ValueError:
+                self.date_value = None
+
+        try:
+            self.number_value = hxl.datatypes.normalise_number(value)
+        except ValueError:
+            self.number_value = None
+
+        self.string_value = hxl.datatypes.normalise_string(value)
+
+        self._predicate = self._compile()
+
+    def _prepare_formula_value(self, value):
+        """Prepare the result of a row formula, reusing the work from an earlier row with the same result.
+        Saves up to L{FORMULA_CACHE_SIZE} different results.
+        @param value: the result of the formula for the current row
+        """
+        try:
+            key = (type(value), value,) # 1, 1.0, and True are equal, but normalise differently
+            state = self._formula_cache.get(key)
+        except TypeError:
+            # unhashable result
+            self._prepare_value(value)
+            return
+        if state is None:
+            self._prepare_value(value)
+            if len(self._formula_cache) < self.FORMULA_CACHE_SIZE:
+                self._formula_cache[key] = (
+                    self.date_value, self.number_value, self.string_value,
+                    self.value_set, self._number_set, self._date_set, self._predicate,
+                )
+        else:
+            (
+                self.date_value, self.number_value, self.string_value,
+                self.value_set, self._number_set, self._date_set, self._predicate,
+            ) = state
+
+    def _prepare_set(self, values):
+        """Pre-normalise the values for a set-membership query into hash sets.
+        In a string, put double quotes around a value containing a comma, as in a
+        CSV file (e.g. C{org in "Save the Children, UK", UNICEF}).
+        @param values: a collection of values, or a string with comma-separated values
+        """
+        if hxl.datatypes.is_string(values):
+            values = next(csv.reader([values], skipinitialspace=True), None) or ['']
+        self.value_set = set()
+        self._number_set = set()
+        self._date_set = set()
+        for value in values:
             if self.pattern.tag == '#date':
                 try:
-                    self.date_value = hxl.datatypes.normalise_date(value)
+                    self._date_set.add(hxl.datatypes.normalise_date(value))
                 except ValueError:
-                    self.date_value = None
+                    pass
+            try:
+                self._number_set.add(hxl.datatypes.normalise_number(value))
+            except ValueError:
+                pass
+            self.value_set.add(hxl.datatypes.normalise_string(value))
 
+    def _match_set(self, value):
+        """Check for set membership as a date, as a number, or as a string."""
+        if self._date_set:
+            try:
+                if hxl.datatypes.normalise_date(value) in self._date_set:
+                    return True
+            except ValueError:
+                pass
+        if self._number_set:
             try:
-                self.number_value = hxl.datatypes.normalise_number(value)
+                if hxl.datatypes.normalise_number(value) in self._number_set:
+                    return True
             except ValueError:
-                self.number_value = None
+                pass
+        return hxl.datatypes.normalise_string(value) in self.value_set
 
-            self.string_value = hxl.datatypes.normalise_string(value)
+    def _compile(self):
+        """Compile the query into a single-value test function.
 
-        # try all the matching column values
-        indices = self._get_saved_indices(row.columns)
-        for i in indices:
-            if i < len(row.values) and self.match_value(row.values[i], self.op):
-                return True
-        return False
+        The function is specialised for the operator and for the types
+        the query value has (date, number, or string), so that each
+        cell skips the comparisons that can't apply. It always gives
+        the same result as L{match_value}.
 
+        @returns: a function that takes a raw cell value and returns a true value for a match
+        """
+        op = self.op
+        normalise_string = hxl.datatypes.normalise_string
+        normalise_number = hxl.datatypes.normalise_number
+
+        # set membership: hash lookups
+        if op in (RowQuery.operator_in, RowQuery.operator_not_in,):
+            if self._date_set or self._number_set:
+                match_set = self._match_set
+            else:
+                value_set = self.value_set
+                match_set = lambda value: normalise_string(value) in value_set
+            if op is RowQuery.operator_not_in:
+                return lambda value: not match_set(value)
+            else:
+                return match_set
+
+        date_value = self.date_value
+        number_value = self.number_value
+        string_value = self.string_value
+
+        # general version, with the same errors at the same time (when a cell is tested)
+        def match_general(value):
+            return self.match_value(value, op)
+
+        # dates are rare in queries; use the general version
+        if date_value is not None and op not in (RowQuery.operator_re, RowQuery.operator_nre,):
+            return match_general
+
+        # regular expressions: compile once (the number comparison always fails for a regex)
+        if op in (RowQuery.operator_re, RowQuery.operator_nre,):
+            try:
+                search = re.compile(string_value).search
+            except re.error:
+                return match_general
+            is_negated = (op is RowQuery.operator_nre)
+            if date_value is not None:
+                date_search = re.compile(date_value).search
+                normalise_date = hxl.datatypes.normalise_date
+                def match_regex_date(value):
+                    try:
+                        result = date_search(normalise_date(value))
+                    except ValueError:
+                        result = search(normalise_string(value))
+                    return not result if is_negated else result
+                return match_regex_date
+            elif is_negated:
+                return lambda value: not search(normalise_string(value))
+            else:
+                return lambda value: search(normalise_string(value))
+
+        # "is" tests: look up the test function once
+        if op is RowQuery.operator_is and number_value is None:
+            test = RowQuery.IS_TESTS.get(string_value)
+            if test is None:
+                return match_general
+            return lambda value: test(normalise_string(value))
+
+        # numbers, falling back to strings
+        if number_value is not None:
+            def match_number(value):
+                try:
+                    return op(normalise_number(value), number_value)
+                except Exception:
+                    return op(normalise_string(value), string_value)
+            return match_number
+
+        # strings only
+        return lambda value: op(normalise_string(value), string_value)
 
     def match_value(self, value, op):
         """Try matching as dates, then as numbers, then as simple strings"""
+        if op in (RowQuery.operator_in, RowQuery.operator_not_in,):
+            return self._match_set(value) != (op is RowQuery.operator_not_in)
+
         if self.date_value is not None:
             try:
                 return op(hxl.datatypes.normalise_date(value), self.date_value)
@@ -1208,21 +2585,29 @@ class RowQuery(object):
         return self.op(hxl.datatypes.normalise_string(value), self.string_value)
 
     def _get_saved_indices(self, columns):
-        """Cache the column tests, so that we run them only once."""
-        # FIXME - assuming that the columns never change
-        self._saved_indices = []
-        for i in range(len(columns)):
-            if self.pattern.match(columns[i]):
-                self._saved_indices.append(i)
+        """Cache the column tests, so that we run them only once per column index."""
+        index = ColumnIndex.for_columns(columns)
+        if self._saved_index is not index:
+            self._saved_indices = index.get_indices(self.pattern)
+            self._saved_index = index
         return self._saved_indices
 
     @staticmethod
     def parse(query):
-        """Parse a filter expression"""
-        if isinstance(query, RowQuery):
+        """Parse a filter expression
+        @param query: a query string, or a list of query strings that must all match
+        @returns: a L{RowQuery}, or a L{RowQueryConjunction} if the query has several parts joined with "&" (or is a list)
+        """
+        if isinstance(query, (RowQuery, RowQueryConjunction,)):
             # already parsed
             return query
-        parts = re.split(r'([<>]=?|!?=|!?~|\bis\b)', hxl.datatypes.normalise_string(query), maxsplit=1)
+        if hxl.datatypes.is_list(query):
+            return RowQueryConjunction(query) if len(query) > 1 else RowQuery.parse(query[0])
+        if '&' in query:
+            conjuncts = RowQuery.CONJUNCTION_PATTERN.split(query)
+            if len(conjuncts) > 1:
+                return RowQueryConjunction(conjuncts)
+        parts = re.split(r'([<>]=?|!?=|!?~|\bis\b|\s(?:not\s)?in\s)', hxl.datatypes.normalise_string(query), maxsplit=1)
         pattern = TagPattern.parse(parts[0])
         op_name = hxl.datatypes.normalise_string(parts[1])
         op = RowQuery.OPERATOR_MAP.get(op_name)
@@ -1235,7 +2620,9 @@ class RowQuery(object):
 
     @staticmethod
     def parse_list(queries):
-        """Parse a single query spec or a list of specs."""
+        """Parse a single query spec or a list of specs.
+        A nested list inside the list is a group of specs that must all match.
+        """
         if queries:
             if not hasattr(queries, '__len__') or isinstance(queries, six.string_types):
                 # make a list if needed
@@ -1267,6 +2654,16 @@ class RowQuery(object):
         """Regular-expression negative comparison operator."""
         return not re.search(pattern, s)
 
+    @staticmethod
+    def operator_in(s, values):
+        """Set-membership operator (values is a comma-separated list in a query string)."""
+        return s in values
+
+    @staticmethod
+    def operator_not_in(s, values):
+        """Negative set-membership operator."""
+        return s not in values
+
     @staticmethod
     def operator_is(s, condition):
         """Advanced tests
@@ -1289,6 +2686,21 @@ class RowQuery(object):
         else:
             raise hxl.HXLException('Unknown is condition: {}'.format(condition))
 
+    # Constant map of test functions for the "is" operator (see L{operator_is})
+    IS_TESTS = {
+        'empty': hxl.datatypes.is_empty,
+        'not empty': lambda s: not hxl.datatypes.is_empty(s),
+        'number': hxl.datatypes.is_number,
+        'not number': lambda s: not hxl.datatypes.is_number(s),
+        'date': hxl.datatypes.is_date,
+        'not date': lambda s: not hxl.datatypes.is_date(s),
+    }
+
+
+    # Split a query string into conjunctions at "&", but only where a new tag pattern and operator follow
+    CONJUNCTION_PATTERN = re.compile(
+        r'\s*&\s*(?=#?[\w*]+(?:\s*[+-]\s*\w+)*\s*!?\s*(?:[<>]=?|!?=|!?~|\bis\b|\s(?:not\s)?in\s))'
+    )
 
     # Constant map of comparison operators
     OPERATOR_MAP = {
@@ -1301,6 +2713,94 @@ class RowQuery(object):
     }
 
 
+class RowQueryConjunction(object):
+    """A group of row queries that must all match (logical AND).
+
+    Parsed from query specs joined with "&", such as "org=UNICEF &
+    adm1=Coast", or from a nested list in a list of query specs.
+
+    The first L{SAMPLE_SIZE} rows are tested against every query in
+    the group, to measure how long each one takes and how often it
+    fails. After that, the queries run in order of expected cost per
+    rejected row (cheap, selective tests first), stopping at the first
+    one that fails.
+    """
+
+    SAMPLE_SIZE = 100
+    """Number of rows to use for learning the evaluation order."""
+
+    def __init__(self, queries):
+        """Constructor
+        @param queries: a list of L{RowQuery} objects or query specs
+        """
+        self.queries = [RowQuery.parse(query) for query in queries]
+
+        self.order = list(self.queries)
+        """The current evaluation order (learned from the sample rows)."""
+
+        self._sample_count = 0
+        self._costs = [0.0] * len(self.queries)
+        self._passes = [0] * len(self.queries)
+
+    @property
+    def needs_aggregate(self):
+        """True if any of the queries still needs an aggregate value calculated."""
+        return any(query.needs_aggregate for query in self.queries)
+
+    @property
+    def formula(self):
+        """The first row formula used in any of the queries, or None."""
+        for query in self.queries:
+            if query.formula:
+                return query.formula
+        return None
+
+    def calc_aggregate(self, dataset):
+        """Calculate aggregate values for any queries that need them.
+        @param dataset: the HXL dataset to use (must be cached)
+        """
+        for query in self.queries:
+            if query.needs_aggregate:
+                query.calc_aggregate(dataset)
+
+    def match_row(self, row):
+        """Check if all of the queries match a HXL row."""
+        if self._sample_count < self.SAMPLE_SIZE:
+            return self._sample_row(row)
+        for query in self.order:
+            if not query.match_row(row):
+                return False
+        return True
+
+    def _sample_row(self, row):
+        """Test every query against the row, recording costs and results."""
+        timer = time.perf_counter
+        result = True
+        for i, query in enumerate(self.queries):
+            start = timer()
+            matched = query.match_row(row)
+            self._costs[i] += timer() - start
+            if matched:
+                self._passes[i] += 1
+            else:
+                result = False
+        self._sample_count += 1
+        if self._sample_count == self.SAMPLE_SIZE:
+            self._reorder()
+        return result
+
+    def _reorder(self):
+        """Sort the queries by average cost divided by failure rate.
+        Queries that never failed in the sample go last.
+        """
+        def rank(i):
+            failures = self._sample_count - self._passes[i]
+            if failures == 0:
+                return float('inf')
+            return self._costs[i] / failures
+        self.order = [self.queries[i] for i in sorted(range(len(self.queries)), key=rank)]
+
+
 # Static functions
 
 def get_column_indices(tag_patterns, columns):
@@ -1310,19 +2810,21 @@ def get_column_indices(tag_patterns, columns):
     @returns: a (possibly-empty) list of 0-based indices
     """
     tag_patterns = TagPattern.parse_list(tag_patterns)
-    columns = [Column.parse(column) for column in columns]
-    indices = []
-    for i, column in enumerate(columns):
-        for pattern in tag_patterns:
-            if pattern.match(column):
-                indices.append(i)
-    return indices
+    index = ColumnIndex.for_columns(columns)
+    if len(tag_patterns) == 1:
+        return list(index.get_indices(tag_patterns[0]))
+    # a column matching more than one pattern appears once per match
+    return sorted(itertools.chain.from_iterable(
+        index.get_indices(pattern) for pattern in tag_patterns
+    ))
 
 
 # Extra static initialisation
 RowQuery.OPERATOR_MAP['~'] = RowQuery.operator_re
 RowQuery.OPERATOR_MAP['!~'] = RowQuery.operator_nre
 RowQuery.OPERATOR_MAP['is'] = RowQuery.operator_is
+RowQuery.OPERATOR_MAP['in'] = RowQuery.operator_in
+RowQuery.OPERATOR_MAP['not in'] = RowQuery.operator_not_in
 
 
 # end
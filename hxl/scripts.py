@@ -86,6 +86,7 @@ usage: hxladd [-h] [--encoding [string]] [--sheet [number]]
               [--expand-merged] [--scan-ckan-resources]
               [--log debug|info|warning|error|critical|none] -s
               header#<tag>=<value> [-b]
+              [-j number]
               [infile] [outfile]
 
 Add new columns with constant or computed values to a HXL dataset.
@@ -119,6 +120,9 @@ options:
                         option)
   -b, --before          Add new columns before existing ones rather than
                         after them.
+  -j number, --jobs number
+                        Number of worker processes for filtering rows
+                        (default: 1, in this process)
 ```
 
 """
@@ -191,6 +195,7 @@ usage: hxlclean [-h] [--encoding [string]] [--sheet [number]]
                 [-d tag,tag...] [--date-format format] [-n tag,tag...]
                 [--number-format format] [--latlon tag,tag...] [-p]
                 [-q <tagspec><op><value>]
+                [-j number]
                 [infile] [outfile]
 
 Clean data in a HXL file by standardising formats.
@@ -245,6 +250,9 @@ options:
                         during cleaning.
   -q <tagspec><op><value>, --query <tagspec><op><value>
                         Clean only rows matching at least one query.
+  -j number, --jobs number
+                        Number of worker processes for filtering rows
+                        (default: 1, in this process)
 ```
 
 """
@@ -259,7 +267,8 @@ usage: hxlcount [-h] [--encoding [string]] [--sheet [number]]
                 [--remove-headers] [--strip-tags] [--ignore-certs]
                 [--expand-merged] [--scan-ckan-resources]
                 [--log debug|info|warning|error|critical|none]
-                [-t tag,tag...] [-a statement] [-q <tagspec><op><value>]
+                [-t tag,tag...] [-a statement] [--max-groups number]
+                [-q <tagspec><op><value>]
                 [infile] [outfile]
 
 Generate aggregate counts for a HXL dataset, similar to a spreadsheet
@@ -293,6 +302,8 @@ options:
                         Comma-separated list of column tags to count.
   -a statement, --aggregator statement
                         Aggregator statement
+  --max-groups number   Aggregate at most this many groups in memory at
+                        once, spilling the rest to temporary files.
   -q <tagspec><op><value>, --query <tagspec><op><value>
                         Count only rows that match at least one query.
 ```
@@ -405,6 +416,7 @@ usage: hxlhash [-h] [--encoding [string]] [--sheet [number]]
                [--selector [path]] [--http-header header]
                [--ignore-certs] [--expand-merged] [--scan-ckan-resources]
                [--log debug|info|warning|error|critical|none] [-H]
+               [-a md5|blake2b]
                [infile]
 
 Generate an MD5 hash for a HXL dataset (or just its header rows).
@@ -430,6 +442,9 @@ options:
   --log debug|info|warning|error|critical|none
                         Set minimum logging level
   -H, --headers-only    Hash only the header and hashtag rows.
+  -a md5|blake2b, --algorithm md5|blake2b
+                        Digest algorithm (blake2b is faster, but gives
+                        different hashes from md5). Default: md5
 ```
 
 """
@@ -442,7 +457,8 @@ def hxlinfo():
 usage: hxlinfo [-h] [--encoding [string]] [--sheet [number]]
                [--selector [path]] [--http-header header]
                [--ignore-certs] [--expand-merged] [--scan-ckan-resources]
-               [--log debug|info|warning|error|critical|none] [-H]
+               [--log debug|info|warning|error|critical|none] [-p]
+               [--top number]
                [infile]
 
 Return metadata for a data source in JSON format (the source does not have to be HXLated).
@@ -467,6 +483,11 @@ options:
                         for one that's HXLated
   --log debug|info|warning|error|critical|none
                         Set minimum logging level
+  -p, --profile         Profile the columns of a HXLated data source in one
+                        pass (counts, types, min/max, distinct and top
+                        values) instead.
+  --top number          Number of most-common values to show for each
+                        column with --profile (default: 5)
 ```
 
 """
@@ -586,6 +607,7 @@ usage: hxlreplace [-h] [--encoding [string]] [--sheet [number]]
                   [--log debug|info|warning|error|critical|none]
                   [-p [PATTERN]] [-s [SUBSTITUTION]] [-t tag,tag...] [-r]
                   [-m [PATH]] [-q <tagspec><op><value>]
+                  [-j number]
                   [infile] [outfile]
 
 Replace strings in a HXL dataset
@@ -617,6 +639,9 @@ options:
   -q <tagspec><op><value>, --query <tagspec><op><value>
                         Replace only in rows that match at least one
                         query.
+  -j number, --jobs number
+                        Number of worker processes for filtering rows
+                        (default: 1, in this process)
 
 Inline replacement:
   -p [PATTERN], --pattern [PATTERN]
@@ -845,8 +870,10 @@ usage: hxlselect [-h] [--encoding [string]] [--sheet [number]]
                  [--selector [path]] [--http-header header]
                  [--remove-headers] [--strip-tags] [--ignore-certs]
                  [--expand-merged] [--scan-ckan-resources]
-                 [--log debug|info|warning|error|critical|none] -q
-                 <tagspec><op><value> [-r]
+                 [--log debug|info|warning|error|critical|none]
+                 [-q <tagspec><op><value>] [--in-file file_or_url]
+                 [--in-keys tag,tag...] [-r]
+                 [-j number]
                  [infile] [outfile]
 
 Filter rows in a HXL dataset.
@@ -877,9 +904,21 @@ options:
                         Set minimum logging level
   -q <tagspec><op><value>, --query <tagspec><op><value>
                         Query expression for selecting rows (may repeat
-                        option for logical OR). <op> may be =, !=, <, <=,
-                        >, >=, ~, or !~
-  -r, --reverse         Show only lines *not* matching criteria
+                        option for logical OR, or join expressions with &
+                        for logical AND). <op> may be =, !=, <, <=, >, >=,
+                        ~, !~, in, or not in; for in and not in, separate
+                        values with commas, and put double quotes around a
+                        value containing a comma
+  --in-file file_or_url
+                        Select only rows whose --in-keys values appear in
+                        this HXL file
+  --in-keys tag,tag...  HXL tag patterns for the keys to look up in --in-
+                        file
+  -r, --reverse         Show only lines *not* matching criteria (not with
+                        both -q/--query and --in-file)
+  -j number, --jobs number
+                        Number of worker processes for filtering rows
+                        (default: 1, in this process)
 ```
 
 """
@@ -940,7 +979,9 @@ usage: hxlspec [-h] [--encoding [string]] [--sheet [number]]
                [--selector [path]] [--http-header header]
                [--remove-headers] [--strip-tags] [--ignore-certs]
                [--expand-merged] [--scan-ckan-resources]
-               [--log debug|info|warning|error|critical|none]
+               [--log debug|info|warning|error|critical|none] -s
+               spec.json [--explain] [--rows number]
+               [-j number]
                [infile] [outfile]
 
 Process a HXL JSON spec
@@ -969,6 +1010,16 @@ options:
                         for one that's HXLated
   --log debug|info|warning|error|critical|none
                         Set minimum logging level
+  -s spec.json, --spec spec.json
+                        JSON processing specification
+  --explain             Print the execution plan as JSON (filters, source
+                        passes, columns, and memory) instead of processing
+                        the data
+  --rows number         Estimated number of rows in the source, for the
+                        memory estimates with --explain
+  -j number, --jobs number
+                        Number of worker processes for filtering rows
+                        (default: 1, in this process)
 ```
 
 """
@@ -1108,13 +1159,15 @@ def hxladd_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
         default=False
     )
 
+    add_jobs_arg(parser)
+
     args = parser.parse_args(args)
 
     do_common_args(args)
 
     with make_source(args, stdin) as source, make_output(args, stdout) as output:
         filter = hxl.filters.AddColumnsFilter(source, specs=args.spec, before=args.before)
-        hxl.input.write_hxl(output.output, filter, show_tags=not args.strip_tags)
+        hxl.input.write_hxl(output.output, make_parallel(args, filter), show_tags=not args.strip_tags)
 
     return EXIT_OK
 
@@ -1257,6 +1310,8 @@ def hxlclean_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
         )
     add_queries_arg(parser, 'Clean only rows matching at least one query.')
 
+    add_jobs_arg(parser)
+
     args = parser.parse_args(args)
 
     do_common_args(args)
@@ -1268,7 +1323,7 @@ def hxlclean_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
             date=args.date, date_format=args.date_format, number=args.number, number_format=args.number_format,
             latlon=args.latlon, purge=args.purge, queries=args.query
         )
-        hxl.input.write_hxl(output.output, filter, show_headers=not args.remove_headers, show_tags=not args.strip_tags)
+        hxl.input.write_hxl(output.output, make_parallel(args, filter), show_headers=not args.remove_headers, show_tags=not args.strip_tags)
 
     return EXIT_OK
 
@@ -1304,6 +1359,13 @@ def hxlcount_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
         type=hxl.filters.Aggregator.parse,
         default=[]
         )
+    parser.add_argument(
+        '--max-groups',
+        help='Aggregate at most this many groups in memory at once, spilling the rest to temporary files.',
+        metavar='number',
+        type=int,
+        default=None
+        )
     add_queries_arg(parser, 'Count only rows that match at least one query.')
 
     args = parser.parse_args(args)
@@ -1311,7 +1373,7 @@ def hxlcount_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
     do_common_args(args)
 
     with make_source(args, stdin) as source, make_output(args, stdout) as output:
-        filter = hxl.filters.CountFilter(source, patterns=args.tags, aggregators=args.aggregator, queries=args.query)
+        filter = hxl.filters.CountFilter(source, patterns=args.tags, aggregators=args.aggregator, queries=args.query, max_groups=args.max_groups)
         hxl.input.write_hxl(output.output, filter, show_tags=not args.strip_tags)
 
     return EXIT_OK
@@ -1403,6 +1465,14 @@ def hxlhash_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
         const=True,
         default=False
         )
+    parser.add_argument(
+        '-a',
+        '--algorithm',
+        help='Digest algorithm (blake2b is faster, but gives different hashes from md5). Default: md5',
+        metavar='md5|blake2b',
+        choices=['md5', 'blake2b'],
+        default='md5'
+        )
 
     args = parser.parse_args(args)
 
@@ -1410,9 +1480,9 @@ def hxlhash_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
 
     with make_source(args, stdin) as source:
         if args.headers_only:
-            print(source.columns_hash)
+            print(source.get_columns_hash(args.algorithm))
         else:
-            print(source.data_hash)
+            print(source.get_data_hash(args.algorithm))
 
     return EXIT_OK
 
@@ -1429,12 +1499,31 @@ def hxlinfo_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
         'Display JSON-formatted metadata for a data source (does not have to be HXLated).',
         hxl_output=False
     )
+    parser.add_argument(
+        '-p',
+        '--profile',
+        help='Profile the columns of a HXLated data source in one pass (counts, types, min/max, distinct and top values) instead.',
+        action='store_const',
+        const=True,
+        default=False
+    )
+    parser.add_argument(
+        '--top',
+        help='Number of most-common values to show for each column with --profile (default: 5)',
+        metavar='number',
+        type=int,
+        default=5
+    )
 
     args = parser.parse_args(args)
 
     do_common_args(args)
 
-    json.dump(hxl.input.info(args.infile or stdin, make_input_options(args)), stdout, indent=2, ensure_ascii=False)
+    if args.profile:
+        with make_source(args, stdin) as source:
+            json.dump(source.describe(top_n=args.top), stdout, indent=2, ensure_ascii=False)
+    else:
+        json.dump(hxl.input.info(args.infile or stdin, make_input_options(args)), stdout, indent=2, ensure_ascii=False)
 
     return EXIT_OK
 
@@ -1595,6 +1684,8 @@ def hxlreplace_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
 
     add_queries_arg(parser, 'Replace only in rows that match at least one query.')
 
+    add_jobs_arg(parser)
+
     args = parser.parse_args(args)
 
     do_common_args(args)
@@ -1607,7 +1698,7 @@ def hxlreplace_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
                 hxl.filters.ReplaceDataFilter.Replacement(args.pattern, args.substitution, args.tags, args.regex)
             ]
         filter = hxl.filters.ReplaceDataFilter(source, replacements, queries=args.query)
-        hxl.input.write_hxl(output.output, filter, show_tags=not args.strip_tags)
+        hxl.input.write_hxl(output.output, make_parallel(args, filter), show_tags=not args.strip_tags)
 
     return EXIT_OK
 
@@ -1802,26 +1893,55 @@ def hxlselect_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
     parser.add_argument(
         '-q',
         '--query',
-        help='Query expression for selecting rows (may repeat option for logical OR). <op> may be =, !=, <, <=, >, >=, ~, or !~',
+        help='Query expression for selecting rows (may repeat option for logical OR, or join expressions with & for logical AND). <op> may be =, !=, <, <=, >, >=, ~, !~, in, or not in; for in and not in, separate values with commas, and put double quotes around a value containing a comma',
         action='append',
-        metavar='<tagspec><op><value>',
-        required=True
+        metavar='<tagspec><op><value>'
+        )
+    parser.add_argument(
+        '--in-file',
+        help='Select only rows whose --in-keys values appear in this HXL file',
+        metavar='file_or_url'
+        )
+    parser.add_argument(
+        '--in-keys',
+        help='HXL tag patterns for the keys to look up in --in-file',
+        metavar='tag,tag...',
+        type=hxl.model.TagPattern.parse_list
         )
     parser.add_argument(
         '-r',
         '--reverse',
-        help='Show only lines *not* matching criteria',
+        help='Show only lines *not* matching criteria (not with both -q/--query and --in-file)',
         action='store_const',
         const=True,
         default=False
         )
+    add_jobs_arg(parser)
+
     args = parser.parse_args(args)
 
+    if not args.query and not args.in_file:
+        parser.error('at least one of -q/--query or --in-file is required')
+    if args.in_file and not args.in_keys:
+        parser.error('--in-file requires --in-keys')
+    if args.reverse and args.query and args.in_file:
+        # reversing each test separately would select rows matching neither, not the complement of both
+        parser.error('-r/--reverse cannot be combined with both -q/--query and --in-file')
+
     do_common_args(args)
 
     with make_source(args, stdin) as source, make_output(args, stdout) as output:
-        filter = hxl.filters.RowFilter(source, queries=args.query, reverse=args.reverse)
-        hxl.input.write_hxl(output.output, filter, show_tags=not args.strip_tags)
+        filter = source
+        if args.query:
+            filter = hxl.filters.RowFilter(filter, queries=args.query, reverse=args.reverse)
+        if args.in_file:
+            filter = hxl.filters.MembershipFilter(
+                filter,
+                hxl.data(args.in_file, make_input_options(args)),
+                keys=args.in_keys,
+                reverse=args.reverse
+            )
+        hxl.input.write_hxl(output.output, make_parallel(args, filter), show_tags=not args.strip_tags)
 
     return EXIT_OK
 
@@ -1901,6 +2021,22 @@ def hxlspec_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
         metavar="spec.json",
         type=get_json,
     )
+    parser.add_argument(
+        '--explain',
+        help="Print the execution plan as JSON (filters, source passes, columns, and memory) instead of processing the data",
+        action='store_const',
+        const=True,
+        default=False
+    )
+    parser.add_argument(
+        '--rows',
+        help="Estimated number of rows in the source, for the memory estimates with --explain",
+        metavar='number',
+        type=int,
+        default=None
+    )
+
+    add_jobs_arg(parser)
 
     args = parser.parse_args(args)
 
@@ -1908,7 +2044,10 @@ def hxlspec_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
 
     with make_input(args, stdin) as input, make_output(args, stdout) as output:
         source = hxl.input.from_spec(args.spec, input=input, allow_local_ok=True)
-        hxl.input.write_hxl(output, source, show_tags=not args.strip_tags)
+        if args.explain:
+            json.dump(source.explain(row_estimate=args.rows), output.output, indent=2, ensure_ascii=False)
+        else:
+            hxl.input.write_hxl(output.output, make_parallel(args, source), show_tags=not args.strip_tags)
 
 
 def hxltag_main(args, stdin=STDIN, stdout=sys.stdout, stderr=sys.stderr):
@@ -2171,6 +2310,27 @@ def add_queries_arg(parser, help='Apply only to rows matching at least one query
     return parser
 
 
+def add_jobs_arg(parser):
+    """Add the --jobs option for running the row-by-row filters in parallel (see hxl.filters.parallel)."""
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        help='Number of worker processes for filtering rows (default: 1, in this process)',
+        metavar='number',
+        type=int,
+        default=1
+    )
+    return parser
+
+
+def make_parallel(args, source):
+    """Run the row-by-row filters in a chain in worker processes if requested with --jobs."""
+    if args.jobs > 1:
+        return hxl.filters.parallel(source, workers=args.jobs)
+    else:
+        return source
+
+
 def do_common_args(args):
     """Process standard args"""
     logging.basicConfig(format='%(levelname)s (%(name)s): %(message)s', level=args.log.upper())
@@ -1,9 +1,11 @@
 """ Other misc utilities
 """
 
+import collections
 import logging
 import os
 import sys
+import threading
 import structlog
 
 def logup(msg, props={}, level="notset"):
@@ -27,3 +29,125 @@ def logup(msg, props={}, level="notset"):
         "debug": 10
     }
     input_logger.log(level=levels[level], event=msg, **props)
+
+
+class LRUCache(object):
+    """Bounded, thread-safe least-recently-used cache with hit/miss counters.
+
+    Used to intern parsed objects and memoise expensive normalisation
+    functions. Once the cache holds ``maxsize`` entries, adding a new
+    one evicts the entry that was used least recently.
+
+    Example:
+    ```
+    cache = LRUCache(1024)
+    value = cache.get(key, MISSING)
+    if value is MISSING:
+        value = expensive_function(key)
+        cache.put(key, value)
+    ```
+
+    """
+
+    def __init__(self, maxsize=4096):
+        """
+        Args:
+            maxsize (int): the maximum number of entries to keep (0 disables the cache)
+
+        """
+        self.maxsize = maxsize
+        """Maximum number of entries to keep."""
+
+        self.hits = 0
+        """Number of lookups that found a saved entry."""
+
+        self.misses = 0
+        """Number of lookups that did not find a saved entry."""
+
+        self.evictions = 0
+        """Number of entries dropped to keep the cache under maxsize."""
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Look up a saved entry, and mark it as recently used.
+
+        Args:
+            key: the (hashable) key to look up
+            default: the value to return if the key is not in the cache
+
+        Returns:
+            the saved value, or ``default`` if not found
+
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Save an entry, evicting the least-recently-used one if full.
+
+        Args:
+            key: the (hashable) key to save under
+            value: the value to save
+
+        """
+        with self._lock:
+            if self.maxsize <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, maxsize):
+        """Change the maximum size, evicting entries if needed.
+
+        Args:
+            maxsize (int): the new maximum number of entries (0 disables the cache)
+
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        """Proportion of lookups that found a saved entry (0.0 if no lookups yet)."""
+        total = self.hits + self.misses
+        return (self.hits / total) if total else 0.0
+
+    def stats(self):
+        """Report cache statistics.
+
+        Returns:
+            dict: the current size, maxsize, hits, misses, evictions, and hit rate
+
+        """
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def __len__(self):
+        return len(self._entries)
@@ -126,6 +126,16 @@ class AbstractRuleTest(object):
         """
         self.callback = callback
 
+    def get_column_type(self, column):
+        """Get the type-inference object for a column.
+        Tests can use it to classify repeated values only once. The
+        cache is kept with the column, so it's shared by every test
+        (and every other consumer) that sees the same column.
+        @param column: the L{hxl.model.Column}
+        @returns: a L{hxl.model.ColumnType} for the column (see L{hxl.model.ColumnType.for_column})
+        """
+        return hxl.model.ColumnType.for_column(column)
+
     def needs_scan(self):
         """Report whether this test requires a cached dataset.
 
@@ -355,7 +365,7 @@ class DatatypeTest(AbstractRuleTest):
             )
         
         if self.datatype == 'number':
-            if not hxl.datatypes.is_number(value):
+            if not self.get_column_type(column).is_number(value):
                 status = report("Expected a number")
         elif self.datatype == 'url':
             pieces = urllib.parse.urlparse(value)
@@ -368,7 +378,7 @@ class DatatypeTest(AbstractRuleTest):
             if not re.match(r'^\+?[0-9xX()\s-]{5,}$', value):
                 status= report("Expected a phone number")
         elif self.datatype == 'date':
-            if not hxl.datatypes.is_date(value):
+            if not self.get_column_type(column).is_date(value):
                 status = report("Expected a date")
         return status
 
@@ -790,10 +800,9 @@ class ConsistentDatatypesTest(AbstractRuleTest):
 
     def guess_type(self, value, column):
         """Guess the type of a value"""
-        if column.tag == '#date' and hxl.datatypes.is_date(value):
-            return 'date'
-        elif hxl.datatypes.is_number(value):
-            return 'number'
+        datatype = self.get_column_type(column).typeof(value)
+        if datatype in ('date', 'number',):
+            return datatype
         else:
             return 'text'
 
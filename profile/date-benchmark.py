@@ -0,0 +1,34 @@
+""" Compare the table-driven date parser with the dateutil fallback in hxl.datatypes.normalise_date()
+"""
+
+import datetime, timeit
+import dateutil.parser
+import hxl.datatypes
+
+VALUES = [
+    '13/01/2020',
+    '1/2/2020',
+    '2020/01/13',
+    '05-Mar-2020',
+    '5 March 2020',
+    'March 5, 2020',
+    'Jan 2020',
+]
+
+REPEAT = 10000
+
+def dateutil_only(value, dayfirst=True):
+    """ The full dateutil path used before the fast parser (parse twice to detect defaults) """
+    date1 = dateutil.parser.parse(value, default=datetime.datetime(2015, 1, 1), dayfirst=dayfirst)
+    date2 = dateutil.parser.parse(value, default=datetime.datetime(2016, 3, 3), dayfirst=dayfirst)
+    return date1, date2
+
+for value in VALUES:
+    fast = timeit.timeit(lambda: hxl.datatypes.normalise_date(value), number=REPEAT)
+    slow = timeit.timeit(lambda: dateutil_only(value), number=REPEAT)
+    print('{:<16} {:>8.2f} us {:>8.2f} us {:>6.1f}x'.format(
+        value,
+        fast / REPEAT * 1000000,
+        slow / REPEAT * 1000000,
+        slow / fast
+    ))
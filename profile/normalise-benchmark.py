@@ -0,0 +1,46 @@
+""" Compare hxl.datatypes.normalise_string() and normalise_space() with the unidecode + regex versions they replaced
+"""
+
+import re, timeit
+import unidecode
+import hxl.datatypes
+
+VALUES = [
+    'WASH',
+    '  Education  ',
+    'Save the Children',
+    "Ministry of\nHealth",
+    'Pláins',
+    'Côte d\'Ivoire',
+    '',
+]
+
+REPEAT = 100000
+
+WHITESPACE_PATTERN = re.compile(r'\s+', re.MULTILINE)
+
+def regex_space(value):
+    """ The regular-expression version of normalise_space() """
+    if hxl.datatypes.is_empty(value):
+        return ''
+    return re.sub(WHITESPACE_PATTERN, ' ', str(value).strip().replace("\n", " "))
+
+def regex_string(value):
+    """ The unidecode version of normalise_string() """
+    return regex_space(unidecode.unidecode(str(value))).lower()
+
+for label, fast_function, slow_function in (
+        ('normalise_string', hxl.datatypes.normalise_string, regex_string,),
+        ('normalise_space', hxl.datatypes.normalise_space, regex_space,),
+):
+    print(label)
+    for value in VALUES:
+        assert fast_function(value) == slow_function(value)
+        fast = timeit.timeit(lambda: fast_function(value), number=REPEAT)
+        slow = timeit.timeit(lambda: slow_function(value), number=REPEAT)
+        print('  {:<20} {:>8.3f} us {:>8.3f} us {:>6.1f}x'.format(
+            repr(value),
+            fast / REPEAT * 1000000,
+            slow / REPEAT * 1000000,
+            slow / fast
+        ))
@@ -29,6 +29,19 @@ class TestStrings(unittest.TestCase):
         self.assertEqual('foo', hxl.datatypes.normalise_string('  FoO  '))
         self.assertEqual('foo bar', hxl.datatypes.normalise_string("  FOO  \r\n bAr  "))
 
+    def test_normalise_same_as_unidecode(self):
+        """ The ASCII fast path and transliteration table give the same results as unidecode and a regex """
+        import re, unidecode
+        values = [
+            'WASH', '  Pláins ', 'Côte d\'Ivoire', 'İstanbul', 'Straße', '北京', "a\u00a0b\u2003c\x1fd",
+            "\u3000\u3000", "x\u0085y", '\U0001F600', 'Ǆ', 3, 3.5, True,
+        ]
+        for value in values:
+            expected = re.sub(r'\s+', ' ', unidecode.unidecode(str(value)).strip()).lower()
+            self.assertEqual(expected, hxl.datatypes.normalise_string(value), repr(value))
+            expected = re.sub(r'\s+', ' ', str(value).strip())
+            self.assertEqual(expected, hxl.datatypes.normalise_space(value), repr(value))
+
 class TestNumbers(unittest.TestCase):
 
     def test_is_number(self):
@@ -117,6 +130,29 @@ class TestDates(unittest.TestCase):
         self.assertEqual('2008-01-20', hxl.datatypes.normalise_date('20-01-2008'))
         self.assertEqual('2008-01', hxl.datatypes.normalise_date('Jan 2008'))
 
+    def test_fast_parser_matches_dateutil(self):
+        """ The fast path for common formats gives the same results as dateutil """
+        import unittest.mock
+        values = [
+            '13/01/2020', '1/2/2020', '01.02.2020', '2/13/2020', '2020/1/2', '2020/13/1', '2020.01.13',
+            '05-Mar-2020', '5 march 2020', 'Sept 5 2020', 'March 5, 2020', 'Jan 2020', 'JULY-2021',
+            '29/2/2021', '31/4/2020', '13/13/2020', '0/1/2020', '5 Mays 2020',
+        ]
+        def parse_all():
+            results = []
+            for value in values:
+                for dayfirst in (True, False,):
+                    try:
+                        results.append(hxl.datatypes.normalise_date(value, dayfirst=dayfirst))
+                    except ValueError:
+                        results.append(None)
+            return results
+        fast_results = parse_all()
+        with unittest.mock.patch('hxl.datatypes._parse_common_date', return_value=None):
+            self.assertEqual(parse_all(), fast_results)
+        self.assertEqual('2020-01-13', hxl.datatypes._parse_common_date('13/01/2020'))
+        self.assertIsNone(hxl.datatypes._parse_common_date('29/2/2021'))
+
     def test_partial_dates(self):
         # Year alone is OK
         self.assertTrue(hxl.datatypes.normalise_date('2018'))
@@ -162,3 +198,71 @@ class TestFlatten(unittest.TestCase):
         input = {'a': 'b', 'c': ['d', 'e']}
         output = '{"a": "b", "c": ["d", "e"]}'
         self.assertEqual(output, hxl.datatypes.flatten(input))
+
+
+class TestMemoisation(unittest.TestCase):
+
+    def tearDown(self):
+        hxl.datatypes.disable_memoisation()
+
+    def test_disabled_by_default(self):
+        self.assertEqual({}, hxl.datatypes.get_memoisation_stats())
+        self.assertEqual('foo', hxl.datatypes.normalise_string('  FoO  '))
+
+    def test_hits(self):
+        hxl.datatypes.enable_memoisation(functions=['normalise_string'])
+        for i in range(100):
+            self.assertEqual('afghanistan', hxl.datatypes.normalise_string(' Afghanistan'))
+        stats = hxl.datatypes.get_memoisation_stats()
+        self.assertEqual(['normalise_string'], list(stats.keys()))
+        self.assertEqual(99, stats['normalise_string']['hits'])
+        self.assertEqual(1, stats['normalise_string']['misses'])
+        self.assertTrue(stats['normalise_string']['hit_rate'] > 0.95)
+
+    def test_same_results(self):
+        values = ['  FoO  ', '3.0', '3', 3, 3.0, None, '2020-01-13', '13/1/2020', 'x']
+        def run():
+            results = []
+            for value in values:
+                results.append(hxl.datatypes.normalise(value))
+                results.append(hxl.datatypes.normalise(value, hxl.model.Column('#date')))
+                results.append(hxl.datatypes.normalise_space(value))
+                results.append(hxl.datatypes.normalise_string(value))
+            return results
+        expected = run()
+        hxl.datatypes.enable_memoisation()
+        self.assertEqual(expected, run())
+        self.assertEqual(expected, run()) # from the caches
+
+    def test_exceptions_cached(self):
+        hxl.datatypes.enable_memoisation(functions='normalise_date')
+        for i in range(2):
+            with self.assertRaises(ValueError):
+                hxl.datatypes.normalise_date('not a date')
+        self.assertEqual(1, hxl.datatypes.get_memoisation_stats()['normalise_date']['hits'])
+
+    def test_dayfirst_key(self):
+        hxl.datatypes.enable_memoisation()
+        self.assertEqual('2020-02-01', hxl.datatypes.normalise_date('1/2/2020'))
+        self.assertEqual('2020-01-02', hxl.datatypes.normalise_date('1/2/2020', dayfirst=False))
+
+    def test_maxsize(self):
+        hxl.datatypes.enable_memoisation(maxsize={'normalise_string': 2})
+        for value in ['a', 'b', 'c']:
+            hxl.datatypes.normalise_string(value)
+        stats = hxl.datatypes.get_memoisation_stats()
+        self.assertEqual(2, stats['normalise_string']['size'])
+        self.assertEqual(1, stats['normalise_string']['evictions'])
+        self.assertEqual(hxl.datatypes.DEFAULT_MEMO_SIZE, stats['normalise']['maxsize'])
+
+    def test_early_reference(self):
+        """ A reference to a function taken before enabling memoisation still uses the cache """
+        normalise_string = hxl.datatypes.normalise_string
+        hxl.datatypes.enable_memoisation(functions=['normalise_string'])
+        self.assertEqual('foo', normalise_string('FOO'))
+        self.assertEqual('foo', normalise_string('FOO'))
+        self.assertEqual(1, hxl.datatypes.get_memoisation_stats()['normalise_string']['hits'])
+
+    def test_unknown_function(self):
+        with self.assertRaises(ValueError):
+            hxl.datatypes.enable_memoisation(functions=['is_empty'])
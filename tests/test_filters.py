@@ -9,7 +9,7 @@ License: Public Domain
 
 import unittest
 
-import datetime, hxl
+import copy, datetime, hxl, threading
 
 # Mock URL access so that tests work offline
 from . import URL_MOCK_TARGET, URL_MOCK_OBJECT
@@ -170,6 +170,21 @@ class TestRecipe(AbstractBaseFilterTest):
         })
         self.assertEqual(type(filtered).__name__, 'MergeDataFilter')
 
+    def test_with_rows_in(self):
+        filtered = self.source.recipe({
+            'filter': 'with_rows_in',
+            'reference_source': DATA,
+            'keys': 'org'
+        })
+        self.assertEqual(type(filtered).__name__, 'MembershipFilter')
+        self.assertFalse(filtered.reverse)
+        filtered = self.source.recipe({
+            'filter': 'without_rows_in',
+            'reference_source': DATA,
+            'keys': 'org'
+        })
+        self.assertTrue(filtered.reverse)
+
     def test_rename_columns(self):
         filtered = self.source.recipe({
             'filter': 'rename_columns',
@@ -267,6 +282,19 @@ class TestAddColumnsFilter(AbstractBaseFilterTest):
             self.source.add_columns(self.spec).values
         )
 
+    def test_ragged_rows(self):
+        """New values line up with the new columns, even if a row is short or long"""
+        ragged = [DATA[1], ['NGO A', 'WASH'], DATA[2] + ['extra']]
+        self.assertEqual(
+            [['NGO A', 'WASH', '', '', 'Country A'], DATA[2] + ['Country A']],
+            hxl.data(ragged).add_columns(self.spec).values
+        )
+        # before the existing columns, the row doesn't need to change
+        self.assertEqual(
+            [['Country A', 'NGO A', 'WASH'], ['Country A'] + DATA[2] + ['extra']],
+            hxl.data(ragged).add_columns(self.spec, before=True).values
+        )
+
     def test_dynamic_value(self):
         self.assertEqual(
             [values + [values[1]] for values in DATA[2:]],
@@ -381,6 +409,29 @@ class TestCacheFilter(AbstractBaseFilterTest):
         self.assertEqual(2, len(rows1))
         self.assertEqual(rows1, rows2)
 
+    def test_changes_not_cached(self):
+        # changing values downstream must not change the cached copy
+        source = hxl.data(DATA).cache()
+        for row in source.with_rows('org=NGO A').rename_columns('#org:#org+name'):
+            row.values[0] = 'Changed'
+            row.append('Extra')
+        self.assertEqual(DATA[2:], source.values)
+
+    def test_unchanged_values_shared(self):
+        # pass-through streaming filters don't copy the values list
+        class Recorder(hxl.filters.AbstractStreamingFilter):
+            def __init__(self, source):
+                super().__init__(source)
+                self.seen = []
+            def filter_row(self, row):
+                self.seen.append(row.values)
+                return row.values
+        recorder = Recorder(hxl.data(DATA).cache().with_rows('org=NGO A'))
+        rows = list(recorder.rename_columns('#org:#org+name').dedup())
+        self.assertEqual(2, len(rows))
+        for i, row in enumerate(rows):
+            self.assertIs(recorder.seen[i], row.values)
+
 
 class TestCleanDataFilter(AbstractBaseFilterTest):
 
@@ -398,7 +449,14 @@ class TestCleanDataFilter(AbstractBaseFilterTest):
             ['NGO B', 'Child Protection', 'Coast', '300']
         ]
         self.assertEqual(DATA_OUT, hxl.data(DATA_IN).clean_data(whitespace='sector').values)
-        
+
+    def test_other_columns_unchanged(self):
+        DATA_IN = [
+            ['#org', '#sector', '#affected'],
+            [None, ' Health', 100],
+        ]
+        self.assertEqual([[None, 'Health', 100]], hxl.data(DATA_IN).clean_data(whitespace='sector').values)
+
     def test_numbers(self):
         DATA_IN = [
             ['Organisation', 'Cluster', 'District', 'Count'],
@@ -801,6 +859,48 @@ class TestCountFilter(AbstractBaseFilterTest):
         ]
         self.assertEqual(expected, self.source.count('#sector', queries='adm1=Coast').values)
 
+    def test_shared_type_cache(self):
+        """Every group shares its aggregator's cache of typed values"""
+        DATA_IN = [['#org', '#affected']] + [['Org {}'.format(i), '100'] for i in range(50)]
+        with patch.object(hxl.model.ColumnType, '_classify', side_effect=hxl.model.ColumnType._classify, autospec=True) as mock_classify:
+            filtered = hxl.data(DATA_IN).count('org', 'sum(#affected)')
+            self.assertEqual(sorted([[row[0], 100] for row in DATA_IN[1:]]), filtered.values)
+            self.assertEqual(1, mock_classify.call_count)
+
+        aggregator = hxl.filters.Aggregator.parse('concat(#sector)')
+        aggregator_copy = copy.deepcopy(aggregator)
+        aggregator_copy.evaluate_row(next(iter(self.source)))
+        self.assertEqual(set(), aggregator.values)
+
+    def test_max_groups(self):
+        """Spilling groups to temporary files gives the same result"""
+        DATA = [['#adm1+code', '#date', '#affected', '#sector']] + [
+            ['P{}'.format(i % 37), '2020-01-{:02d}'.format(i % 5 + 1), str(i * 1.1), 'S{}'.format(i % 3)] for i in range(500)
+        ]
+        aggregators = [
+            'count()',
+            'sum(#affected)',
+            'average(#affected)',
+            'min(#affected)',
+            'max(#affected)',
+            'concat(#sector)',
+        ]
+        expected = hxl.data(DATA).count(['adm1', 'date'], aggregators).values
+        for max_groups in (1, 10, 100, 1000):
+            filtered = hxl.data(DATA).count(['adm1', 'date'], aggregators, max_groups=max_groups)
+            self.assertEqual(expected, filtered.values)
+        filtered = hxl.data(DATA).count(['adm1', 'date'], aggregators, queries='sector=S1', max_groups=3)
+        self.assertEqual(hxl.data(DATA).count(['adm1', 'date'], aggregators, queries='sector=S1').values, filtered.values)
+
+    def test_max_groups_recipe(self):
+        filtered = hxl.data(DATA).recipe({'filter': 'count', 'patterns': 'org', 'max_groups': 1})
+        self.assertEqual(1, filtered.max_groups)
+        self.assertEqual([['NGO A', 2], ['NGO B', 2]], filtered.values)
+
+    def test_bad_max_groups(self):
+        with self.assertRaises(hxl.filters.HXLFilterException):
+            self.source.count('org', max_groups=0)
+
 
 class TestDeduplicationFilter (AbstractBaseFilterTest):
 
@@ -831,6 +931,51 @@ class TestDeduplicationFilter (AbstractBaseFilterTest):
         self.assertEqual(self.DATA_OUT_FILTERED[2:], self.source.dedup(queries='sector=Education').values)
 
 
+class TestMembershipFilter(AbstractBaseFilterTest):
+
+    REFERENCE = [
+        ['District', 'Organisation'],
+        ['#adm1', '#org'],
+        ['coaST', 'NGO A'],       # deliberate case variation
+        ['', ''],                 # blank keys are ignored
+    ]
+
+    def test_with_rows_in(self):
+        self.assertEqual(
+            [DATA[2], DATA[4]],
+            self.source.with_rows_in(self.REFERENCE, 'adm1').values
+        )
+
+    def test_without_rows_in(self):
+        self.assertEqual(
+            [DATA[3], DATA[5]],
+            self.source.without_rows_in(self.REFERENCE, 'adm1').values
+        )
+
+    def test_composite_keys(self):
+        self.assertEqual(
+            [DATA[2]],
+            self.source.with_rows_in(self.REFERENCE, 'adm1,org').values
+        )
+
+    def test_reference_keys(self):
+        reference = [
+            ['#org+name'],
+            ['NGO B'],
+        ]
+        self.assertEqual(
+            [DATA[3], DATA[4]],
+            self.source.with_rows_in(reference, 'org', reference_keys='org+name').values
+        )
+        with self.assertRaises(hxl.filters.HXLFilterException):
+            self.source.with_rows_in(reference, 'org,adm1', reference_keys='org+name')
+
+    def test_reference_read_once(self):
+        reference = hxl.data(self.REFERENCE)
+        filtered = self.source.with_rows_in(reference, 'adm1')
+        self.assertEqual(filtered.values, filtered.values)
+
+
 class TestMergeDataFilter(AbstractBaseFilterTest):
 
     MERGE_IN = [
@@ -1101,6 +1246,28 @@ class TestRowCountFilter(AbstractBaseFilterTest):
             pass
         self.assertEqual(2, counter.row_count)
 
+
+class TestHashingFilter(AbstractBaseFilterTest):
+
+    def test_hash(self):
+        hasher = self.source.hasher()
+        self.assertEqual(self.source.values, hasher.values)
+        self.assertEqual(self.source.data_hash, hasher.hexdigest)
+
+    def test_algorithm(self):
+        hasher = self.source.hasher('blake2b')
+        for row in hasher:
+            pass
+        self.assertEqual(self.source.get_data_hash('blake2b'), hasher.hexdigest)
+
+    def test_repeat(self):
+        source = self.source.cache()
+        hasher = source.hasher()
+        for i in range(2):
+            for row in hasher:
+                pass
+        self.assertEqual(source.data_hash, hasher.hexdigest)
+
 class TestJSONPathFilter(unittest.TestCase):
 
     DATA = [
@@ -1160,6 +1327,16 @@ class TestRowFilter(unittest.TestCase):
         self.assertEqual(self.DATA[3:5], self.source.with_rows(['#sector=education']).values)
         self.assertEqual(self.DATA[3:5], self.source.with_rows('#sector=education').values)
 
+    def test_with_rows_and(self):
+        self.assertEqual(self.DATA[4:5], self.source.with_rows('#sector=education & adm1=coast').values)
+        self.assertEqual(self.DATA[4:5], self.source.with_rows([['#sector=education', 'adm1=coast']]).values)
+        # OR of conjunctions
+        self.assertEqual(
+            [self.DATA[2], self.DATA[4]],
+            self.source.with_rows(['#sector=education & adm1=coast', 'org=NGO A & affected>150']).values
+        )
+        self.assertEqual([self.DATA[2], self.DATA[3], self.DATA[5]], self.source.without_rows('#sector=education & adm1=coast & affected=300').values)
+
     def test_with_rows_formula(self):
         DATA = [
             ['#foo1', '#foo2'],
@@ -1502,6 +1679,490 @@ class TestFillDataFilter(AbstractBaseFilterTest):
         )
 
 
+class TestBatches(AbstractBaseFilterTest):
+    """Batch iteration should produce the same rows as iterating one row at a time."""
+
+    def assertSameRows(self, make_filter, sizes=(1, 2, 3, 100)):
+        expected = [(row.row_number, row.values) for row in make_filter()]
+        for size in sizes:
+            batches = list(make_filter().iter_batches(size))
+            for batch in batches:
+                self.assertTrue(0 < len(batch) <= size)
+            self.assertEqual(expected, [(row.row_number, row.values) for batch in batches for row in batch])
+
+    def test_default_filter_batch(self):
+        class UnknownFilter(hxl.filters.AbstractStreamingFilter):
+            def filter_row(self, row):
+                return None if row.get('org') == 'NGO B' else row.values
+        self.assertSameRows(lambda: UnknownFilter(self.source))
+
+    def test_row_filter(self):
+        for queries in ('org=NGO B', ['adm1=Coast', 'affected<150'], 'org=NGO A & adm1=Plains'):
+            self.assertSameRows(lambda: self.source.with_rows(queries))
+            self.assertSameRows(lambda: self.source.without_rows(queries))
+        self.assertSameRows(lambda: self.source.with_rows('org=NGO A', mask='adm1=Coast'))
+        self.assertSameRows(lambda: self.source.to_columnar().with_rows('org=NGO B'))
+
+    def test_column_filter(self):
+        self.assertSameRows(lambda: self.source.with_columns('org,affected'))
+        self.assertSameRows(lambda: self.source.without_columns('sector'))
+        ragged = hxl.data([DATA[1], ['NGO A', 'WASH'], DATA[2]])
+        self.assertEqual(
+            [['NGO A'], ['NGO A', '200']],
+            [row.values for batch in ragged.with_columns('org,affected').iter_batches() for row in batch]
+        )
+
+    def test_chain(self):
+        self.assertSameRows(
+            lambda: self.source.with_rows('adm1=Coast').add_columns('country=Kenya').without_columns('adm1').rename_columns('org:#org+name')
+        )
+
+    def test_hashing(self):
+        hasher = self.source.hasher()
+        for batch in hasher.iter_batches(2):
+            pass
+        self.assertEqual(self.source.data_hash, hasher.hexdigest)
+
+
+class TestFusedChain(AbstractBaseFilterTest):
+    """A chain of streaming filters runs as one loop, with the same results as nested iterators."""
+
+    def make_chain(self):
+        return self.source.add_columns('country=Kenya').with_rows('affected>100').rename_columns('org:#org+name').without_columns('sector')
+
+    def rows(self, source):
+        return [(row.row_number, row.values, [column.display_tag for column in row.columns],) for row in source]
+
+    def test_fused(self):
+        chain = self.make_chain()
+        iterator = iter(chain)
+        self.assertEqual(4, len(iterator.stages))
+        self.assertIs(chain, iterator.stages[-1])
+
+    def test_same_as_nested(self):
+        import unittest.mock
+        expected = self.rows(self.make_chain())
+        with unittest.mock.patch('hxl.filters.AbstractStreamingFilter._can_fuse', return_value=False):
+            chain = self.make_chain()
+            self.assertEqual(1, len(iter(chain).stages))
+            self.assertEqual(expected, self.rows(chain))
+        self.assertEqual([0, 1, 2], [row[0] for row in expected])
+
+    def test_hashing_in_chain(self):
+        hasher = self.source.hasher()
+        chain = hasher.with_rows('org=NGO A')
+        for i in range(2):
+            self.assertEqual(2, len(chain.values))
+            self.assertEqual(self.source.data_hash, hasher.hexdigest)
+
+    def test_custom_iterator_not_fused(self):
+        class CountingFilter(hxl.filters.AbstractStreamingFilter):
+            def filter_row(self, row):
+                return row.values
+            def __iter__(self):
+                self.passes = getattr(self, 'passes', 0) + 1
+                return super().__iter__()
+        counter = CountingFilter(self.source)
+        chain = counter.with_rows('org=NGO B')
+        self.assertEqual(1, len(iter(chain).stages))
+        self.assertEqual(DATA[3:5], chain.values)
+        self.assertEqual(2, counter.passes)
+
+    def test_columnar_row_filter(self):
+        chain = self.source.to_columnar().with_rows('org=NGO B').add_columns('country=Kenya')
+        self.assertEqual(1, len(iter(chain).stages))
+        self.assertEqual([values + ['Kenya'] for values in DATA[3:5]], chain.values)
+
+
+class TestFanout(AbstractBaseFilterTest):
+    """Several recipes run from a single read of the source."""
+
+    RECIPES = [
+        [{'filter': 'with_rows', 'queries': 'org=NGO A'}, {'filter': 'clean_data', 'upper': 'adm1'}],
+        [{'filter': 'count', 'patterns': 'adm1'}],
+        [{'filter': 'sort', 'tags': 'affected'}, {'filter': 'without_columns', 'excludes': 'sector'}],
+        [],
+    ]
+
+    def test_outputs(self):
+        results = hxl.filters.fanout(DATA, self.RECIPES)
+        for recipe, result in zip(self.RECIPES, results):
+            expected = hxl.filters.from_recipe(DATA, recipe)
+            self.assertEqual(expected.display_tags, result.display_tags)
+            self.assertEqual(expected.values, result.values)
+
+    def test_single_read(self):
+        with patch.object(hxl.model.Dataset, 'BATCH_SIZE', 1):
+            source = hxl.data(DATA)
+            with patch.object(type(source), '__iter__', side_effect=type(source).__iter__, autospec=True) as mock_iter:
+                hxl.filters.fanout(source, self.RECIPES)
+                self.assertEqual(1, mock_iter.call_count)
+
+    def test_sinks(self):
+        results = hxl.filters.fanout(DATA, self.RECIPES[:2], [lambda dataset: dataset.values, None])
+        self.assertEqual(self.source.with_rows('org=NGO A').clean_data(upper='adm1').values, results[0])
+        self.assertEqual(self.source.count('adm1').values, results[1].values)
+
+    def test_sink_stops_early(self):
+        with patch.object(hxl.model.Dataset, 'BATCH_SIZE', 1):
+            results = hxl.filters.fanout(DATA, [[], []], [lambda dataset: next(iter(dataset)).values, None])
+        self.assertEqual(DATA[2], results[0])
+        self.assertEqual(DATA[2:], results[1].values)
+
+    def test_sink_exception(self):
+        def sink(dataset):
+            raise ValueError("bad sink")
+        with self.assertRaises(ValueError):
+            hxl.filters.fanout(DATA, [[], []], [None, sink])
+
+    def test_read_twice(self):
+        with self.assertRaises(hxl.filters.HXLFilterException):
+            hxl.filters.fanout(DATA, [[]], [lambda dataset: (dataset.values, dataset.values)])
+        # a cache step makes it possible
+        results = hxl.filters.fanout(DATA, [[{'filter': 'cache'}]], [lambda dataset: (dataset.values, dataset.values)])
+        self.assertEqual((DATA[2:], DATA[2:]), results[0])
+
+    def test_sink_count(self):
+        with self.assertRaises(hxl.filters.HXLFilterException):
+            hxl.filters.fanout(DATA, self.RECIPES, [None])
+
+    def run_fanout(self, source, recipes):
+        """Run fanout in a thread, failing instead of hanging if it doesn't finish"""
+        results = []
+        thread = threading.Thread(target=lambda: results.append(hxl.filters.fanout(source, recipes)), daemon=True)
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive(), "fanout did not finish")
+        return results[0]
+
+    def test_aggregate_query(self):
+        """A query with "is max" reads its source while the chain is being built"""
+        results = self.run_fanout(DATA, [[{'filter': 'with_rows', 'queries': 'affected is max'}], []])
+        self.assertEqual(self.source.with_rows('affected is max').values, results[0].values)
+        self.assertEqual(DATA[2:], results[1].values)
+
+    def test_clean_dates(self):
+        """Cleaning dates reads the source while the chain is being built, to guess the date format"""
+        DATA_IN = [
+            ['#event', '#date'],
+            ['Flood', '30/01/2020'],
+            ['Fire', '02/03/2020'],
+        ]
+        results = self.run_fanout(DATA_IN, [[{'filter': 'clean_data', 'date': 'date'}], []])
+        self.assertEqual(hxl.data(DATA_IN).clean_data(date='date').values, results[0].values)
+        self.assertEqual(DATA_IN[1:], results[1].values)
+
+
+class TestProjection(AbstractBaseFilterTest):
+    """from_recipe drops columns that a recipe won't use, without changing the output."""
+
+    RECIPES = [
+        ([{'filter': 'with_columns', 'includes': 'org'}], ['#org']),
+        ([{'filter': 'without_columns', 'excludes': 'sector'}], ['#org', '#adm1', '#affected']),
+        ([{'filter': 'with_rows', 'queries': 'adm1=Coast'}, {'filter': 'with_columns', 'includes': 'org'}], ['#org', '#adm1']),
+        ([{'filter': 'clean_data', 'upper': 'org'}, {'filter': 'count', 'patterns': 'org', 'aggregators': 'sum(#affected) as Total#affected'}], ['#org', '#affected']),
+        ([{'filter': 'add_columns', 'specs': 'Double#x_double={{#affected * 2}}'}, {'filter': 'with_columns', 'includes': 'x_double'}], ['#affected']),
+        ([{'filter': 'rename_columns', 'specs': '#adm1:#loc'}, {'filter': 'with_columns', 'includes': 'loc'}], ['#adm1']),
+        ([{'filter': 'sort', 'tags': 'affected'}, {'filter': 'with_columns', 'includes': 'org'}], ['#org', '#affected']),
+        ([{'filter': 'with_rows', 'queries': 'affected > {{#adm1}}'}, {'filter': 'count', 'patterns': 'sector'}], ['#sector+list', '#adm1', '#affected']),
+        ([{'filter': 'with_rows', 'queries': 'affected is max'}, {'filter': 'count'}], ['#affected']),
+        ([{'filter': 'count', 'patterns': 'org'}, {'filter': 'with_columns', 'includes': 'org'}], ['#org']),
+    ]
+
+    UNOPTIMISED = [
+        [{'filter': 'with_columns', 'includes': 'org'}, {'filter': 'sort', 'tags': 'xxx'}],
+        [{'filter': 'dedup'}, {'filter': 'with_columns', 'includes': 'org'}],
+        [{'filter': 'sort'}, {'filter': 'with_columns', 'includes': 'org'}],
+        [{'filter': 'explode'}, {'filter': 'with_columns', 'includes': 'org'}],
+    ]
+
+    def test_projection(self):
+        for recipe, display_tags in self.RECIPES:
+            filter = hxl.filters.from_recipe(self.source, recipe)
+            while filter.source is not self.source:
+                filter = filter.source
+            self.assertIsInstance(filter, hxl.filters._ProjectionFilter)
+            self.assertEqual(display_tags, filter.display_tags, recipe)
+
+    def test_same_output(self):
+        for recipe, display_tags in self.RECIPES:
+            self.assertEqual(
+                hxl.filters.from_recipe(self.source, recipe, optimise=False).values,
+                hxl.filters.from_recipe(self.source, recipe).values,
+                recipe
+            )
+
+    def test_ragged_add_columns(self):
+        # the projection pads and truncates ragged rows, and so does add_columns
+        ragged = [DATA[1], ['NGO A', 'WASH'], DATA[2] + ['extra']]
+        recipe = [{'filter': 'add_columns', 'specs': 'country=Kenya'}, {'filter': 'with_columns', 'includes': 'org,country'}]
+        self.assertEqual([['NGO A', 'Kenya'], ['NGO A', 'Kenya']], hxl.filters.from_recipe(hxl.data(ragged), recipe, optimise=False).values)
+        self.assertEqual([['NGO A', 'Kenya'], ['NGO A', 'Kenya']], hxl.filters.from_recipe(hxl.data(ragged), recipe).values)
+
+    def test_unoptimised(self):
+        for recipe in self.UNOPTIMISED:
+            self.assertIsNone(hxl.filters._recipe_needs(recipe), recipe)
+        self.assertTrue(hxl.filters._recipe_needs([{'filter': 'clean_data', 'upper': 'org'}]).is_all)
+        self.assertIs(self.source, hxl.filters.from_recipe(self.source, [{'filter': 'clean_data', 'upper': 'org'}]).source)
+
+    def test_missing_sort_key(self):
+        # the sort uses all remaining columns when none match its keys
+        recipe = [{'filter': 'sort', 'tags': 'xxx', 'reverse': True}, {'filter': 'with_columns', 'includes': 'org'}]
+        self.assertEqual(
+            hxl.filters.from_recipe(self.source, recipe, optimise=False).values,
+            hxl.filters.from_recipe(self.source, recipe).values
+        )
+
+    def test_bad_recipe(self):
+        with self.assertRaises(hxl.filters.HXLFilterException):
+            hxl.filters.from_recipe(self.source, [{'filter': 'with_columns'}])
+
+
+class TestPredicatePushdown(AbstractBaseFilterTest):
+    """from_recipe moves row selections ahead of row-by-row steps that don't change the columns they use."""
+
+    RECIPES = [
+        ([{'filter': 'clean_data', 'upper': 'org'}, {'filter': 'with_rows', 'queries': 'adm1=Coast'}], ['with_rows', 'clean_data']),
+        ([{'filter': 'replace_data', 'original': 'WASH', 'replacement': 'Water', 'pattern': 'sector'}, {'filter': 'add_columns', 'specs': 'Country#country=Country A'}, {'filter': 'without_rows', 'queries': 'affected < 150'}], ['without_rows', 'replace_data', 'add_columns']),
+        ([{'filter': 'clean_data', 'upper': 'org'}, {'filter': 'with_rows', 'queries': 'org=NGO A'}], ['clean_data', 'with_rows']),
+        ([{'filter': 'clean_data', 'upper': '#*+list'}, {'filter': 'with_rows', 'queries': 'sector=Education'}], ['clean_data', 'with_rows']),
+        ([{'filter': 'clean_data', 'upper': 'sector-list'}, {'filter': 'with_rows', 'queries': 'sector+list=Education'}], ['with_rows', 'clean_data']),
+        ([{'filter': 'add_columns', 'specs': 'Country#country=Country A'}, {'filter': 'with_rows', 'queries': 'country=Country A'}], ['add_columns', 'with_rows']),
+        ([{'filter': 'replace_data', 'original': 'Coast', 'replacement': 'Shore'}, {'filter': 'with_rows', 'queries': 'affected > 100'}], ['replace_data', 'with_rows']),
+        ([{'filter': 'clean_data', 'date': 'date'}, {'filter': 'with_rows', 'queries': 'affected > 100'}], ['clean_data', 'with_rows']),
+        ([{'filter': 'clean_data', 'upper': 'org'}, {'filter': 'with_rows', 'queries': 'affected > {{#org}}'}], ['clean_data', 'with_rows']),
+        ([{'filter': 'clean_data', 'upper': 'org'}, {'filter': 'with_rows', 'queries': 'adm1=Coast'}, {'filter': 'without_rows', 'queries': 'affected is max'}], ['with_rows', 'without_rows', 'clean_data']),
+        ([{'filter': 'with_rows', 'queries': 'adm1=Coast'}, {'filter': 'fill_data'}, {'filter': 'without_rows', 'queries': 'affected is max'}], ['with_rows', 'fill_data', 'without_rows']),
+        ([{'filter': 'dedup', 'patterns': 'org'}, {'filter': 'clean_data', 'upper': 'org'}, {'filter': 'with_rows_in', 'reference_source': [['#adm1'], ['Coast']], 'keys': 'adm1'}], ['dedup', 'with_rows_in', 'clean_data']),
+        ([{'filter': 'clean_data', 'whitespace': 'sector'}, {'filter': 'with_rows', 'queries': 'org is empty'}], ['with_rows', 'clean_data']),
+    ]
+
+    def setUp(self):
+        # add a row with a missing (None) value, which clean_data mustn't turn into a string
+        super().setUp()
+        self.source = hxl.data(DATA + [[None, 'Health', 'Coast', '50']]).cache()
+
+    def test_order(self):
+        for recipe, order in self.RECIPES:
+            self.assertEqual(order, [spec['filter'] for spec in hxl.filters._reorder_recipe(recipe)], recipe)
+
+    def test_same_output(self):
+        for recipe, order in self.RECIPES:
+            self.assertEqual(
+                hxl.filters.from_recipe(self.source, recipe, optimise=False).values,
+                hxl.filters.from_recipe(self.source, recipe).values,
+                recipe
+            )
+
+    def test_recipe_unchanged(self):
+        recipe = self.RECIPES[0][0]
+        hxl.filters.from_recipe(self.source, recipe)
+        self.assertEqual('clean_data', recipe[0]['filter'])
+
+
+class TestExplain(AbstractBaseFilterTest):
+    """Dataset.explain() describes a filter chain without reading the data."""
+
+    def setUp(self):
+        super().setUp()
+        self.source = hxl.data(DATA)
+
+    def test_streaming(self):
+        plan = self.source.with_rows('adm1=Coast').with_columns('org').explain()
+        self.assertEqual('ColumnFilter', plan['name'])
+        self.assertEqual('streaming', plan['kind'])
+        self.assertEqual(['#org'], plan['columns'])
+        self.assertEqual('RowFilter', plan['source']['name'])
+        self.assertEqual('source', plan['source']['source']['kind'])
+        self.assertEqual(1, plan['source']['source']['reads'])
+        self.assertEqual(0, plan['memory'])
+
+    def test_caching(self):
+        plan = self.source.sort().count('adm1').explain(row_estimate=1000)
+        self.assertEqual('caching', plan['kind'])
+        self.assertEqual(1000, plan['rows_held'])
+        self.assertEqual(1000 * (hxl.filters.EXPLAIN_ROW_BYTES + 2 * hxl.filters.EXPLAIN_CELL_BYTES), plan['memory'])
+        self.assertEqual(1000 * (hxl.filters.EXPLAIN_ROW_BYTES + 4 * hxl.filters.EXPLAIN_CELL_BYTES), plan['source']['memory'])
+        self.assertIsNone(self.source.sort().explain()['memory'])
+
+    def test_implicit_cache(self):
+        plan = self.source.clean_data(date='date').explain()
+        self.assertEqual(2, plan['passes'])
+        self.assertTrue(plan['notes'])
+        self.assertEqual('CacheFilter', plan['source']['name'])
+        self.assertEqual(2, plan['source']['reads'])
+        self.assertEqual(1, plan['source']['source']['reads'])
+
+    def test_aggregate_query_passes(self):
+        plan = self.source.with_rows('affected is max').explain()
+        self.assertEqual(2, plan['passes'])
+        self.assertEqual('CacheFilter', plan['source']['name'])
+        self.assertEqual(1, plan['source']['source']['reads'])
+
+    def test_uncached_passes(self):
+        # a stream that's read more than once without a cache reads the source again each time
+        plan = self.source.cache().with_columns('org').with_rows('affected is max').explain()
+        self.assertEqual(2, plan['source']['reads'])
+        self.assertEqual(1, plan['source']['source']['source']['reads'])
+
+    def test_extra_sources(self):
+        plan = self.source.merge_data(hxl.data([['#adm1', '#adm1+code'], ['Coast', 'C01']]), 'adm1', 'adm1+code').explain()
+        self.assertEqual(1, len(plan['extra_sources']))
+        self.assertEqual(1, plan['extra_sources'][0]['reads'])
+        self.assertIsNone(plan['memory'])
+        plan = self.source.append(hxl.data(DATA)).explain(row_estimate=10)
+        self.assertEqual(1, len(plan['extra_sources']))
+        self.assertIsNone(plan['rows'])
+
+    def test_implode_not_read(self):
+        filter = self.source.implode('sector', 'affected')
+        plan = filter.explain()
+        self.assertIsNone(plan['columns'])
+        self.assertFalse(filter.processed)
+
+    def test_recipe(self):
+        plan = hxl.filters.explain(hxl.filters.from_recipe(self.source, [
+            {'filter': 'clean_data', 'upper': 'org'},
+            {'filter': 'with_rows', 'queries': 'adm1=Coast'},
+            {'filter': 'with_columns', 'includes': 'org'},
+        ]), row_estimate=100)
+        names = []
+        while plan:
+            names.append(plan['name'])
+            self.assertEqual(100, plan['rows'])
+            plan = plan.get('source')
+        self.assertEqual(['ColumnFilter', 'CleanDataFilter', 'RowFilter', '_ProjectionFilter', 'HXLReader'], names)
+
+
+class TestParallel(AbstractBaseFilterTest):
+    """hxl.filters.parallel() gives the same output as the original chain."""
+
+    def make_chain(self, source):
+        return source.clean_data(whitespace='*', upper='org').with_rows('adm1=Coast').add_columns(
+            'Double#x_double={{#affected * 2}}'
+        ).dedup('org').replace_data('WASH', 'Water', 'sector').with_columns('org,sector,x_double')
+
+    def test_same_output(self):
+        expected = self.make_chain(self.source).values
+        self.assertEqual(expected, hxl.filters.parallel(self.make_chain(self.source), workers=2, chunk_size=1).values)
+
+    def test_serial_boundary(self):
+        filter = hxl.filters.parallel(self.make_chain(self.source), workers=2)
+        self.assertIsInstance(filter, hxl.filters._ParallelFilter)
+        self.assertEqual(['ReplaceDataFilter', 'ColumnFilter'], [type(f).__name__ for f in filter.filters])
+        self.assertIsInstance(filter.source, hxl.filters.DeduplicationFilter)
+        self.assertIsInstance(filter.source.source, hxl.filters._ParallelFilter)
+        self.assertEqual(3, len(filter.source.source.filters))
+
+    def test_original_unchanged(self):
+        chain = self.make_chain(self.source)
+        dedup = chain.source.source
+        hxl.filters.parallel(chain, workers=2)
+        self.assertIsInstance(dedup.source, hxl.filters.AddColumnsFilter)
+
+    def test_nothing_to_do(self):
+        chain = self.source.dedup()
+        self.assertIs(chain, hxl.filters.parallel(chain, workers=2))
+        chain = self.source.with_rows('adm1=Coast')
+        self.assertIs(chain, hxl.filters.parallel(chain, workers=1))
+
+    def test_aggregate_query(self):
+        chain = self.source.with_rows('affected is max')
+        self.assertEqual(chain.values, hxl.filters.parallel(chain, workers=2).values)
+
+
+class TestPipeline(AbstractBaseFilterTest):
+    """hxl.filters.pipeline() gives the same output as the original chain."""
+
+    def make_chain(self):
+        return hxl.data(DATA).clean_data(upper='org').with_rows('adm1=Coast').count('org')
+
+    def test_same_output(self):
+        expected = self.make_chain().values
+        self.assertEqual(expected, hxl.filters.pipeline(self.make_chain(), queue_size=1, batch_size=1).values)
+
+    def test_stages(self):
+        filter = hxl.filters.pipeline(self.make_chain())
+        self.assertIsInstance(filter, hxl.filters._PipelineFilter)
+        self.assertIsInstance(filter.source, hxl.filters.CountFilter)
+        self.assertIsInstance(filter.source.source.source.source, hxl.filters._PipelineFilter)
+        self.assertIsInstance(filter.source.source.source.source.source, hxl.input.HXLReader)
+        source = hxl.data(DATA)
+        filter = hxl.filters.pipeline(source)
+        self.assertIs(source, filter.source)
+        self.assertEqual(DATA[2:], filter.values)
+
+    def test_early_stop(self):
+        rows = iter(hxl.filters.pipeline(hxl.data(DATA).with_rows('adm1=Coast'), queue_size=1, batch_size=1))
+        self.assertEqual(DATA[2], next(rows).values)
+        rows.close()
+
+    def test_exception(self):
+        class FailingSource(hxl.model.Dataset):
+            columns = hxl.data(DATA).columns
+            def __iter__(self):
+                yield hxl.model.Row(self.columns, DATA[2])
+                raise ValueError("read failed")
+        filter = hxl.filters.pipeline(FailingSource().with_rows('adm1=Coast'), batch_size=1)
+        with self.assertRaises(ValueError):
+            filter.values
+
+
+class TestColumnarSource(AbstractBaseFilterTest):
+    """Filters should produce identical results from a columnar source."""
+
+    def setUp(self):
+        super().setUp()
+        self.columnar = hxl.data(DATA).to_columnar()
+
+    def test_count(self):
+        for patterns in (['org'], ['org', 'adm1'], ['sector'], [], ['xxx']):
+            self.assertEqual(self.source.count(patterns).values, self.columnar.count(patterns).values)
+
+    def test_count_queries(self):
+        self.assertEqual(
+            self.source.count('org', queries='affected > 150').values,
+            self.columnar.count('org', queries='affected > 150').values
+        )
+
+    def test_count_aggregators(self):
+        self.assertEqual(
+            self.source.count('org', aggregators='sum(#affected)').values,
+            self.columnar.count('org', aggregators='sum(#affected)').values
+        )
+
+    def test_sort(self):
+        for keys in (None, 'affected', 'org,adm1', 'sector'):
+            for reverse in (False, True):
+                self.assertEqual(
+                    self.source.sort(keys, reverse).values,
+                    self.columnar.sort(keys, reverse).values
+                )
+
+    def test_rows(self):
+        for queries in ('org=NGO B', ['adm1=Coast', 'affected<150'], 'sector~^edu', 'org=NGO A & adm1=Plains', [['adm1=Coast', 'org=NGO B'], 'affected<150']):
+            self.assertEqual(self.source.with_rows(queries).values, self.columnar.with_rows(queries).values)
+            self.assertEqual(self.source.without_rows(queries).values, self.columnar.without_rows(queries).values)
+        self.assertEqual(
+            self.source.with_rows('org=NGO A', mask='adm1=Coast').values,
+            self.columnar.with_rows('org=NGO A', mask='adm1=Coast').values
+        )
+        for queries in ('adm1 in coast, north', 'affected not in 100, 150'):
+            self.assertEqual(self.source.with_rows(queries).values, self.columnar.with_rows(queries).values)
+
+    def test_rows_aggregate(self):
+        self.assertEqual(
+            self.source.with_rows('affected is max').values,
+            self.columnar.with_rows('affected is max').values
+        )
+
+    def test_rows_formula(self):
+        self.assertEqual(
+            self.source.with_rows('affected > {{#affected - 1}}').values,
+            self.columnar.with_rows('affected > {{#affected - 1}}').values
+        )
+
+
 class TestChaining(AbstractBaseFilterTest):
 
     def test_rowfilter_countfilter(self):
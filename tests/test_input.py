@@ -777,6 +777,24 @@ class TestFunctions(unittest.TestCase):
                 # Need to work with bytes to handle CRLF
                 self.assertEqual(expected, buffer.getvalue().encode('utf-8'))
 
+    def test_write_csv_bytes(self):
+        with open(FILE_CSV_OUT, 'rb') as input:
+            expected = input.read()
+            buffer = io.BytesIO()
+            with hxl.data(FILE_CSV, InputOptions(allow_local=True)) as source:
+                hxl.input.write_hxl(buffer, source)
+                self.assertEqual(expected, buffer.getvalue())
+
+    def test_gen_csv_batches(self):
+        DATA = [['#org'], ['Org A'], ['Org B'], ['Org "C"']]
+        source = hxl.data(DATA).cache()
+        source.BATCH_SIZE = 2
+        self.assertEqual(
+            ['""\r\n#org\r\n', 'Org A\r\nOrg B\r\n', '"Org ""C"""\r\n'],
+            list(source.gen_csv())
+        )
+        self.assertEqual(['Org A\r\nOrg B\r\n', '"Org ""C"""\r\n'], list(source.gen_csv(False, False)))
+
     def test_write_json_lists(self):
         with open(FILE_JSON_OUT) as input:
             expected = input.read()
@@ -807,4 +825,37 @@ class TestFunctions(unittest.TestCase):
         source = hxl.data(DATA_IN)
         hxl.input.write_json(buffer, source, use_objects=True)
         self.assertEqual(DATA_OUT, json.loads(buffer.getvalue()))
+
+    def test_write_json_compact(self):
+        for use_objects in (False, True,):
+            with open(FILE_JSON_OBJECTS_OUT if use_objects else FILE_JSON_OUT) as input:
+                expected = json.load(input)
+            buffer = StringIO()
+            with hxl.data(FILE_CSV, InputOptions(allow_local=True)) as source:
+                hxl.input.write_json(buffer, source, use_objects=use_objects, compact=True)
+            self.assertEqual(expected, json.loads(buffer.getvalue()))
+            self.assertFalse('  ' in buffer.getvalue())
+
+    def test_write_json_mixed_values(self):
+        """ Non-string values, ragged rows, and repeated hashtags give the same JSON as before """
+        DATA_IN = [
+            ['#org', '#adm1', '#org'],
+            ['Org A', 'Coast', 'Org B'],
+            ['Org C'],
+            [3, None, 'x'],
+        ]
+        expected_objects = [{'#adm1': 'Coast', '#org': 'Org A'}, {'#org': 'Org C'}, {'#adm1': None, '#org': 3}]
+        for compact in (False, True,):
+            buffer = StringIO()
+            hxl.input.write_json(buffer, hxl.data(DATA_IN), use_objects=True, compact=compact)
+            self.assertEqual(expected_objects, json.loads(buffer.getvalue()))
+            buffer = StringIO()
+            hxl.input.write_json(buffer, hxl.data(DATA_IN), show_headers=False, compact=compact)
+            self.assertEqual(DATA_IN, json.loads(buffer.getvalue()))
+        buffer = StringIO()
+        hxl.input.write_json(buffer, hxl.data(DATA_IN), use_objects=True)
+        self.assertEqual(
+            '[\n' + ',\n'.join([json.dumps(o, sort_keys=True, indent=2) for o in expected_objects]) + '\n]\n',
+            buffer.getvalue()
+        )
             
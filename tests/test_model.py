@@ -6,10 +6,10 @@ October 2014
 License: Public Domain
 """
 
-import io, unittest
+import copy, io, pickle, unittest
 import hxl
 from hxl.datatypes import normalise_string
-from hxl.model import TagPattern, Dataset, Column, Row, RowQuery
+from hxl.model import TagPattern, Dataset, ColumnType, ColumnProfile, Column, FrozenColumn, ColumnIndex, ColumnList, Row, RowQuery, RowQueryConjunction, get_column_indices
 
 DATA = [
     ['Organisation', 'Cluster', 'District', 'Affected'],
@@ -117,6 +117,13 @@ class TestPattern(unittest.TestCase):
         self.assertEqual({'foo'}, pattern.include_attributes)
         self.assertEqual({'xxx'}, pattern.exclude_attributes)
 
+    def test_parse_interned(self):
+        pattern = TagPattern.parse('#interned+foo-bar')
+        hits = TagPattern.PARSE_CACHE.hits
+        self.assertIs(pattern, TagPattern.parse('#interned+foo-bar'))
+        self.assertEqual(hits + 1, TagPattern.PARSE_CACHE.hits)
+        self.assertEqual(frozenset(['foo']), pattern.include_attributes)
+
     def test_parse_list(self):
         patterns = TagPattern.parse_list('tag+foo,tag-xxx')
         for pattern in patterns:
@@ -132,6 +139,22 @@ class TestDataset(unittest.TestCase):
     def setUp(self):
         self.source = hxl.data(DATA)
 
+    def test_iter_batches(self):
+        batches = list(hxl.data(DATA).iter_batches(2))
+        self.assertEqual([2, 1], [len(batch) for batch in batches])
+        self.assertEqual(
+            self.source.values,
+            [row.values for batch in batches for row in batch]
+        )
+        with self.assertRaises(ValueError):
+            list(hxl.data(DATA).iter_batches(0))
+
+    def test_iter_batches_default_size(self):
+        # the default size comes from the dataset, so it can be set on an instance
+        source = hxl.data(DATA)
+        source.BATCH_SIZE = 2
+        self.assertEqual([2, 1], [len(batch) for batch in source.iter_batches()])
+
     def test_min(self):
         self.assertEqual('100', self.source.min('#affected'))
 
@@ -200,9 +223,230 @@ class TestDataset(unittest.TestCase):
         self.assertTrue(self.source.data_hash is not None)
         self.assertEqual(32, len(self.source.data_hash))
 
+    def test_hash_unchanged(self):
+        # same bytes as hashing cell by cell
+        import hashlib
+        md5 = hashlib.md5()
+        for s in DATA[0] + DATA[1] + [value for row in DATA[2:] for value in row]:
+            md5.update(hxl.datatypes.normalise_space(s).encode('utf-8'))
+        self.assertEqual(md5.hexdigest(), self.source.data_hash)
+        self.assertEqual(self.source.data_hash, self.source.get_data_hash('md5'))
+
+    def test_describe(self):
+        profile = self.source.describe(top_n=1)
+        self.assertEqual(3, profile['row_count'])
+        self.assertEqual(4, len(profile['columns']))
+        org, sector, adm1, affected = profile['columns']
+        self.assertEqual('Organisation', org['header'])
+        self.assertEqual('#org', org['tag'])
+        self.assertEqual(3, org['count'])
+        self.assertEqual(0, org['empty'])
+        self.assertEqual(2, org['distinct'])
+        self.assertEqual([{'value': 'NGO B', 'count': 2}], org['top'])
+        self.assertEqual({'date': 0, 'number': 3, 'string': 0}, affected['types'])
+        # same as min() and max()
+        self.assertEqual(hxl.data(DATA).min('#affected'), affected['min'])
+        self.assertEqual(hxl.data(DATA).max('#affected'), affected['max'])
+        self.assertEqual(hxl.data(DATA).min('#adm1'), adm1['min'])
+
+    def test_describe_short_rows(self):
+        profile = hxl.data([['#org', '#date'], ['NGO A', '1/2/2020'], ['NGO B']]).describe()
+        date = profile['columns'][1]
+        self.assertEqual(1, date['count'])
+        self.assertEqual(1, date['empty'])
+        self.assertEqual(1, date['types']['date'])
+
+    def test_hash_algorithm(self):
+        self.assertEqual(32, len(self.source.get_data_hash('blake2b')))
+        self.assertNotEqual(self.source.data_hash, self.source.get_data_hash('blake2b'))
+        self.assertEqual(32, len(self.source.get_columns_hash('blake2b')))
+        with self.assertRaises(hxl.HXLException):
+            self.source.get_data_hash('not-an-algorithm')
+
     # TODO test generators
 
 
+class TestColumnType(unittest.TestCase):
+
+    VALUES = [
+        'WASH', ' wash ', '10', '10.0', ' 1,000', '-2.5e3', 'inf', 'NaN', '', '   ', None, 7, 7.5,
+        '2020-01-13', '13/1/2020', '1/2/2020', 'Jan 2020', '17000', 'x1', '١٢', 'no digits here',
+    ]
+
+    def test_same_as_datatypes(self):
+        for tag in ('#sector', '#date',):
+            column = Column.parse(tag)
+            types = ColumnType(column)
+            for i in range(3): # miss, then cache hits
+                for value in self.VALUES:
+                    self.assertEqual(
+                        (hxl.datatypes.typeof(value, column), hxl.datatypes.normalise(value, column),),
+                        types.classify(value),
+                        '{} {}'.format(tag, repr(value))
+                    )
+                    self.assertEqual(hxl.datatypes.is_number(value), types.is_number(value))
+                    self.assertEqual(hxl.datatypes.is_date(value), types.is_date(value))
+
+    def test_text_fast_path(self):
+        types = ColumnType(Column.parse('#org'))
+        types.SAMPLE_SIZE = 3
+        for value in ('UNICEF', 'OXFAM', 'WFP',):
+            types.classify(value)
+        self.assertTrue(types.is_sampled)
+        self.assertEqual('string', types.datatype)
+        for value in self.VALUES:
+            self.assertEqual(hxl.datatypes.typeof(value), types.typeof(value), repr(value))
+            self.assertEqual(hxl.datatypes.normalise(value), types.normalise(value), repr(value))
+
+    def test_datatype(self):
+        types = ColumnType()
+        self.assertIsNone(types.datatype)
+        for value in ('1', '2', 'x', '',):
+            types.classify(value)
+        self.assertEqual('number', types.datatype)
+        self.assertEqual({'date': 0, 'number': 2, 'string': 1, 'empty': 1}, types.counts)
+        self.assertFalse(types.is_sampled)
+
+    def test_dayfirst(self):
+        types = ColumnType(Column.parse('#date'), dayfirst=False)
+        self.assertEqual('2020-01-02', types.normalise_date('1/2/2020'))
+        self.assertEqual('2020-01-02', types.normalise('1/2/2020'))
+        with self.assertRaises(ValueError):
+            types.normalise_date('xxx')
+
+    def test_cache_size(self):
+        types = ColumnType()
+        types.CACHE_SIZE = 2
+        for value in ('a', 'b', 'c', 'a',):
+            types.classify(value)
+        self.assertEqual(2, len(types._entries))
+        self.assertEqual(4, types.counts['string'])
+
+    def test_for_column(self):
+        column = Column.parse('#date')
+        types = ColumnType.for_column(column)
+        self.assertIs(types, ColumnType.for_column(column))
+        self.assertIsNot(types, ColumnType.for_column(column, dayfirst=False))
+        self.assertTrue(types._is_date)
+
+        # a mutable column can change its hashtag
+        column.tag = '#org'
+        self.assertFalse(ColumnType.for_column(column)._is_date)
+
+        # frozen columns keep a cache, too
+        frozen = column.freeze()
+        self.assertIs(ColumnType.for_column(frozen), ColumnType.for_column(frozen))
+
+        # copies start with an empty cache
+        ColumnType.for_column(column).classify('x')
+        for other in (copy.copy(column), copy.deepcopy(column), pickle.loads(pickle.dumps(column)),):
+            self.assertEqual(column, other)
+            self.assertEqual(0, ColumnType.for_column(other).counts['string'])
+
+    def test_shared_by_consumers(self):
+        source = hxl.data([['#org', '#affected'], ['UNICEF', '100'], ['OXFAM', '200']]).cache()
+        types = ColumnType.for_column(source.columns[1])
+        source.describe()
+        self.assertEqual(2, types.counts['number'])
+        self.assertEqual([['OXFAM', 200], ['UNICEF', 100]], source.count('#org', 'sum(#affected)').values)
+        self.assertEqual(4, types.counts['number'])
+        self.assertTrue(hxl.schema([['#valid_tag', '#valid_datatype'], ['#affected', 'number']]).validate(source))
+        self.assertEqual({'100', '200'}, set(types._entries))
+
+
+class TestColumnProfile(unittest.TestCase):
+
+    def test_distinct_estimate(self):
+        profile = ColumnProfile()
+        for i in range(20000):
+            profile.add(str(i % 10000))
+        self.assertFalse(profile.as_dict()['distinct_exact'])
+        self.assertTrue(abs(profile.distinct_count - 10000) < 1000)
+
+    def test_distinct_estimate_stable(self):
+        """ The estimate doesn't depend on Python's per-process string hashing """
+        import os, subprocess, sys
+        script = 'import hxl.model\np = hxl.model.ColumnProfile()\nfor i in range(20000): p.add(str(i))\nprint(p.distinct_count)'
+        results = set()
+        for seed in ('1', '2', '3',):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            results.add(subprocess.check_output([sys.executable, '-c', script], env=env).strip())
+        self.assertEqual(1, len(results))
+
+    def test_top_bounded(self):
+        profile = ColumnProfile(top_n=2, max_tracked=10)
+        for i in range(1000):
+            profile.add('common' if i % 2 else 'rare {}'.format(i))
+            profile.add('second' if i % 3 else None)
+        self.assertTrue(len(profile._value_counts) <= 20)
+        self.assertEqual([('second', 666,), ('common', 500,)], profile.top_values)
+        self.assertFalse(profile.as_dict()['top_exact'])
+        self.assertEqual(334, profile.empty_count)
+
+
+class TestColumnarDataset(unittest.TestCase):
+
+    DATA = [
+        ['Organisation', 'Sector', 'Date', 'Affected'],
+        ['#org', '#sector', '#date', '#affected'],
+        ['NGO A', 'WASH', '2019-02-01', '100'],
+        ['NGO B', 'Health', '1/1/2018', '50'],
+        ['NGO A', 'WASH', '', '300'],
+        ['NGO B', 'Education', '2020', '200'],
+    ]
+
+    def setUp(self):
+        self.source = hxl.data(self.DATA).to_columnar()
+
+    def test_cached(self):
+        self.assertTrue(self.source.is_cached)
+        self.assertEqual(self.DATA[2:], self.source.values)
+        self.assertEqual(self.DATA[2:], self.source.values)
+
+    def test_row_numbers(self):
+        self.assertEqual([0, 1, 2, 3], [row.row_number for row in self.source])
+
+    def test_columns(self):
+        self.assertEqual(self.DATA[1], self.source.display_tags)
+        self.assertEqual(self.DATA[0], self.source.headers)
+
+    def test_dictionary_encoding(self):
+        self.assertEqual(4, self.source.row_count)
+        self.assertEqual(['NGO A', 'NGO B'], self.source.get_distinct_values(0))
+        self.assertEqual([0, 1, 0, 1], self.source.get_codes(0))
+
+    def test_datatypes(self):
+        self.assertEqual('string', self.source.get_datatype(0))
+        self.assertEqual('date', self.source.get_datatype(2))
+        self.assertEqual('number', self.source.get_datatype(3))
+
+    def test_minmax(self):
+        self.assertEqual('50', self.source.min('#affected'))
+        self.assertEqual('300', self.source.max('#affected'))
+        self.assertEqual('1/1/2018', self.source.min('#date'))
+        self.assertEqual('2020', self.source.max('#date'))
+        self.assertEqual('Education', self.source.min('#sector'))
+        self.assertIsNone(self.source.min('#adm1'))
+
+    def test_match_queries(self):
+        queries = RowQuery.parse_list(['org=ngo a', 'affected>250'])
+        self.assertEqual([True, False, True, False], self.source.match_queries(queries))
+        self.assertEqual([False, True, False, True], self.source.match_queries(queries, reverse=True))
+        self.assertIsNone(self.source.match_queries(RowQuery.parse_list('affected > {{#affected}}')))
+
+    def test_ragged_rows(self):
+        DATA = [
+            ['#org', '#sector'],
+            ['NGO A'],
+            ['NGO B', 'WASH', 'extra'],
+        ]
+        source = hxl.data(DATA).to_columnar()
+        self.assertFalse(source.is_rectangular)
+        self.assertEqual(3, source.width)
+        self.assertEqual(DATA[1:], source.values)
+        self.assertEqual([None, 0], source.get_codes(1))
+
+
 class TestColumn(unittest.TestCase):
 
     HXL_TAG = '#foo'
@@ -251,6 +495,61 @@ class TestColumn(unittest.TestCase):
         self.assertTrue('a' in col.attributes)
         self.assertTrue('b' in col.attributes)
 
+    def test_parse_cached(self):
+        column1 = Column.parse('#cached+foo', header='One')
+        misses = Column.PARSE_CACHE.misses
+        column2 = Column.parse('#cached+foo', header='Two', column_number=3)
+        self.assertEqual(misses, Column.PARSE_CACHE.misses)
+        # a new, independent Column object every time
+        self.assertIsNot(column1, column2)
+        self.assertEqual(column1, column2)
+        self.assertEqual('Two', column2.header)
+        self.assertEqual(3, column2.column_number)
+        column2.add_attribute('bar')
+        self.assertEqual('#cached+foo', Column.parse('#cached+foo').display_tag)
+
+    def test_freeze(self):
+        column = Column.parse('#affected+m+f', header='Affected', column_number=2)
+        frozen = column.freeze()
+        self.assertTrue(isinstance(frozen, FrozenColumn))
+        self.assertIs(frozen, frozen.freeze())
+        self.assertEqual(column, frozen)
+        self.assertEqual(hash(column), hash(frozen))
+        self.assertEqual('#affected+m+f', frozen.display_tag)
+        self.assertEqual('#affected+f+m', frozen.get_display_tag(sort_attributes=True))
+        self.assertEqual('Affected', frozen.header)
+        self.assertEqual(2, frozen.column_number)
+        with self.assertRaises(AttributeError):
+            frozen.header = 'Changed'
+
+    def test_frozen_update(self):
+        frozen = Column.parse('#affected+m').freeze()
+        added = frozen.add_attribute('adults').remove_attribute('m')
+        self.assertEqual('#affected+adults', added.display_tag)
+        self.assertEqual('#affected+m', frozen.display_tag)
+        self.assertTrue(isinstance(added, FrozenColumn))
+        thawed = frozen.thaw()
+        thawed.add_attribute('f')
+        self.assertEqual('#affected+m+f', thawed.display_tag)
+        self.assertEqual('#affected+m', frozen.display_tag)
+
+    def test_frozen_shared(self):
+        import copy, pickle
+        frozen = Column.parse('#org+name', header='Org').freeze()
+        self.assertIs(frozen, copy.copy(frozen))
+        self.assertIs(frozen, copy.deepcopy(frozen))
+        restored = pickle.loads(pickle.dumps(frozen))
+        self.assertEqual(frozen, restored)
+        self.assertEqual('Org', restored.header)
+        # parsed hashtag rows stay mutable; filters freeze them once, then share them
+        source = hxl.data(DATA)
+        self.assertFalse(any(isinstance(column, FrozenColumn) for column in source.columns))
+        source.columns[0].header = 'Changed'
+        cached = source.cache()
+        self.assertTrue(isinstance(cached.columns[0], FrozenColumn))
+        self.assertEqual('Changed', cached.columns[0].header)
+        self.assertIs(cached.columns[0], cached.cache().columns[0])
+
     def test_parse_invalid(self):
 
         # empty string
@@ -297,6 +596,11 @@ class TestRow(unittest.TestCase):
         self.row.append('Lofa County')
         self.assertEqual(oldLength + 1, len(self.row.values))
 
+    def test_copy_values(self):
+        values = list(TestRow.CONTENT)
+        self.assertIsNot(values, Row(self.row.columns, values).values)
+        self.assertIs(values, Row(self.row.columns, values, copy_values=False).values)
+
     def test_get(self):
         self.assertEqual('WFP', self.row.get('#org'))
 
@@ -348,6 +652,77 @@ class TestRow(unittest.TestCase):
             self.assertEqual(['bar', 'foo'], sorted(column.attributes))
 
 
+class TestColumnIndex(unittest.TestCase):
+
+    TAGS = ['#org', '#adm1+code', '#affected+f', '#affected+m', '#org+impl']
+
+    def setUp(self):
+        self.columns = ColumnList([Column.parse(tag) for tag in self.TAGS])
+
+    def test_indices(self):
+        index = ColumnIndex.for_columns(self.columns)
+        self.assertEqual((2, 3,), index.get_indices('#affected'))
+        self.assertEqual((0, 4,), index.get_indices(TagPattern.parse('#org')))
+        self.assertEqual((4,), index.get_indices('#org+impl'))
+        self.assertEqual((), index.get_indices('#sector'))
+
+    def test_first_index(self):
+        index = ColumnIndex.for_columns(self.columns)
+        self.assertEqual(2, index.get_first_index('#affected'))
+        self.assertIsNone(index.get_first_index('#sector'))
+
+    def test_shared(self):
+        index = ColumnIndex.for_columns(self.columns)
+        self.assertIs(index, ColumnIndex.for_columns(self.columns))
+        self.assertIs(index, self.columns.index)
+        # a different list with the same columns gets its own index
+        self.assertIsNot(index, ColumnIndex.for_columns(ColumnList(self.columns)))
+        # an ordinary list can't keep an index
+        columns = list(self.columns)
+        self.assertIsNot(ColumnIndex.for_columns(columns), ColumnIndex.for_columns(columns))
+        self.assertFalse(hasattr(ColumnIndex, '_saved_indices'))
+
+    def test_changed_length(self):
+        index = ColumnIndex.for_columns(self.columns)
+        self.assertEqual((), index.get_indices('#sector'))
+        self.columns.append(Column.parse('#sector'))
+        self.assertEqual((5,), ColumnIndex.for_columns(self.columns).get_indices('#sector'))
+        self.columns[5] = Column.parse('#org')
+        self.assertEqual((0, 4, 5,), ColumnIndex.for_columns(self.columns).get_indices('#org'))
+
+    def test_changed_column(self):
+        """ Changing a column in place makes a new index """
+        index = ColumnIndex.for_columns(self.columns)
+        self.assertEqual((1,), index.get_indices('#adm1'))
+        self.columns[1].tag = '#sector'
+        self.assertEqual((), ColumnIndex.for_columns(self.columns).get_indices('#adm1'))
+        self.assertEqual((1,), ColumnIndex.for_columns(self.columns).get_indices('#sector'))
+        self.columns[0].add_attribute('name')
+        self.assertEqual((0,), ColumnIndex.for_columns(self.columns).get_indices('#org+name'))
+        # frozen columns can't change, and other columns changing doesn't invalidate the index
+        frozen = ColumnList([column.freeze() for column in self.columns])
+        index = ColumnIndex.for_columns(frozen)
+        self.columns[1].tag = '#adm1'
+        self.assertIs(index, ColumnIndex.for_columns(frozen))
+
+    def test_changed_dataset_column(self):
+        source = hxl.data([['#org', '#adm1'], ['A', 'X']])
+        row = next(iter(source))
+        self.assertEqual('X', row.get('#adm1'))
+        source.columns[1].tag = '#sector'
+        self.assertIsNone(row.get('#adm1'))
+        self.assertEqual('X', row.get('#sector'))
+
+    def test_untagged_columns(self):
+        columns = [Column(header='Notes'), Column.parse('#org')]
+        self.assertEqual((1,), ColumnIndex.for_columns(columns).get_indices('#*'))
+
+    def test_column_indices(self):
+        self.assertEqual([0, 2, 3, 4], get_column_indices('#org,#affected', self.columns))
+        self.assertEqual([0, 4, 4], get_column_indices(['#org', '#org+impl'], self.columns))
+        self.assertEqual([1], get_column_indices('#adm1', self.TAGS))
+
+
 class TestRowQuery(unittest.TestCase):
 
     ROW_NUMBER = 5
@@ -491,4 +866,100 @@ class TestRowQuery(unittest.TestCase):
             else:
                 self.assertNotEqual(300, float(row.get('#affected')))
 
+    def test_conjunction(self):
+        query = RowQuery.parse('sector=WASH & adm1~coast & affected>100')
+        self.assertTrue(isinstance(query, RowQueryConjunction))
+        self.assertEqual(3, len(query.queries))
+        self.assertTrue(query.match_row(self.row))
+        self.assertFalse(RowQuery.parse('sector=WASH & affected>200').match_row(self.row))
+        # "&" inside a value is not a conjunction
+        self.assertTrue(isinstance(RowQuery.parse('org=M&E'), RowQuery))
+        self.assertTrue(isinstance(RowQuery.parse('org=A & B'), RowQuery))
+
+    def test_conjunction_order(self):
+        columns = [Column.parse('#org'), Column.parse('#adm1')]
+        query = RowQuery.parse('org=NGO A & adm1=Coast')
+        query.SAMPLE_SIZE = 10
+        for i in range(20):
+            row = Row(columns, ['NGO A', 'Coast' if i % 5 == 0 else 'Plains'])
+            self.assertEqual(i % 5 == 0, query.match_row(row))
+        # the adm1 test fails more often, so it goes first
+        self.assertEqual([query.queries[1], query.queries[0]], query.order)
+
+    def test_aggregate_required(self):
+        with self.assertRaises(hxl.HXLException):
+            RowQuery.parse('#affected is max').match_row(self.row)
+
+    def test_compiled_same_as_match_value(self):
+        values = ['', None, '10', '10.0', '9', 'abc', ' ABC ', '2020-01-01', '1/2/2020', 'x2020y', 5, 'nan']
+        for tag in ('#x', '#date',):
+            for op in ('=', '!=', '<', '>=', '~', '!~', ' is ',):
+                for value in ('10', 'abc', '2020', '2020-01-01', '^ab', 'empty', 'not number', 'date',):
+                    query = RowQuery.parse(tag + op + value)
+                    query._prepare_value(query.value)
+                    for v in values:
+                        self.assertEqual(
+                            self._try_match(lambda: query.match_value(v, query.op)),
+                            self._try_match(lambda: query._predicate(v)),
+                            '{} with {}'.format(tag + op + value, repr(v))
+                        )
+
+    @staticmethod
+    def _try_match(f):
+        try:
+            return bool(f())
+        except Exception as e:
+            return type(e)
+
+    def test_errors_deferred(self):
+        # errors for a bad regex or "is" condition still appear only when a value is tested
+        for spec in ('#sector~[', '#sector is foo',):
+            query = RowQuery.parse(spec)
+            self.assertEqual([], query.match_values([]))
+            with self.assertRaises(Exception):
+                query.match_row(self.row)
+
+    def test_in(self):
+        query = RowQuery.parse('adm1 in north, coast, plains')
+        self.assertEqual(RowQuery.operator_in, query.op)
+        self.assertTrue(query.match_row(self.row))
+        self.assertFalse(RowQuery.parse('adm1 not in north, coast').match_row(self.row))
+        self.assertTrue(RowQuery.parse('sector not in health, education').match_row(self.row))
+        # numbers and dates are compared by value
+        self.assertTrue(RowQuery.parse('affected in 100, 200.0').match_row(self.row))
+        self.assertTrue(RowQuery.parse('date in 2015-12-13').match_row(self.row))
+        # a value list is also allowed
+        query = RowQuery(hxl.model.TagPattern.parse('#sector'), RowQuery.operator_in, ['Health', 'wash'])
+        self.assertTrue(query.match_row(self.row))
+
+    def test_formula_compiled_once(self):
+        """ A row formula is evaluated for every row, but each different result is compiled only once """
+        from unittest.mock import patch
+        DATA_IN = [
+            ['#org', '#org+alt'],
+            ['UNICEF', 'unicef'],
+            ['WFP', 'unicef'],
+            ['WFP', 'WFP'],
+            ['Other', 'WFP'],
+            ['UNICEF', 'unicef'],
+        ]
+        dataset = hxl.data(DATA_IN).cache()
+        for spec, expected in (
+                ('#org+alt = {{#org}}', [True, False, True, False, True]),
+                ('#org+alt ~ {{#org}}', [True, False, True, False, True]),
+                ('#org+alt !~ {{#org}}', [False, True, False, True, False]),
+                ('#org+alt in {{#org}}', [True, False, True, False, True]),
+        ):
+            query = RowQuery.parse(spec)
+            with patch.object(RowQuery, '_compile', side_effect=RowQuery._compile, autospec=True) as mock_compile:
+                self.assertEqual(expected, [query.match_row(row) for row in dataset], spec)
+                self.assertEqual(3, mock_compile.call_count, spec)
+
+    def test_in_quoted(self):
+        # quote a value containing a comma, as in CSV
+        self.assertTrue(RowQuery.parse('population in "1,000", 5').match_row(self.row))
+        self.assertFalse(RowQuery.parse('population in 1,000').match_row(self.row))
+        self.assertFalse(RowQuery.parse('population not in 5, "1,000"').match_row(self.row))
+        self.assertTrue(RowQuery.parse('sector in "a ""quoted"" value", wash').match_row(self.row))
+
 # end
@@ -112,6 +112,9 @@ class TestClean(BaseTest):
         self.assertOutput(['-u', 'sector,subsector'], 'clean-output-upper.csv')
         self.assertOutput(['-l', 'sector,subsector'], 'clean-output-lower.csv')
 
+    def test_jobs(self):
+        self.assertOutput(['-u', 'sector,subsector', '--jobs', '2'], 'clean-output-upper.csv')
+
     # TODO: test dates and numbers
 
 
@@ -134,6 +137,9 @@ class TestCount(BaseTest):
     def test_count_colspec(self):
         self.assertOutput(['-t', 'org,adm1', '-a', 'count() as Activities#output+activities'], 'count-output-colspec.csv')
 
+    def test_max_groups(self):
+        self.assertOutput(['-t', 'org,adm1', '--max-groups', '1'], 'count-output-simple.csv')
+
 
 class TestCut(BaseTest):
     """
@@ -208,6 +214,7 @@ class TestSelect(BaseTest):
     def test_eq(self):
         self.assertOutput(['-q', 'sector=WASH'], 'select-output-eq.csv')
         self.assertOutput(['--query', 'sector=WASH'], 'select-output-eq.csv')
+        self.assertOutput(['-q', 'sector=WASH', '-j', '2'], 'select-output-eq.csv')
 
     def test_ne(self):
         self.assertOutput(['-q', 'sector!=WASH'], 'select-output-ne.csv')
@@ -237,6 +244,18 @@ class TestSelect(BaseTest):
     def test_multiple(self):
         self.assertOutput(['-q', 'sector=WASH', '-q', 'sector=Salud'], 'select-output-multiple.csv')
 
+    def test_in(self):
+        self.assertOutput(['-q', 'sector in wash, salud'], 'select-output-multiple.csv')
+        self.assertOutput(['-r', '-q', 'sector not in wash'], 'select-output-eq.csv')
+
+    def test_in_file(self):
+        self.assertOutput(['--in-file', resolve_file('input-merge.csv'), '--in-keys', 'sector', '-q', 'sector!=Educación'], 'select-output-multiple.csv')
+
+    def test_in_file_reverse_query(self):
+        """ -r can't reverse a query and --in-file together """
+        with self.assertRaises(SystemExit):
+            hxl.scripts.hxlselect_main(['-r', '--in-file', resolve_file('input-merge.csv'), '--in-keys', 'sector', '-q', 'sector!=Educación'])
+
 
 class TestSort(BaseTest):
     """